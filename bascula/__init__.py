@@ -2,6 +2,7 @@
 
 from . import controllers
 from . import models
+from . import wizard
 
 
 def _post_init_assign_analytic_accounts(env):
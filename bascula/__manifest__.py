@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'Báscula Secadora La Gran Colombia',
-    'version': '18.0.2.2.0',
+    'version': '18.0.2.3.0',
     'category': 'Operations',
     'summary': 'Módulo de pesaje para secadora de arroz',
     'description': """
@@ -18,7 +18,7 @@
     """,
     'author': 'Secadora La Gran Colombia S.A.S',
     'website': '',
-    'depends': ['base', 'contacts', 'product', 'account', 'mail'],
+    'depends': ['base', 'contacts', 'product', 'account', 'mail', 'bus'],
     'post_init_hook': '_post_init_assign_analytic_accounts',
     'data': [
         'data/analytic_plan_data.xml',
@@ -33,6 +33,8 @@
         # 'data/tipo_vehiculo_data.xml',
         'security/security.xml',
         'security/ir.model.access.csv',
+        'data/bascula_data.xml',
+        'data/orden_servicio_cron.xml',
         'views/tipo_vehiculo_views.xml',
         'views/vehiculo_views.xml',
         'views/conductor_views.xml',
@@ -44,9 +46,13 @@
         'views/servicio_regla_views.xml',
         'views/orden_servicio_views.xml',
         'views/orden_servicio_report.xml',
+        'wizard/facturar_ordenes_wizard_views.xml',
         'views/pesaje_views.xml',
         'views/pesaje_report.xml',
         'views/registro_bultos_views.xml',
+        'views/bascula_views.xml',
+        'views/bascula_lectura_views.xml',
+        'views/bascula_token_views.xml',
         'views/partner_views.xml',
         'views/res_config_settings_views.xml',
         'views/menu_views.xml',
@@ -54,6 +60,7 @@
     ],
     'assets': {
         'web.assets_backend': [
+            'bascula/static/src/js/columnas.js',
             'bascula/static/src/js/peso_actual_field.js',
             'bascula/static/src/xml/peso_actual_field.xml',
         ],
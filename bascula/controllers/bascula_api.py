@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 
+import gzip
+import io
 import json
 import logging
 from odoo import http, api, SUPERUSER_ID
@@ -17,8 +19,46 @@ def _json_response(data, status=200):
     )
 
 
+# Tamaño máximo de una línea del stream (una lectura ocupa ~60 bytes).
+STREAM_MAX_LINEA = 4096
+
+# Tamaño máximo de un cuerpo comprimido ya descomprimido (lotes del bridge).
+CUERPO_MAX_BYTES = 10 * 1024 * 1024
+
+
+def _iter_lineas_json(stream):
+    """Itera las líneas NDJSON de un cuerpo que llega por partes (chunked).
+
+    Cada línea se entrega apenas llega, sin esperar a que el cliente cierre
+    el cuerpo. Las líneas que no son JSON válido se descartan con aviso.
+    """
+    while True:
+        linea = stream.readline(STREAM_MAX_LINEA)
+        if not linea:
+            return
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            yield json.loads(linea)
+        except ValueError:
+            _logger.warning(f"Línea inválida en stream de báscula: {linea[:200]!r}")
+
+
 def _get_env_from_db(db_name):
-    """Obtiene un Environment para la BD especificada (para auth='none')."""
+    """Obtiene un Environment de superusuario para la BD (para auth='none').
+
+    Devuelve (env, cr). Si Odoo ya abrió la BD para esta petición (el bridge
+    envía la cabecera X-Odoo-Database, o dbfilter la resuelve), se reutiliza
+    el cursor de la petición y cr es None: no hay búsqueda de registro ni
+    cursor extra, y Odoo lo confirma y lo cierra al terminar. Si no, se abre
+    un cursor propio que el llamador debe cerrar.
+
+    Como Odoo confirma el cursor de la petición aunque la respuesta sea un
+    500, ante un error el llamador debe hacer env.cr.rollback().
+    """
+    if getattr(request, 'db', None) == db_name and getattr(request, 'env', None) is not None:
+        return request.env(user=SUPERUSER_ID, context={}), None
     registry = api.Registry(db_name)
     cr = registry.cursor()
     env = api.Environment(cr, SUPERUSER_ID, {})
@@ -28,9 +68,19 @@ def _get_env_from_db(db_name):
 class BasculaAPI(http.Controller):
     """API REST para integración con báscula externa"""
 
+    def _leer_cuerpo(self):
+        """Cuerpo de la petición; descomprime si llega con Content-Encoding: gzip."""
+        raw = request.httprequest.get_data()
+        if request.httprequest.headers.get('Content-Encoding', '').lower() == 'gzip':
+            with gzip.GzipFile(fileobj=io.BytesIO(raw)) as gz:
+                raw = gz.read(CUERPO_MAX_BYTES + 1)
+            if len(raw) > CUERPO_MAX_BYTES:
+                raise ValueError('Cuerpo descomprimido demasiado grande')
+        return raw.decode('utf-8')
+
     def _get_db_and_data(self):
         """Parsea body JSON y retorna (db, data). db viene del body o de Odoo."""
-        raw = request.httprequest.data.decode('utf-8')
+        raw = self._leer_cuerpo()
         data = json.loads(raw) if raw else {}
         # Si hay params (JSON-RPC), extraer; si no, usar directo
         if 'params' in data:
@@ -42,7 +92,9 @@ class BasculaAPI(http.Controller):
     def actualizar_peso(self, **kwargs):
         """
         POST /api/bascula/actualizar_peso
-        Body: {"pesaje_id": 123, "peso": 28345.50, "api_key": "...", "db": "odoo_secadora"}
+        Body: {"pesaje_id": 123, "peso": 28345.50, "api_key": "...", "db": "odoo_secadora",
+               "bascula": "principal", "estable": true, "peso_estable": 28345.0}
+              (bascula, estable y peso_estable opcionales)
         """
         env = cr = None
         try:
@@ -62,11 +114,15 @@ class BasculaAPI(http.Controller):
 
             env, cr = _get_env_from_db(db)
             Pesaje = env['secadora.pesaje']
-            result = Pesaje.actualizar_peso_bascula(pesaje_id, peso, api_key)
-            cr.commit()
+            result = Pesaje.actualizar_peso_bascula(
+                pesaje_id, peso, api_key, data.get('bascula'),
+                data.get('estable'), data.get('peso_estable'))
+            env.cr.commit()
             return _json_response(result)
 
         except Exception as e:
+            if env:
+                env.cr.rollback()
             _logger.error(f"Error actualizando peso: {e}")
             return _json_response({'success': False, 'message': str(e)}, 500)
         finally:
@@ -77,7 +133,7 @@ class BasculaAPI(http.Controller):
     def obtener_pesaje_activo(self, **kwargs):
         """
         POST /api/bascula/pesaje_activo
-        Body: {"api_key": "...", "db": "odoo_secadora"}
+        Body: {"api_key": "...", "db": "odoo_secadora", "bascula": "principal"}  (bascula opcional)
         """
         env = cr = None
         try:
@@ -92,10 +148,12 @@ class BasculaAPI(http.Controller):
 
             env, cr = _get_env_from_db(db)
             Pesaje = env['secadora.pesaje']
-            result = Pesaje.obtener_pesaje_activo(api_key)
+            result = Pesaje.obtener_pesaje_activo(api_key, data.get('bascula'))
             return _json_response(result)
 
         except Exception as e:
+            if env:
+                env.cr.rollback()
             _logger.error(f"Error obteniendo pesaje activo: {e}")
             return _json_response({'success': False, 'message': str(e)}, 500)
         finally:
@@ -106,7 +164,8 @@ class BasculaAPI(http.Controller):
     def actualizar_peso_global(self, **kwargs):
         """
         POST /api/bascula/actualizar_peso_global
-        Body: {"peso": 28345.50, "api_key": "...", "db": "odoo_secadora"}
+        Body: {"peso": 28345.50, "api_key": "...", "db": "odoo_secadora", "bascula": "principal",
+               "estable": true, "peso_estable": 28345.0}
         """
         env = cr = None
         try:
@@ -125,22 +184,150 @@ class BasculaAPI(http.Controller):
 
             env, cr = _get_env_from_db(db)
             Pesaje = env['secadora.pesaje']
-            result = Pesaje.actualizar_peso_global_bascula(peso, api_key)
-            cr.commit()
+            result = Pesaje.actualizar_peso_global_bascula(
+                peso, api_key, data.get('bascula'),
+                data.get('estable'), data.get('peso_estable'))
+            env.cr.commit()
             return _json_response(result)
 
         except Exception as e:
+            if env:
+                env.cr.rollback()
             _logger.error(f"Error actualizando peso global: {e}")
             return _json_response({'success': False, 'message': str(e)}, 500)
         finally:
             if cr:
                 cr.close()
 
+    @http.route('/api/bascula/stream', type='http', auth='none', methods=['POST'], csrf=False)
+    def stream_lecturas(self, **kwargs):
+        """
+        POST /api/bascula/stream  (Transfer-Encoding: chunked, NDJSON)
+
+        Canal persistente del bridge: un solo POST por ventana (unos segundos)
+        que lleva una línea JSON por lectura. La primera línea autentica y
+        declara las básculas que atiende el bridge:
+            {"api_key": "...", "db": "odoo_secadora", "basculas": ["principal", "auxiliar"]}
+        y las siguientes son lecturas:
+            {"bascula": "principal", "peso": 28345.50, "pesaje_id": 123,
+             "estable": true, "peso_estable": 28345.0}
+        (pesaje_id, estable y peso_estable opcionales)
+
+        Cada lectura se aplica y se confirma apenas llega, igual que con
+        actualizar_peso / actualizar_peso_global. Al cerrar la ventana se
+        responde con el pesaje activo de cada báscula, así el bridge no lo
+        consulta aparte. Los endpoints HTTP por lectura se mantienen como
+        respaldo.
+        """
+        env = cr = None
+        try:
+            lineas = _iter_lineas_json(request.httprequest.stream)
+            cabecera = next(lineas, None) or {}
+            api_key = cabecera.get('api_key')
+            db = cabecera.get('db') or getattr(request, 'db', None) or request.session.get('db')
+
+            if not api_key:
+                return _json_response({'success': False, 'message': 'API Key faltante'}, 400)
+
+            if not db:
+                return _json_response({'success': False, 'message': 'Falta parámetro db'}, 400)
+
+            env, cr = _get_env_from_db(db)
+            Pesaje = env['secadora.pesaje']
+            if not Pesaje._api_key_valida(api_key):
+                return _json_response({'success': False, 'message': 'API Key inválida'}, 403)
+
+            recibidas = 0
+            for lectura in lineas:
+                peso = lectura.get('peso')
+                if peso is None:
+                    continue
+                pesaje_id = lectura.get('pesaje_id')
+                bascula = lectura.get('bascula')
+                estable = lectura.get('estable')
+                peso_estable = lectura.get('peso_estable')
+                if pesaje_id:
+                    result = Pesaje._aplicar_peso_bascula(
+                        pesaje_id, peso, bascula, estable, peso_estable)
+                else:
+                    result = Pesaje._aplicar_peso_global(peso, bascula, estable, peso_estable)
+                if result.get('success'):
+                    env.cr.commit()
+                    recibidas += 1
+                else:
+                    env.cr.rollback()
+                    _logger.warning(f"Lectura rechazada en stream: {result.get('message')}")
+
+            pesajes_activos = {}
+            for bascula in cabecera.get('basculas') or [None]:
+                activo = Pesaje._pesaje_activo_info(bascula)
+                pesajes_activos[bascula or 'principal'] = activo if activo.get('success') else None
+            return _json_response({
+                'success': True,
+                'lecturas': recibidas,
+                'pesajes_activos': pesajes_activos,
+                # Compatibilidad con bridges de una sola báscula
+                'pesaje_activo': next(iter(pesajes_activos.values())),
+            })
+
+        except Exception as e:
+            if env:
+                env.cr.rollback()
+            _logger.error(f"Error en stream de báscula: {e}")
+            return _json_response({'success': False, 'message': str(e)}, 500)
+        finally:
+            if cr:
+                cr.close()
+
+    @http.route('/api/bascula/lecturas_lote', type='http', auth='none', methods=['POST'], csrf=False)
+    def lecturas_lote(self, **kwargs):
+        """
+        POST /api/bascula/lecturas_lote  (admite Content-Encoding: gzip)
+        Body: {"api_key": "...", "db": "odoo_secadora",
+               "lecturas": [{"bascula": "principal", "fecha": "2026-02-10 14:03:21.500",
+                             "peso": 28345.50, "pesaje_id": 123}, ...]}
+
+        Recibe las lecturas que el bridge acumuló en su cola local y las
+        guarda en la traza (secadora.bascula.lectura). Es idempotente: el
+        bridge puede reenviar un lote si no recibió la confirmación.
+        """
+        env = cr = None
+        try:
+            db, data = self._get_db_and_data()
+            api_key = data.get('api_key')
+            lecturas = data.get('lecturas')
+
+            if not all([api_key, lecturas is not None]):
+                return _json_response({
+                    'success': False,
+                    'message': 'Parámetros faltantes: lecturas, api_key'
+                }, 400)
+
+            if not db:
+                return _json_response({'success': False, 'message': 'Falta parámetro db'}, 400)
+
+            env, cr = _get_env_from_db(db)
+            if not env['secadora.pesaje']._api_key_valida(api_key):
+                return _json_response({'success': False, 'message': 'API Key inválida'}, 403)
+
+            result = env['secadora.bascula.lectura']._registrar_lote(lecturas)
+            env.cr.commit()
+            return _json_response(result)
+
+        except Exception as e:
+            if env:
+                env.cr.rollback()
+            _logger.error(f"Error registrando lote de lecturas: {e}")
+            return _json_response({'success': False, 'message': str(e)}, 500)
+        finally:
+            if cr:
+                cr.close()
+
     @http.route('/api/bascula/peso_actual_global', type='http', auth='none', methods=['POST'], csrf=False)
     def obtener_peso_actual_global(self, **kwargs):
         """
         POST /api/bascula/peso_actual_global
-        Body: {"db": "odoo_secadora"}
+        Body: {"db": "odoo_secadora", "bascula": "principal"}  (bascula opcional)
         """
         env = cr = None
         try:
@@ -151,10 +338,12 @@ class BasculaAPI(http.Controller):
 
             env, cr = _get_env_from_db(db)
             Pesaje = env['secadora.pesaje']
-            result = Pesaje.obtener_peso_actual_global_ui()
+            result = Pesaje.obtener_peso_actual_global_ui(data.get('bascula'))
             return _json_response(result)
 
         except Exception as e:
+            if env:
+                env.cr.rollback()
             _logger.error(f"Error obteniendo peso actual global: {e}")
             return _json_response({'success': False, 'message': str(e)}, 500)
         finally:
@@ -0,0 +1,19 @@
+"""Retirar los parámetros del peso global, reemplazados por secadora.bascula.peso.vivo.
+
+Se borran con SQL directo para no tocar la ormcache más de lo necesario; el
+siguiente peso que envíe el bridge llena la nueva tabla.
+"""
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    if not version:
+        return
+
+    cr.execute("""
+        DELETE FROM ir_config_parameter
+        WHERE key IN ('bascula.last_weight', 'bascula.last_weight_timestamp')
+    """)
+    _logger.info("Peso en vivo: %s parámetros bascula.last_weight* eliminados.", cr.rowcount)
@@ -8,6 +8,12 @@ from . import variedad_arroz
 from . import lugar
 from . import lote
 from . import tipo_operacion
+from . import bascula
+from . import bascula_peso_vivo
+from . import bascula_lectura
+from . import cache_mixin
+from . import bascula_token
+from . import serializador_columnas
 from . import pesaje
 from . import pesaje_distribucion
 from . import res_config_settings
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api
+
+
+class SecadoraBascula(models.Model):
+    """Báscula física conectada a un bridge.
+
+    Un mismo bridge puede atender varias básculas (un puerto serial cada
+    una); cada lectura llega etiquetada con el código de la báscula, y el
+    peso en vivo y el pesaje activo se llevan por báscula.
+    """
+    _name = 'secadora.bascula'
+    _description = 'Báscula'
+    _order = 'sequence, id'
+
+    _sql_constraints = [
+        ('codigo_unique', 'UNIQUE(codigo)', 'El código de la báscula debe ser único.'),
+    ]
+
+    name = fields.Char(
+        string='Nombre',
+        required=True,
+    )
+    codigo = fields.Char(
+        string='Código',
+        required=True,
+        help='Identificador que usa el bridge para esta báscula '
+             '(BASCULA_ID o BASCULA_PUERTOS en el .env del bridge).',
+    )
+    sequence = fields.Integer(
+        string='Secuencia',
+        default=10,
+        help='La primera báscula es la predeterminada de los pesajes nuevos.',
+    )
+    active = fields.Boolean(
+        string='Activo',
+        default=True,
+    )
+    peso_actual = fields.Float(
+        string='Peso Actual (Kg)',
+        compute='_compute_peso_actual',
+        digits=(12, 0),
+    )
+    peso_fecha = fields.Datetime(
+        string='Última Lectura',
+        compute='_compute_peso_actual',
+    )
+
+    def _compute_peso_actual(self):
+        PesoVivo = self.env['secadora.bascula.peso.vivo'].sudo()
+        for rec in self:
+            rec.peso_actual, rec.peso_fecha = PesoVivo._leer(rec.codigo)
+
+    @api.model
+    def _default_bascula(self):
+        """Báscula predeterminada: la primera activa por secuencia."""
+        return self.search([], limit=1)
+
+    @api.model
+    def _codigo_predeterminado(self):
+        """Código de la báscula predeterminada, al que se atribuyen los
+        pesajes sin báscula (BASCULA_PRINCIPAL si no hay básculas)."""
+        return (self._default_bascula().codigo
+                or self.env['secadora.bascula.peso.vivo'].BASCULA_PRINCIPAL)
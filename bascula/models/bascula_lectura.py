@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+from datetime import datetime, timezone
+from odoo import models, fields, api
+
+
+def _parsear_fecha(valor):
+    """Fecha ISO del bridge a datetime UTC naive, conservando milisegundos.
+
+    fields.Datetime.to_datetime trunca a segundos, y el bridge lee cada
+    0.5 s: dos lecturas del mismo segundo se tomarían por duplicadas.
+    """
+    fecha = datetime.fromisoformat(str(valor).replace('Z', '+00:00'))
+    if fecha.tzinfo:
+        fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    return fecha
+
+
+class BasculaLectura(models.Model):
+    """Traza de lecturas de báscula recibidas en lote desde el bridge.
+
+    El bridge guarda cada lectura en una cola local en disco y la reenvía en
+    lotes comprimidos a /api/bascula/lecturas_lote; si se cae internet, la
+    cola se acumula y se vacía al volver la conexión. Aquí queda la traza
+    completa para auditoría. La inserción es idempotente por (báscula, fecha):
+    reenviar un lote que ya llegó no duplica lecturas.
+    """
+    _name = 'secadora.bascula.lectura'
+    _description = 'Lectura de Báscula'
+    _order = 'fecha desc, id desc'
+    _log_access = False
+
+    _sql_constraints = [
+        ('bascula_fecha_unique', 'UNIQUE(bascula, fecha)',
+         'Lectura duplicada para esta báscula.'),
+    ]
+
+    # Máximo de lecturas aceptadas en un solo lote.
+    LOTE_MAX_LECTURAS = 5000
+
+    bascula = fields.Char(
+        string='Báscula',
+        required=True,
+        readonly=True,
+    )
+    fecha = fields.Datetime(
+        string='Fecha de Lectura',
+        required=True,
+        readonly=True,
+        help='Momento en que el bridge leyó el peso (hora UTC del PC de la báscula).',
+    )
+    peso = fields.Float(
+        string='Peso (Kg)',
+        digits=(12, 2),
+        readonly=True,
+    )
+    pesaje_id = fields.Many2one(
+        'secadora.pesaje',
+        string='Pesaje',
+        readonly=True,
+        index='btree_not_null',
+        ondelete='set null',
+    )
+    recibida = fields.Datetime(
+        string='Recibida',
+        readonly=True,
+        help='Momento en que Odoo recibió el lote.',
+    )
+
+    @api.model
+    def _registrar_lote(self, lecturas):
+        """Inserta un lote de lecturas en una sola sentencia.
+
+        Args:
+            lecturas: lista de dicts {'peso', 'fecha', 'bascula'?, 'pesaje_id'?}
+
+        Returns:
+            dict: {'success': bool, 'recibidas': int, 'insertadas': int,
+                   'descartadas': int, 'message': str}
+        """
+        if not isinstance(lecturas, list):
+            return {'success': False, 'message': 'lecturas debe ser una lista'}
+        if len(lecturas) > self.LOTE_MAX_LECTURAS:
+            return {
+                'success': False,
+                'message': f'Lote demasiado grande (máximo {self.LOTE_MAX_LECTURAS} lecturas)',
+            }
+
+        principal = self.env['secadora.bascula.peso.vivo'].BASCULA_PRINCIPAL
+        basculas, fechas, pesos, pesaje_ids = [], [], [], []
+        descartadas = 0
+        for lectura in lecturas:
+            try:
+                peso = float(lectura['peso'])
+                fecha = _parsear_fecha(lectura['fecha'])
+            except (KeyError, TypeError, ValueError):
+                descartadas += 1
+                continue
+            if not fecha or peso < 0 or peso > 100000:
+                descartadas += 1
+                continue
+            try:
+                pesaje_id = int(lectura.get('pesaje_id') or 0) or None
+            except (TypeError, ValueError):
+                pesaje_id = None
+            basculas.append(str(lectura.get('bascula') or principal))
+            fechas.append(fecha)
+            pesos.append(peso)
+            pesaje_ids.append(pesaje_id)
+
+        insertadas = 0
+        if pesos:
+            # pesaje_id se filtra contra la tabla: un pesaje borrado entre la
+            # lectura y el envío no debe tumbar todo el lote por la FK.
+            self.env.cr.execute("""
+                INSERT INTO secadora_bascula_lectura (bascula, fecha, peso, pesaje_id, recibida)
+                SELECT l.bascula, l.fecha, l.peso, p.id, (now() AT TIME ZONE 'UTC')
+                  FROM unnest(%s::varchar[], %s::timestamp[], %s::numeric[], %s::int[])
+                       AS l(bascula, fecha, peso, pesaje_id)
+                  LEFT JOIN secadora_pesaje p ON p.id = l.pesaje_id
+                ON CONFLICT (bascula, fecha) DO NOTHING
+            """, [basculas, fechas, pesos, pesaje_ids])
+            insertadas = self.env.cr.rowcount
+
+        return {
+            'success': True,
+            'recibidas': len(lecturas),
+            'insertadas': insertadas,
+            'descartadas': descartadas,
+            'message': 'Lote registrado',
+        }
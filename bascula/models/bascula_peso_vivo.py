@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api
+
+
+class BasculaPesoVivo(models.Model):
+    """Último peso reportado por cada báscula física.
+
+    Reemplaza los parámetros bascula.last_weight / bascula.last_weight_timestamp.
+    set_param escribía en ir_config_parameter y vaciaba la ormcache de todo el
+    registro dos veces por lectura, con lo que los demás workers perdían los
+    parámetros cacheados. Esta tabla tiene una fila por báscula, se escribe con
+    un UPSERT directo (sin ORM: no invalida cachés ni dispara tracking) y se lee
+    también por SQL para ver siempre el último valor confirmado.
+    """
+    _name = 'secadora.bascula.peso.vivo'
+    _description = 'Peso en Vivo de Báscula'
+    _order = 'bascula'
+    _log_access = False
+
+    _sql_constraints = [
+        ('bascula_unique', 'UNIQUE(bascula)',
+         'Solo puede haber un peso en vivo por báscula.'),
+    ]
+
+    # Báscula por defecto mientras el bridge no identifique otra.
+    BASCULA_PRINCIPAL = 'principal'
+
+    # Canal del bus donde se publican los cambios de peso (ver
+    # peso_actual_field.js). Los heartbeats sin cambio no se publican.
+    CANAL_BUS = 'bascula_peso'
+
+    bascula = fields.Char(
+        string='Báscula',
+        required=True,
+        default=BASCULA_PRINCIPAL,
+    )
+    peso = fields.Float(
+        string='Peso (Kg)',
+        digits=(12, 2),
+    )
+    fecha = fields.Datetime(
+        string='Fecha de Lectura',
+    )
+    # Detector de estabilidad del bridge (filtro_estabilidad.py). NULL si
+    # el bridge no lo reporta (versiones anteriores).
+    estable = fields.Boolean(
+        string='Estable',
+    )
+    peso_estable = fields.Float(
+        string='Peso Asentado (Kg)',
+        digits=(12, 2),
+        help='Mediana de la ventana de lecturas cuando el peso está estable.',
+    )
+    # Heartbeat del pesaje en la báscula: último pesaje al que el bridge
+    # dirigió una lectura y cuándo. Así el pesaje solo se escribe cuando su
+    # peso cambia y la frescura se consulta aquí.
+    pesaje_id = fields.Many2one(
+        'secadora.pesaje',
+        string='Pesaje en Báscula',
+        ondelete='set null',
+    )
+    pesaje_fecha = fields.Datetime(
+        string='Última Lectura del Pesaje',
+    )
+
+    @api.model
+    def _registrar(self, peso, bascula=None, estable=None, peso_estable=None, pesaje_id=None):
+        """Guarda el último peso de la báscula. Devuelve la fecha registrada.
+
+        Si el peso o su estabilidad cambiaron respecto a lo anterior, se
+        publica una sola vez en el bus para que los formularios abiertos lo
+        muestren sin consultar. Con pesaje_id, la lectura cuenta además como
+        heartbeat de ese pesaje (las lecturas globales no lo tocan).
+        """
+        bascula = bascula or self.BASCULA_PRINCIPAL
+        fecha = fields.Datetime.now()
+        if not estable:
+            peso_estable = None
+        pesaje_fecha = fecha if pesaje_id else None
+        # La CTE ve la fila antes del UPSERT: así sabemos si cambió el peso.
+        self.env.cr.execute("""
+            WITH anterior AS (
+                SELECT peso, estable FROM secadora_bascula_peso_vivo WHERE bascula = %s
+            )
+            INSERT INTO secadora_bascula_peso_vivo AS vivo
+                   (bascula, peso, fecha, estable, peso_estable, pesaje_id, pesaje_fecha)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (bascula) DO UPDATE
+               SET peso = EXCLUDED.peso,
+                   fecha = EXCLUDED.fecha,
+                   estable = EXCLUDED.estable,
+                   peso_estable = EXCLUDED.peso_estable,
+                   pesaje_id = COALESCE(EXCLUDED.pesaje_id, vivo.pesaje_id),
+                   pesaje_fecha = COALESCE(EXCLUDED.pesaje_fecha, vivo.pesaje_fecha)
+            RETURNING (SELECT peso FROM anterior),
+                      (SELECT estable FROM anterior)
+        """, [bascula, bascula, peso, fecha, estable, peso_estable, pesaje_id, pesaje_fecha])
+        peso_anterior, estable_anterior = self.env.cr.fetchone()
+        self.invalidate_model(['peso', 'fecha', 'estable', 'peso_estable',
+                               'pesaje_id', 'pesaje_fecha'])
+        if (peso_anterior is None or abs(float(peso_anterior) - peso) > 0.01
+                or estable_anterior != estable):
+            self._notificar(bascula, peso, fecha, estable)
+        return fecha
+
+    @api.model
+    def _notificar(self, bascula, peso, fecha, estable=None):
+        """Publica el nuevo peso en el bus (se envía al confirmar la transacción)."""
+        self.env['bus.bus']._sendone(self.CANAL_BUS, 'bascula/peso', {
+            'bascula': bascula,
+            'peso_actual': peso,
+            'estable': estable,
+            'timestamp': fields.Datetime.to_string(fecha),
+        })
+
+    @api.model
+    def _leer(self, bascula=None):
+        """Último (peso, fecha) de la báscula; (0.0, None) si nunca reportó."""
+        self.env.cr.execute(
+            "SELECT peso, fecha FROM secadora_bascula_peso_vivo WHERE bascula = %s",
+            [bascula or self.BASCULA_PRINCIPAL],
+        )
+        fila = self.env.cr.fetchone()
+        if not fila:
+            return 0.0, None
+        # La columna es numeric: psycopg2 devuelve Decimal.
+        return float(fila[0] or 0.0), fila[1]
+
+    @api.model
+    def _leer_pesaje(self, bascula=None):
+        """(pesaje_id, fecha) de la última lectura dirigida a un pesaje en la báscula."""
+        self.env.cr.execute(
+            "SELECT pesaje_id, pesaje_fecha FROM secadora_bascula_peso_vivo WHERE bascula = %s",
+            [bascula or self.BASCULA_PRINCIPAL],
+        )
+        fila = self.env.cr.fetchone()
+        return (fila[0], fila[1]) if fila else (None, None)
+
+    @api.model
+    def _leer_estabilidad(self, bascula=None):
+        """Último (peso, fecha, estable) de la báscula.
+
+        Si el bridge marcó la lectura como estable, el peso es el asentado
+        (mediana de la ventana) en vez de la muestra cruda. estable es None
+        cuando el bridge no reporta estabilidad.
+        """
+        self.env.cr.execute("""
+            SELECT peso, fecha, estable, peso_estable
+              FROM secadora_bascula_peso_vivo WHERE bascula = %s
+        """, [bascula or self.BASCULA_PRINCIPAL])
+        fila = self.env.cr.fetchone()
+        if not fila:
+            return 0.0, None, None
+        peso, fecha, estable, peso_estable = fila
+        if estable and peso_estable is not None:
+            peso = peso_estable
+        return float(peso or 0.0), fecha, estable
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import hmac
+import secrets
+
+from odoo import models, fields, api, tools
+
+
+class BasculaToken(models.Model):
+    """Token de autenticación de un bridge de báscula.
+
+    Cada bridge (PC conectado a una o varias básculas) tiene su propio token;
+    en la base de datos solo se guarda su hash SHA-256. El bridge autentica
+    cada lectura, así que la verificación no puede costar una consulta: los
+    hashes activos se guardan en la ormcache y se invalida al crear, editar
+    o archivar tokens (y al cambiar bascula.api_key, que limpia la caché).
+    """
+    _name = 'secadora.bascula.token'
+    _description = 'Token de Bridge de Báscula'
+    _inherit = ['secadora.cache.mixin']
+    _campos_cache = ('token_hash', 'active')
+    _order = 'name'
+
+    _sql_constraints = [
+        ('token_hash_unique', 'UNIQUE(token_hash)', 'El token ya está asignado a otro bridge.'),
+    ]
+
+    name = fields.Char(
+        string='Bridge',
+        required=True,
+        help='PC o ubicación del bridge que usa este token.',
+    )
+    token_hash = fields.Char(
+        string='Hash del Token',
+        readonly=True,
+        copy=False,
+        groups='base.group_system',
+    )
+    token_prefijo = fields.Char(
+        string='Inicio del Token',
+        readonly=True,
+        copy=False,
+        help='Primeros caracteres del token, para reconocerlo en el .env del bridge.',
+    )
+    active = fields.Boolean(
+        string='Activo',
+        default=True,
+    )
+
+    @api.model
+    def _hash_token(self, token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    @api.model
+    @tools.ormcache()
+    def _hashes_validos(self):
+        """Hashes aceptados: tokens activos y la API Key general de Ajustes."""
+        self.env.cr.execute("""
+            SELECT token_hash FROM secadora_bascula_token
+             WHERE active AND token_hash IS NOT NULL
+        """)
+        hashes = [fila[0] for fila in self.env.cr.fetchall()]
+        # Compatibilidad con bridges configurados con la API Key de Ajustes
+        api_key = self.env['ir.config_parameter'].sudo().get_param('bascula.api_key')
+        if api_key:
+            hashes.append(self._hash_token(api_key))
+        return tuple(hashes)
+
+    @api.model
+    def _token_valido(self, token):
+        """True si el token corresponde a un bridge activo.
+
+        La comparación es de tiempo constante y recorre todos los hashes,
+        para no revelar por la latencia cuánto del token coincide.
+        """
+        if not token or not isinstance(token, str):
+            return False
+        digest = self._hash_token(token)
+        valido = False
+        for token_hash in self._hashes_validos():
+            valido |= hmac.compare_digest(digest, token_hash)
+        return valido
+
+    def action_generar_token(self):
+        """Genera un token nuevo; se muestra una sola vez (solo se guarda el hash)."""
+        self.ensure_one()
+        token = secrets.token_urlsafe(32)
+        self.sudo().write({
+            'token_hash': self._hash_token(token),
+            'token_prefijo': token[:6],
+        })
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': f'Token de {self.name}',
+                'message': f'Copie este token en BASCULA_API_KEY del bridge; no se volverá a mostrar: {token}',
+                'type': 'warning',
+                'sticky': True,
+            }
+        }
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, api
+
+
+class CacheMixin(models.AbstractModel):
+    """Limpia la ormcache cuando cambian los registros del modelo.
+
+    Para los modelos cuyos datos se guardan en la ormcache (reglas de
+    servicio, tokens de báscula, descuentos de calidad, precios de compra):
+    crear, editar o eliminar registros limpia la caché en todos los
+    workers. Si _campos_cache no está vacío, al editar solo la limpian los
+    cambios en esos campos.
+    """
+    _name = 'secadora.cache.mixin'
+    _description = 'Limpieza de Caché al Modificar'
+
+    _campos_cache = ()
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if not self._campos_cache or set(self._campos_cache) & set(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 
+import logging
+
 from odoo import models, fields, api
 from odoo.exceptions import UserError, ValidationError
 from odoo.tools.float_utils import float_compare
 
+_logger = logging.getLogger(__name__)
+
 
 class OrdenServicio(models.Model):
     _name = 'secadora.orden.servicio'
@@ -11,6 +15,10 @@ class OrdenServicio(models.Model):
     _order = 'fecha_inicio desc, id desc'
     _inherit = ['mail.thread', 'mail.activity.mixin']
 
+    CRON_FACTURACION = 'bascula.ir_cron_facturar_ordenes_en_lote'
+    # Órdenes que factura cada corrida del cron (luego se vuelve a disparar)
+    LOTE_FACTURACION = 200
+
     name = fields.Char(
         string='Número de Orden',
         required=True,
@@ -314,6 +322,22 @@ class OrdenServicio(models.Model):
         help='Factura de cliente generada para esta orden'
     )
 
+    facturacion_lote = fields.Selection([
+        ('orden', 'Una factura por orden'),
+        ('cliente', 'Una factura por cliente'),
+    ], string='Facturación en Cola',
+       readonly=True,
+       copy=False,
+       index=True,
+       help='La orden está en cola para la facturación en lote en segundo plano')
+
+    facturacion_lote_usuario_id = fields.Many2one(
+        'res.users',
+        string='Encolada por',
+        readonly=True,
+        copy=False,
+    )
+
     # ==================== ESTADOS ====================
 
     state = fields.Selection([
@@ -542,6 +566,7 @@ class OrdenServicio(models.Model):
         recomputaciones en cadena. Solo toca líneas automáticas cuya base es un
         peso o bultos; no toca 'fijo' ni líneas editadas manualmente.
         """
+        Regla = self.env['secadora.servicio.regla']
         for orden in self:
             if not orden.linea_servicio_ids:
                 continue
@@ -551,15 +576,11 @@ class OrdenServicio(models.Model):
                 if linea.base_calculo not in bases_dinamicas:
                     continue
 
-                # Buscar la regla para el factor, filtrando por empresa.
-                regla = self.env['secadora.servicio.regla'].search([
-                    ('producto_id', '=', linea.producto_id.id),
-                    ('base_calculo', '=', linea.base_calculo),
-                    ('active', '=', True),
-                    ('company_id', 'in', [False, orden.company_id.id]),
-                ], order='company_id desc', limit=1)
-
-                factor = regla.factor_multiplicador if regla else 1.0
+                # Factor de la regla (la de la empresa gana sobre la global),
+                # desde el índice en caché: sin consulta por línea.
+                factor = Regla._factor_para(
+                    orden.company_id.id, linea.producto_id.id, linea.base_calculo,
+                )
 
                 if linea.base_calculo == 'peso_entrada':
                     nueva_cantidad = orden.peso_entrada * factor
@@ -583,55 +604,74 @@ class OrdenServicio(models.Model):
                     )
         res = super(OrdenServicio, self).write(vals)
         if 'modalidad_salida' in vals:
-            for record in self:
-                record._reaplicar_reglas_servicios()
+            self._reaplicar_reglas_servicios()
         return res
 
     def aplicar_reglas_servicios(self):
-        """Aplicar reglas automáticas de servicios a esta orden"""
-        self.ensure_one()
+        """Aplicar reglas automáticas de servicios a estas órdenes.
 
-        # Buscar todas las reglas activas
-        reglas = self.env['secadora.servicio.regla'].search([('active', '=', True)], order='sequence, id')
+        Agrega las líneas de las reglas que aplican y cuyo producto aún no
+        tiene línea automática en la orden.
+        """
+        vals_list = []
+        for orden in self:
+            existentes = orden.linea_servicio_ids.filtered('es_automatica').producto_id.ids
+            vals_list += [
+                vals for producto_id, vals in orden._lineas_automaticas_deseadas().items()
+                if producto_id not in existentes
+            ]
+        self.env['secadora.orden.servicio.linea'].create(vals_list)
 
-        for regla in reglas:
-            # Evaluar si la regla aplica
-            if regla.evaluar_condicion(self):
-                # Verificar si ya existe una línea automática con este producto y misma base
-                linea_existente = self.linea_servicio_ids.filtered(
-                    lambda l: l.producto_id == regla.producto_id and l.es_automatica
-                )
+    def _lineas_automaticas_deseadas(self):
+        """{producto_id: vals} de las líneas que las reglas agregan a la orden.
 
-                if not linea_existente:
-                    # Calcular cantidad
-                    cantidad = regla.calcular_cantidad(self)
-
-                    # Determinar precio a usar
-                    if not regla.incluir_en_factura:
-                        precio = 0.0
-                    elif regla.precio_unitario:
-                        precio = regla.precio_unitario
-                    else:
-                        precio = regla.producto_id.list_price
-
-                    # Crear línea de servicio
-                    self.env['secadora.orden.servicio.linea'].create({
-                        'orden_id': self.id,
-                        'producto_id': regla.producto_id.id,
-                        'base_calculo': regla.base_calculo,
-                        'cantidad': cantidad,
-                        'precio_unitario': precio,
-                        'descripcion': regla.name,
-                        'es_automatica': True,
-                    })
+        Si varias reglas agregan el mismo producto, gana la de menor secuencia.
+        """
+        self.ensure_one()
+        deseadas = {}
+        for regla in self.env['secadora.servicio.regla']._reglas_aplicables(self):
+            if regla.producto_id.id not in deseadas:
+                deseadas[regla.producto_id.id] = regla._vals_linea_servicio(self)
+        return deseadas
 
     def _reaplicar_reglas_servicios(self):
-        """Borrar líneas automáticas y volver a aplicar reglas (al cambiar modalidad)"""
-        self.ensure_one()
-        # Borrar solo las líneas generadas automáticamente
-        self.linea_servicio_ids.filtered('es_automatica').unlink()
-        # Volver a aplicar reglas con la nueva modalidad
-        self.aplicar_reglas_servicios()
+        """Sincronizar las líneas automáticas con las reglas (al cambiar modalidad).
+
+        Compara las líneas deseadas con las existentes: elimina las que ya no
+        aplican, actualiza solo los valores que cambiaron y crea las que
+        faltan, en vez de borrar y recrear todas.
+        """
+        Linea = self.env['secadora.orden.servicio.linea']
+        sobrantes = Linea
+        nuevas = []
+        for orden in self:
+            deseadas = orden._lineas_automaticas_deseadas()
+            for linea in orden.linea_servicio_ids.filtered('es_automatica'):
+                vals = deseadas.pop(linea.producto_id.id, None)
+                if vals is None:
+                    sobrantes |= linea
+                    continue
+                cambios = {
+                    campo: valor for campo, valor in vals.items()
+                    if campo != 'orden_id' and not self._mismo_valor_linea(linea, campo, valor)
+                }
+                if cambios:
+                    linea.write(cambios)
+            nuevas += deseadas.values()
+        sobrantes.unlink()
+        Linea.create(nuevas)
+
+    @api.model
+    def _mismo_valor_linea(self, linea, campo, valor):
+        """Compara el valor actual de un campo de la línea con el deseado."""
+        field = linea._fields[campo]
+        actual = linea[campo]
+        if field.type == 'many2one':
+            return actual.id == valor
+        digits = field.get_digits(self.env) if field.type == 'float' else None
+        if digits:
+            return float_compare(actual, valor, precision_digits=digits[1]) == 0
+        return actual == valor
 
     def action_crear_pesaje_entrada(self):
         """Crear un pesaje de entrada vinculado a esta orden"""
@@ -741,26 +781,10 @@ class OrdenServicio(models.Model):
         if not lines:
             raise UserError('No hay líneas para facturar. Verifica servicios y/o empaques.')
 
-        factura = self.env['account.move'].create({
-            'move_type': 'out_invoice',
-            'partner_id': self.cliente_id.id,
-            'company_id': self.company_id.id,
-            'invoice_date': fields.Date.today(),
-            'invoice_origin': self.name,
-            'invoice_line_ids': [(0, 0, line) for line in lines],
-        })
+        factura = self.env['account.move'].create(self._vals_factura(lines))
 
         self.write({'factura_id': factura.id, 'state': 'facturado'})
-
-        self.message_post(
-            body=(
-                f"<b>Factura generada desde la orden</b><br/>"
-                f"Factura: {factura.name or factura.id}<br/>"
-                f"Usuario: {self.env.user.display_name}<br/>"
-                f"Total: {factura.amount_total:.2f}"
-            ),
-            subtype_xmlid='mail.mt_note'
-        )
+        self._registrar_factura(factura)
 
         return {
             'type': 'ir.actions.act_window',
@@ -770,6 +794,148 @@ class OrdenServicio(models.Model):
             'target': 'current',
         }
 
+    def _vals_factura(self, lines):
+        """Valores de la factura de cliente de estas órdenes (mismo cliente
+        y empresa) con las líneas ya preparadas."""
+        return {
+            'move_type': 'out_invoice',
+            'partner_id': self[0].cliente_id.id,
+            'company_id': self[0].company_id.id,
+            'invoice_date': fields.Date.today(),
+            'invoice_origin': ', '.join(self.mapped('name')),
+            'invoice_line_ids': [(0, 0, line) for line in lines],
+        }
+
+    def _registrar_factura(self, factura):
+        """Deja constancia de la factura en el chatter de cada orden."""
+        for record in self:
+            record.message_post(
+                body=(
+                    f"<b>Factura generada desde la orden</b><br/>"
+                    f"Factura: {factura.name or factura.id}<br/>"
+                    f"Usuario: {self.env.user.display_name}<br/>"
+                    f"Total: {factura.amount_total:.2f}"
+                ),
+                subtype_xmlid='mail.mt_note'
+            )
+
+    def _facturar_en_lote(self, agrupar_por_cliente=False):
+        """Factura muchas órdenes a la vez.
+
+        Prepara las líneas de todas las órdenes (empaques y servicios se leen
+        en lote gracias al prefetch, sin recalcular los totales almacenados),
+        opcionalmente junta las de un mismo cliente y empresa en una sola
+        factura y crea todas las facturas con un solo create. Las órdenes que
+        no están por facturar o no tienen líneas se omiten.
+
+        Retorna (facturas, omitidas).
+        """
+        ordenes = self.filtered(
+            lambda o: o.state in ('listo_liquidar', 'liquidado') and not o.factura_id
+        )
+        # Cargar empaques y servicios de todas las órdenes de una vez
+        ordenes.registro_bultos_ids.mapped('producto_empaque_id')
+        ordenes.linea_servicio_ids.mapped('producto_id')
+
+        grupos = {}
+        omitidas = self - ordenes
+        for orden in ordenes:
+            lines = orden._preparar_lineas_factura()
+            if not lines:
+                omitidas |= orden
+                continue
+            if agrupar_por_cliente:
+                clave = (orden.cliente_id, orden.company_id)
+                for line in lines:
+                    line['name'] = f"{orden.name} - {line['name']}"
+            else:
+                clave = orden
+            grupo = grupos.setdefault(clave, [self.browse(), []])
+            grupo[0] |= orden
+            grupo[1] += lines
+
+        if not grupos:
+            return self.env['account.move'], omitidas
+
+        facturas = self.env['account.move'].create([
+            grupo_ordenes._vals_factura(lines) for grupo_ordenes, lines in grupos.values()
+        ])
+        for (grupo_ordenes, _lines), factura in zip(grupos.values(), facturas):
+            grupo_ordenes.write({'factura_id': factura.id, 'state': 'facturado'})
+            grupo_ordenes._registrar_factura(factura)
+        return facturas, omitidas
+
+    def _encolar_facturacion(self, agrupar_por_cliente=False):
+        """Deja las órdenes en cola para que el cron las facture en lote."""
+        self.write({
+            'facturacion_lote': 'cliente' if agrupar_por_cliente else 'orden',
+            'facturacion_lote_usuario_id': self.env.uid,
+        })
+        cron = self.env.ref(self.CRON_FACTURACION, raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
+
+    @api.model
+    def _cron_facturar_en_lote(self):
+        """Factura una tanda de las órdenes en cola y reporta el avance.
+
+        Con agrupación por cliente la tanda incluye todas las órdenes en cola
+        de sus clientes, para no repartir un cliente en dos facturas. Si
+        quedan órdenes, _notify_progress hace que el cron vuelva a correr.
+        """
+        dominio_cola = [('facturacion_lote', '!=', False)]
+        tanda = self.search(dominio_cola, order='cliente_id, id', limit=self.LOTE_FACTURACION)
+        if not tanda:
+            return
+        por_cliente = tanda.filtered(lambda o: o.facturacion_lote == 'cliente')
+        if por_cliente:
+            tanda |= self.search(dominio_cola + [
+                ('facturacion_lote', '=', 'cliente'),
+                ('cliente_id', 'in', por_cliente.cliente_id.ids),
+            ])
+
+        avisos = {}
+        for modo in ('orden', 'cliente'):
+            ordenes = tanda.filtered(lambda o: o.facturacion_lote == modo)
+            if not ordenes:
+                continue
+            for usuario, ordenes_usuario in ordenes.grouped('facturacion_lote_usuario_id').items():
+                aviso = avisos.setdefault(usuario, {'facturas': 0, 'omitidas': 0, 'errores': []})
+                try:
+                    with self.env.cr.savepoint():
+                        facturas, omitidas = ordenes_usuario.with_user(
+                            usuario or self.env.user
+                        )._facturar_en_lote(agrupar_por_cliente=modo == 'cliente')
+                    aviso['facturas'] += len(facturas)
+                    aviso['omitidas'] += len(omitidas)
+                except Exception as e:
+                    _logger.exception('Facturación en lote de órdenes %s', ordenes_usuario.ids)
+                    aviso['errores'].append(str(e))
+
+        tanda.write({'facturacion_lote': False, 'facturacion_lote_usuario_id': False})
+        restantes = self.search_count(dominio_cola)
+        self.env['ir.cron']._notify_progress(done=len(tanda), remaining=restantes)
+        for usuario, aviso in avisos.items():
+            if usuario:
+                self._avisar_facturacion(usuario, aviso, restantes)
+
+    @api.model
+    def _avisar_facturacion(self, usuario, aviso, restantes):
+        """Notifica al usuario que encoló las órdenes el resultado de la tanda."""
+        partes = [f"{aviso['facturas']} facturas creadas"]
+        if aviso['omitidas']:
+            partes.append(f"{aviso['omitidas']} órdenes sin líneas o ya facturadas")
+        if restantes:
+            partes.append(f"{restantes} órdenes aún en cola")
+        if aviso['errores']:
+            partes.append('Errores: ' + '; '.join(aviso['errores']))
+        self.env['bus.bus']._sendone(usuario.partner_id, 'simple_notification', {
+            'title': 'Facturación en lote de órdenes de servicio',
+            'message': ', '.join(partes) + '.',
+            'type': 'danger' if aviso['errores'] else 'success',
+            'sticky': bool(aviso['errores']),
+        })
+
     def _preparar_lineas_factura(self):
         self.ensure_one()
         lines = []
@@ -3,6 +3,7 @@
 from datetime import datetime
 import pytz
 from odoo import models, fields, api
+from odoo.tools import float_compare
 from odoo.exceptions import UserError, ValidationError
 
 
@@ -232,6 +233,19 @@ class SecadoraPesaje(models.Model):
        help='Dirección del pesaje: Entrada o Salida')
 
     # Pesaje
+    bascula_id = fields.Many2one(
+        'secadora.bascula',
+        string='Báscula',
+        default=lambda self: self.env['secadora.bascula']._default_bascula(),
+        index=True,
+        tracking=True,
+        help='Báscula física donde se pesa el vehículo. Cada báscula tiene su '
+             'propio peso en vivo y su propio pesaje activo.',
+    )
+    bascula_codigo = fields.Char(
+        string='Código Báscula',
+        related='bascula_id.codigo',
+    )
     peso_actual = fields.Float(
         string='Peso Actual (Kg)',
         help='Peso en tiempo real desde la báscula',
@@ -241,9 +255,15 @@ class SecadoraPesaje(models.Model):
     peso_actual_fecha = fields.Datetime(
         string='Hora del Peso Actual',
         readonly=True,
-        help='Cuándo escribió el bridge el último peso en este pesaje. '
-             'Sin esta marca, un peso viejo quedaba pegado al registro y '
-             'las pesadas capturaban el peso de otro momento u otro camión.',
+        help='Cuándo cambió por última vez el peso que el bridge reporta para '
+             'este pesaje. Los heartbeats sin cambio no reescriben el registro: '
+             'la frescura se lleva en el peso en vivo de la báscula.',
+    )
+    peso_actual_estable = fields.Boolean(
+        string='Peso Estable',
+        readonly=True,
+        help='El bridge reportó el peso actual como estable (el vehículo '
+             'dejó de moverse). En ese caso peso_actual es el valor asentado.',
     )
     escuchando_bascula = fields.Boolean(
         string='Escuchando Báscula',
@@ -626,46 +646,60 @@ class SecadoraPesaje(models.Model):
     # Antigüedad máxima (segundos) del peso global para considerarlo "en vivo".
     PESO_GLOBAL_MAX_ANTIGUEDAD = 15
 
-    def _peso_bascula_reciente(self):
-        """Devuelve el último peso global de la báscula si es reciente, o 0.
+    def _codigo_bascula(self):
+        """Código de la báscula del pesaje (la predeterminada si no tiene,
+        como en _domain_bascula)."""
+        return (self[:1].bascula_id.codigo
+                or self.env['secadora.bascula'].sudo()._codigo_predeterminado())
+
+    def _lectura_bascula_reciente(self):
+        """Devuelve (peso, estable) del último peso global si es reciente, o (0, None).
 
         Reemplaza el antiguo fallback que tomaba el peso de OTRO pesaje activo
         (podía capturar el peso de un camión distinto). El peso global lo
-        publica el bridge para la báscula física; solo se acepta si llegó
-        hace menos de PESO_GLOBAL_MAX_ANTIGUEDAD segundos.
+        publica el bridge por cada báscula física (secadora.bascula.peso.vivo);
+        se lee el de la báscula del pesaje y solo se acepta si llegó hace menos
+        de PESO_GLOBAL_MAX_ANTIGUEDAD segundos.
         """
-        ICP = self.env['ir.config_parameter'].sudo()
-        try:
-            peso = float(ICP.get_param('bascula.last_weight', '0') or 0)
-        except (TypeError, ValueError):
-            return 0.0
-        if peso <= 0:
-            return 0.0
-        ts_str = ICP.get_param('bascula.last_weight_timestamp', False)
-        if not ts_str:
-            return 0.0
-        try:
-            # Tolerar el formato isoformat con 'T' de valores ya guardados.
-            ts = fields.Datetime.from_string(ts_str.replace('T', ' ')[:19])
-        except (TypeError, ValueError):
-            return 0.0
+        peso, ts, estable = self.env['secadora.bascula.peso.vivo'].sudo()._leer_estabilidad(
+            self._codigo_bascula())
+        if peso <= 0 or not ts:
+            return 0.0, None
         antiguedad = (fields.Datetime.now() - ts).total_seconds()
         if antiguedad > self.PESO_GLOBAL_MAX_ANTIGUEDAD:
-            return 0.0
-        return peso
+            return 0.0, None
+        return peso, estable
+
+    def _exigir_peso_estable(self, estable):
+        """Bloquea la pesada si se exige peso estable y la lectura no lo es.
+
+        Se activa en Ajustes (bascula.requiere_peso_estable). Sin el ajuste
+        se acepta cualquier lectura, como antes del detector de estabilidad.
+        """
+        requiere = self.env['ir.config_parameter'].sudo().get_param('bascula.requiere_peso_estable')
+        if requiere and not estable:
+            raise UserError(
+                'El peso de la báscula aún no está estable. Espera a que el '
+                'vehículo se detenga por completo y vuelve a intentarlo.'
+            )
 
     def _peso_actual_fresco(self):
-        """peso_actual del registro solo si el bridge lo escribió hace poco.
+        """peso_actual del registro solo si el bridge lo sigue reportando.
 
         Cuando el bridge se detiene, el último peso queda guardado en el
         registro; sin control de antigüedad, una pesada posterior capturaba
         ese valor viejo (de otro momento u otro camión) en vez del peso real
-        de la báscula.
+        de la báscula. El registro solo se escribe cuando el peso cambia, así
+        que la frescura sale del heartbeat del pesaje en el peso en vivo.
         """
         self.ensure_one()
-        if self.peso_actual <= 0 or not self.peso_actual_fecha:
+        if self.peso_actual <= 0:
+            return 0.0
+        pesaje_id, fecha = self.env['secadora.bascula.peso.vivo'].sudo()._leer_pesaje(
+            self._codigo_bascula())
+        if pesaje_id != self.id or not fecha:
             return 0.0
-        antiguedad = (fields.Datetime.now() - self.peso_actual_fecha).total_seconds()
+        antiguedad = (fields.Datetime.now() - fecha).total_seconds()
         if antiguedad > self.PESO_GLOBAL_MAX_ANTIGUEDAD:
             return 0.0
         return self.peso_actual
@@ -683,16 +717,20 @@ class SecadoraPesaje(models.Model):
 
             # Obtener peso actual de la báscula (solo si es reciente)
             peso_a_usar = record._peso_actual_fresco()
+            estable = record.peso_actual_estable
 
             # Si no hay peso_actual fresco en este registro (ej: registro
             # nuevo sin guardar, o bridge detenido), usar el peso global
             # reciente. NO se toma el peso de otro pesaje (otro camión).
             if peso_a_usar <= 0:
-                peso_global = self._peso_bascula_reciente()
+                peso_global, estable = record._lectura_bascula_reciente()
                 if peso_global > 0:
                     peso_a_usar = peso_global
                     record.peso_actual = peso_a_usar
                     record.peso_actual_fecha = fields.Datetime.now()
+                    record.peso_actual_estable = bool(estable)
+            if peso_a_usar > 0:
+                record._exigir_peso_estable(estable)
 
             # Validación según tipo de proceso
             if record.tipo_proceso == 'entrada':
@@ -724,15 +762,19 @@ class SecadoraPesaje(models.Model):
 
             # Obtener peso actual de la báscula (solo si es reciente)
             peso_a_usar = record._peso_actual_fresco()
+            estable = record.peso_actual_estable
 
             # Si no hay peso_actual fresco en este registro, usar el peso
             # global reciente. NO se toma el peso de otro pesaje.
             if peso_a_usar <= 0:
-                peso_global = self._peso_bascula_reciente()
+                peso_global, estable = record._lectura_bascula_reciente()
                 if peso_global > 0:
                     peso_a_usar = peso_global
                     record.peso_actual = peso_a_usar
                     record.peso_actual_fecha = fields.Datetime.now()
+                    record.peso_actual_estable = bool(estable)
+            if peso_a_usar > 0:
+                record._exigir_peso_estable(estable)
 
             # Validación según tipo de proceso
             if record.tipo_proceso == 'entrada':
@@ -882,7 +924,13 @@ class SecadoraPesaje(models.Model):
     # ===== MÉTODOS PARA INTEGRACIÓN CON BÁSCULA =====
 
     @api.model
-    def actualizar_peso_bascula(self, pesaje_id, peso, api_key):
+    def _api_key_valida(self, api_key):
+        """True si api_key es el token de un bridge activo (o la API Key de Ajustes)."""
+        return self.env['secadora.bascula.token'].sudo()._token_valido(api_key)
+
+    @api.model
+    def actualizar_peso_bascula(self, pesaje_id, peso, api_key, bascula=None,
+                                estable=None, peso_estable=None):
         """
         Método llamado por el bridge externo para actualizar el peso en tiempo real
 
@@ -890,15 +938,25 @@ class SecadoraPesaje(models.Model):
             pesaje_id: ID del pesaje activo
             peso: Peso actual en kg
             api_key: Clave de autenticación
+            bascula: Código de la báscula que leyó el peso (opcional)
+            estable: Si el detector del bridge considera el peso estable (opcional)
+            peso_estable: Peso asentado (mediana) cuando es estable (opcional)
 
         Returns:
             dict: {'success': bool, 'peso': float, 'message': str}
         """
-        # Validar API Key
-        api_key_config = self.env['ir.config_parameter'].sudo().get_param('bascula.api_key', '')
-        if not api_key_config or api_key != api_key_config:
+        if not self._api_key_valida(api_key):
             return {'success': False, 'message': 'API Key inválida'}
+        return self._aplicar_peso_bascula(pesaje_id, peso, bascula, estable, peso_estable)
 
+    @api.model
+    def _aplicar_peso_bascula(self, pesaje_id, peso, bascula=None,
+                              estable=None, peso_estable=None):
+        """Aplica una lectura dirigida a un pesaje (sin validar API key).
+
+        Usado por actualizar_peso_bascula y por el canal persistente
+        /api/bascula/stream, que autentica una sola vez por conexión.
+        """
         try:
             try:
                 pesaje_id = int(pesaje_id)
@@ -914,21 +972,31 @@ class SecadoraPesaje(models.Model):
             # ya provee la autenticación. Los métodos de usuario (action_primera_pesada,
             # action_segunda_pesada) sí filtran por empresa del usuario.
 
-            # Guardar como peso global para formularios nuevos (sin guardar).
-            # Formato estándar (no isoformat): el lector no entiende la 'T'.
-            self.env['ir.config_parameter'].sudo().set_param('bascula.last_weight', str(peso))
-            self.env['ir.config_parameter'].sudo().set_param(
-                'bascula.last_weight_timestamp',
-                fields.Datetime.to_string(fields.Datetime.now())
-            )
+            # Guardar como peso global de la báscula para formularios nuevos
+            # (sin guardar). Sin código explícito, la báscula del pesaje.
+            # También es el heartbeat del pesaje (ver _peso_actual_fresco).
+            self.env['secadora.bascula.peso.vivo'].sudo()._registrar(
+                float(peso), bascula or pesaje._codigo_bascula(), estable, peso_estable,
+                pesaje_id=pesaje.id)
+
+            # Con peso estable se guarda el valor asentado, no la muestra cruda.
+            if estable and peso_estable is not None:
+                peso = peso_estable
 
             # Actualizar el peso SOLO en el pesaje que está en la báscula.
             # El bridge nos dice cuál es (pesaje_id). Escribir a todos los
             # pesajes activos contaminaba el peso entre camiones simultáneos.
-            if pesaje.state in ('borrador', 'en_transito'):
+            # Solo se escribe si algo cambió: los heartbeats no generan
+            # UPDATE (ni tuplas muertas, tracking o bloqueos que choquen con
+            # el FOR UPDATE NOWAIT de las pesadas).
+            if pesaje.state in ('borrador', 'en_transito') and (
+                    float_compare(pesaje.peso_actual, float(peso), precision_digits=0) != 0
+                    or pesaje.peso_actual_estable != bool(estable)
+                    or not pesaje.escuchando_bascula):
                 pesaje.write({
                     'peso_actual': peso,
                     'peso_actual_fecha': fields.Datetime.now(),
+                    'peso_actual_estable': bool(estable),
                     'escuchando_bascula': True,
                 })
 
@@ -941,28 +1009,44 @@ class SecadoraPesaje(models.Model):
             return {'success': False, 'message': str(e)}
 
     @api.model
-    def obtener_pesaje_activo(self, api_key):
+    def obtener_pesaje_activo(self, api_key, bascula=None):
         """
         Obtiene el pesaje que está actualmente esperando pesaje
 
         Args:
             api_key: Clave de autenticación
+            bascula: Código de la báscula (opcional, por defecto la principal)
 
         Returns:
             dict: {'success': bool, 'pesaje_id': int, 'state': str}
         """
-        # Validar API Key
-        api_key_config = self.env['ir.config_parameter'].sudo().get_param('bascula.api_key', '')
-        if not api_key_config or api_key != api_key_config:
+        if not self._api_key_valida(api_key):
             return {'success': False, 'message': 'API Key inválida'}
+        return self._pesaje_activo_info(bascula)
 
-        # Buscar pesaje en borrador o en tránsito (más reciente)
+    @api.model
+    def _domain_bascula(self, bascula=None):
+        """Dominio de los pesajes que corresponden a una báscula.
+
+        Los pesajes sin báscula (anteriores a tener varias) se atribuyen a la
+        báscula predeterminada.
+        """
+        predeterminado = self.env['secadora.bascula'].sudo()._codigo_predeterminado()
+        codigo = bascula or predeterminado
+        if codigo == predeterminado:
+            return ['|', ('bascula_id', '=', False), ('bascula_id.codigo', '=', codigo)]
+        return [('bascula_id.codigo', '=', codigo)]
+
+    @api.model
+    def _pesaje_activo_info(self, bascula=None):
+        """Datos del pesaje activo de una báscula para el bridge (sin validar API key)."""
+        # Buscar pesaje en borrador o en tránsito (más reciente) de la báscula
         # Nota: No se filtra por company_id aquí porque este método se
         # llama desde el bridge externo (auth='none' + sudo). La API key
         # ya provee la autenticación.
         pesaje = self.search([
             ('state', 'in', ['borrador', 'en_transito']),
-        ], order='id desc', limit=1)
+        ] + self._domain_bascula(bascula), order='id desc', limit=1)
 
         if pesaje:
             return {
@@ -979,23 +1063,24 @@ class SecadoraPesaje(models.Model):
             }
 
     @api.model
-    def actualizar_peso_global_bascula(self, peso, api_key):
+    def actualizar_peso_global_bascula(self, peso, api_key, bascula=None,
+                                       estable=None, peso_estable=None):
         """Actualiza el peso global para formularios nuevos sin pesaje guardado."""
-        api_key_config = self.env['ir.config_parameter'].sudo().get_param('bascula.api_key', '')
-        if not api_key_config or api_key != api_key_config:
+        if not self._api_key_valida(api_key):
             return {'success': False, 'message': 'API Key inválida'}
+        return self._aplicar_peso_global(peso, bascula, estable, peso_estable)
 
+    @api.model
+    def _aplicar_peso_global(self, peso, bascula=None, estable=None, peso_estable=None):
+        """Guarda el peso global (sin validar API key)."""
         try:
             peso_val = float(peso)
             if peso_val < 0 or peso_val > 100000:
                 return {'success': False, 'message': 'Peso fuera de rango'}
 
-            self.env['ir.config_parameter'].sudo().set_param('bascula.last_weight', str(peso_val))
-            # Formato estándar de Odoo (espacio, no la 'T' de isoformat): el
-            # lector usa fields.Datetime.from_string y la 'T' lo rompía, con lo
-            # que el peso global se descartaba SIEMPRE por "viejo".
-            timestamp = fields.Datetime.to_string(fields.Datetime.now())
-            self.env['ir.config_parameter'].sudo().set_param('bascula.last_weight_timestamp', timestamp)
+            fecha = self.env['secadora.bascula.peso.vivo'].sudo()._registrar(
+                peso_val, bascula, estable, peso_estable)
+            timestamp = fields.Datetime.to_string(fecha)
 
             # Solo se guarda el peso global (para formularios nuevos sin guardar).
             # NO se propaga a los pesajes activos: cada pesaje recibe su peso
@@ -1005,6 +1090,7 @@ class SecadoraPesaje(models.Model):
             return {
                 'success': True,
                 'peso_actual': peso_val,
+                'estable': estable,
                 'timestamp': timestamp,
                 'message': 'Peso global actualizado'
             }
@@ -1012,19 +1098,14 @@ class SecadoraPesaje(models.Model):
             return {'success': False, 'message': str(e)}
 
     @api.model
-    def obtener_peso_actual_global_ui(self):
-        """Devuelve el último peso global para el widget en formularios nuevos."""
-        peso_str = self.env['ir.config_parameter'].sudo().get_param('bascula.last_weight', '0')
-        timestamp = self.env['ir.config_parameter'].sudo().get_param('bascula.last_weight_timestamp', False)
-        try:
-            peso_val = float(peso_str or 0)
-        except Exception:
-            peso_val = 0.0
-
+    def obtener_peso_actual_global_ui(self, bascula=None):
+        """Devuelve el último peso global de una báscula para el widget."""
+        peso_val, fecha, estable = self.env['secadora.bascula.peso.vivo'].sudo()._leer_estabilidad(bascula)
         return {
             'success': True,
             'peso_actual': peso_val,
-            'timestamp': timestamp,
+            'estable': estable,
+            'timestamp': fields.Datetime.to_string(fecha) if fecha else False,
         }
 
     def action_refrescar_peso(self):
@@ -1042,6 +1123,7 @@ class SecadoraPesaje(models.Model):
                     'No hay peso reciente de la báscula. Verifica que el '
                     'bridge/simulador esté corriendo y enviando datos.'
                 )
+            record._exigir_peso_estable(record.peso_actual_estable)
 
             if record.state == 'borrador':
                 # Asignar a peso bruto (entrada) o peso tara (salida)
@@ -13,6 +13,13 @@ class ResConfigSettings(models.TransientModel):
         help='Clave secreta para autenticación del bridge de báscula'
     )
 
+    bascula_requiere_peso_estable = fields.Boolean(
+        string='Exigir Peso Estable',
+        config_parameter='bascula.requiere_peso_estable',
+        help='Las pesadas solo capturan el peso cuando el bridge lo reporta '
+             'estable (el vehículo dejó de moverse sobre la báscula).',
+    )
+
     lugar_planta_id = fields.Many2one(
         'secadora.lugar',
         string='Planta Principal',
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, api
+from odoo.tools import SQL
+
+# Valor de una columna cuando la celda es NULL (o la relación no existe),
+# según el tipo del último campo de la ruta. Es lo que devolvería el ORM.
+VACIOS = {
+    'many2one': False,
+    'char': '',
+    'text': '',
+    'html': '',
+    'selection': '',
+    'date': '',
+    'datetime': '',
+    'boolean': False,
+    'integer': 0,
+    'float': 0.0,
+    'monetary': 0.0,
+}
+
+
+class SerializadorColumnas(models.AbstractModel):
+    """Serialización columnar de registros para los tableros.
+
+    Los tableros (grilla de arroz, transporte) envían cientos de registros
+    con el nombre de varios many2one. Recorrerlos con el ORM cuesta una
+    consulta por relación y por lote de prefetch, y cada dict repite todas
+    sus claves en el JSON. Aquí los campos se declaran una vez como rutas
+    ('tercero_id.name'), se leen en una sola consulta con un LEFT JOIN por
+    relación y salen como columnas: {'id': [...], 'tercero': [...], ...},
+    en el orden del recordset. En el cliente, filasDeColumnas() de
+    bascula/static/src/js/columnas.js las vuelve a convertir en objetos.
+
+    La consulta no aplica reglas de acceso: el recordset que se serializa ya
+    debe venir de un search() del usuario. Las relaciones se leen como las
+    mostraría el ORM (nombre del registro relacionado).
+    """
+    _name = 'secadora.serializador.columnas'
+    _description = 'Serializador Columnar de Tableros'
+
+    @api.model
+    def _serializar(self, records, campos):
+        """Serializa records en columnas.
+
+        campos: lista de (clave, ruta) o (clave, ruta, conversion). ruta es
+        un campo almacenado o una cadena de many2one almacenados terminada en
+        un campo almacenado ('pesaje_id.tercero_id.name'). conversion, si se
+        da, se aplica a cada valor ya normalizado (p. ej. bool).
+        """
+        columnas = {campo[0]: [] for campo in campos}
+        if not records:
+            return columnas
+
+        alias = records._table
+        query = records._as_query(ordered=False)
+        expresiones = [SQL.identifier(alias, 'id')]
+        tipos = []
+        for campo in campos:
+            expresion, field = self._columna_sql(records, alias, campo[1], query)
+            expresiones.append(expresion)
+            tipos.append(field.type)
+        self.env.cr.execute(query.select(*expresiones))
+        filas = {fila[0]: fila[1:] for fila in self.env.cr.fetchall()}
+
+        valores = zip(*(filas[record_id] for record_id in records._ids))
+        for campo, tipo, columna in zip(campos, tipos, valores):
+            vacio = VACIOS.get(tipo)
+            if tipo in ('float', 'monetary'):
+                # Los Float con digits son numeric en PostgreSQL (Decimal)
+                columna = [vacio if v is None else float(v) for v in columna]
+            elif tipo in ('date', 'datetime'):
+                columna = [vacio if v is None else str(v) for v in columna]
+            elif tipo == 'boolean':
+                columna = [bool(v) for v in columna]
+            else:
+                columna = [vacio if v is None else v for v in columna]
+            if len(campo) > 2:
+                columna = [campo[2](v) for v in columna]
+            columnas[campo[0]] = columna
+        return columnas
+
+    @api.model
+    def _columna_sql(self, model, alias, ruta, query):
+        """Expresión SQL y campo final de una ruta, agregando los JOIN."""
+        nombre, _sep, resto = ruta.partition('.')
+        field = model._fields[nombre]
+        if not field.store:
+            raise ValueError(f'{model._name}.{nombre} no está almacenado: no se puede serializar por SQL.')
+        if not resto:
+            return model._field_to_sql(alias, nombre, query), field
+        if field.type != 'many2one':
+            raise ValueError(f'{model._name}.{nombre} no es many2one: ruta inválida {ruta!r}.')
+        comodel = self.env[field.comodel_name]
+        coalias = query.make_alias(alias, nombre)
+        query.add_join('LEFT JOIN', coalias, comodel._table, SQL(
+            "%s = %s",
+            model._field_to_sql(alias, nombre, query),
+            SQL.identifier(coalias, 'id'),
+        ))
+        return self._columna_sql(comodel, coalias, resto, query)
@@ -1,11 +1,20 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 
 
 class ServicioRegla(models.Model):
+    """Regla que agrega un servicio automático a las órdenes de servicio.
+
+    Las reglas se consultan al iniciar cada orden, al cambiar su modalidad y
+    al recalcular sus líneas. En vez de recorrerlas todas, _indice_reglas
+    arma por empresa un índice (modalidad, tipo de operación, tipo de
+    vehículo) -> reglas, guardado en la ormcache y limpiado al crear,
+    editar o eliminar reglas. Solo la condición de peso se evalúa por orden.
+    """
     _name = 'secadora.servicio.regla'
     _description = 'Reglas de Servicios Automáticos'
+    _inherit = ['secadora.cache.mixin']
     _order = 'sequence, id'
 
     name = fields.Char(
@@ -122,6 +131,62 @@ class ServicioRegla(models.Model):
 
     # ==================== MÉTODOS ====================
 
+    @api.model
+    @tools.ormcache('company_id')
+    def _indice_reglas(self, company_id):
+        """Índice de las reglas activas que aplican a la empresa.
+
+        Retorna (indice, factores), con valores planos porque la ormcache
+        vive más que el cursor:
+        - indice: {(modalidad, tipo_operacion_id, tipo_vehiculo_id): ids}.
+          Una lista vacía en la regla ('todas' o sin tipos) se indexa
+          como 'todas' / None, que calza con cualquier orden.
+        - factores: {(producto_id, base_calculo): factor_multiplicador},
+          donde la regla de la empresa gana sobre la global.
+        """
+        reglas = self.sudo().search([
+            ('active', '=', True),
+            ('company_id', 'in', [False, company_id]),
+        ], order='sequence, id')
+        indice = {}
+        factores = {}
+        for regla in reglas:
+            for tipo_id in regla.tipo_servicio_ids.ids or [None]:
+                for tipo_vehiculo_id in regla.tipo_vehiculo_ids.ids or [None]:
+                    clave = (regla.modalidad_salida, tipo_id, tipo_vehiculo_id)
+                    indice.setdefault(clave, []).append(regla.id)
+            clave = (regla.producto_id.id, regla.base_calculo)
+            if clave not in factores or regla.company_id:
+                factores[clave] = regla.factor_multiplicador
+        return {clave: tuple(ids) for clave, ids in indice.items()}, factores
+
+    @api.model
+    def _reglas_aplicables(self, orden):
+        """Reglas activas que aplican a la orden, en orden de secuencia.
+
+        Las condiciones de modalidad, tipo de operación y tipo de vehículo se
+        resuelven con el índice (un acceso por combinación de la orden); solo
+        la condición de peso se evalúa aquí.
+        """
+        indice, _factores = self._indice_reglas(orden.company_id.id)
+        pesajes = orden.pesaje_entrada_ids | orden.pesaje_salida_ids
+        modalidades = ['todas'] + ([orden.modalidad_salida] if orden.modalidad_salida else [])
+        tipos = [None] + pesajes.tipo_operacion_id.ids
+        tipos_vehiculo = [None] + pesajes.vehiculo_id.tipo_vehiculo_id.ids
+        regla_ids = set()
+        for modalidad in modalidades:
+            for tipo_id in tipos:
+                for tipo_vehiculo_id in tipos_vehiculo:
+                    regla_ids.update(indice.get((modalidad, tipo_id, tipo_vehiculo_id), ()))
+        reglas = self.browse(sorted(regla_ids)).sorted(lambda r: (r.sequence, r.id))
+        return reglas.filtered(lambda r: r._cumple_condicion_peso(orden))
+
+    @api.model
+    def _factor_para(self, company_id, producto_id, base_calculo):
+        """Factor multiplicador de la regla de (producto, base), 1.0 si no hay."""
+        _indice, factores = self._indice_reglas(company_id)
+        return factores.get((producto_id, base_calculo), 1.0)
+
     @api.onchange('producto_id')
     def _onchange_producto_id(self):
         """Actualizar precio unitario cuando se selecciona un producto"""
@@ -159,6 +224,11 @@ class ServicioRegla(models.Model):
                 return False
 
         # Evaluar condición
+        return self._cumple_condicion_peso(orden)
+
+    def _cumple_condicion_peso(self, orden):
+        """Evalúa la condición de peso de la regla sobre la orden."""
+        self.ensure_one()
         if self.condicion == 'siempre':
             return True
         elif self.condicion == 'peso_minimo':
@@ -184,3 +254,23 @@ class ServicioRegla(models.Model):
             return orden.total_bultos * self.factor_multiplicador
 
         return 0.0
+
+    def _vals_linea_servicio(self, orden):
+        """Valores de la línea automática que esta regla agrega a la orden."""
+        self.ensure_one()
+        # Determinar precio a usar
+        if not self.incluir_en_factura:
+            precio = 0.0
+        elif self.precio_unitario:
+            precio = self.precio_unitario
+        else:
+            precio = self.producto_id.list_price
+        return {
+            'orden_id': orden.id,
+            'producto_id': self.producto_id.id,
+            'base_calculo': self.base_calculo,
+            'cantidad': self.calcular_cantidad(orden),
+            'precio_unitario': precio,
+            'descripcion': self.name,
+            'es_automatica': True,
+        }
@@ -0,0 +1,19 @@
+/** @odoo-module **/
+
+/**
+ * Convierte la salida columnar de secadora.serializador.columnas
+ * ({clave: [valores...]}) en una lista de objetos {clave: valor}.
+ */
+export function filasDeColumnas(columnas) {
+    const claves = Object.keys(columnas || {});
+    const total = claves.length ? columnas[claves[0]].length : 0;
+    const filas = new Array(total);
+    for (let i = 0; i < total; i++) {
+        const fila = {};
+        for (const clave of claves) {
+            fila[clave] = columnas[clave][i];
+        }
+        filas[i] = fila;
+    }
+    return filas;
+}
@@ -4,78 +4,105 @@ import { registry } from "@web/core/registry";
 import { Component, useState, onMounted, onWillUnmount } from "@odoo/owl";
 import { useService } from "@web/core/utils/hooks";
 
+// Canal y tipo de notificación que publica secadora.bascula.peso.vivo
+// cada vez que el bridge reporta un peso distinto.
+const CANAL_PESO = "bascula_peso";
+const NOTIFICACION_PESO = "bascula/peso";
+
 class PesoActualField extends Component {
     setup() {
         this.orm = useService("orm");
+        this.busService = useService("bus_service");
         this.state = useState({
             peso: this.props.record.data.peso_actual || 0.0,
+            // null = el bridge no reporta estabilidad
+            estable: this.props.record.data.peso_actual_estable ?? null,
             timestamp: new Date().toLocaleTimeString("es-CO"),
         });
 
+        this.onPesoNotificado = (payload) => {
+            // Con varias básculas, solo interesa la del pesaje
+            if (payload.bascula === this.codigoBascula) {
+                this.aplicarPeso(payload.peso_actual, payload.estable);
+            }
+        };
+        this.onReconectado = () => this.updatePeso();
+
         onMounted(() => {
-            // Leer peso inmediatamente al montar (no esperar 2 seg)
+            // Leer peso inmediatamente al montar; después solo llegan los
+            // cambios por el bus (sin polling).
             this.updatePeso();
-            this.startPolling();
+            this.busService.addChannel(CANAL_PESO);
+            this.busService.subscribe(NOTIFICACION_PESO, this.onPesoNotificado);
+            // Tras una desconexión se pudieron perder cambios: releer una vez.
+            this.busService.addEventListener("reconnect", this.onReconectado);
         });
 
         onWillUnmount(() => {
-            this.stopPolling();
+            // El canal no se elimina: otros formularios abiertos en la
+            // misma pestaña pueden seguir usándolo.
+            this.busService.unsubscribe(NOTIFICACION_PESO, this.onPesoNotificado);
+            this.busService.removeEventListener("reconnect", this.onReconectado);
         });
     }
 
-    startPolling() {
-        this.pollInterval = setInterval(async () => {
-            await this.updatePeso();
-        }, 2000);
+    get codigoBascula() {
+        return this.props.record?.data?.bascula_codigo || "principal";
     }
 
-    stopPolling() {
-        if (this.pollInterval) {
-            clearInterval(this.pollInterval);
-            this.pollInterval = null;
+    get cerrado() {
+        const state = this.props.record?.data?.state;
+        return state === "completado" || state === "cancelado";
+    }
+
+    aplicarPeso(nuevoPeso, estable = null) {
+        if (this.cerrado) {
+            return;
+        }
+        this.state.estable = estable;
+        // Solo actualizar el state del widget, NUNCA tocar record.data
+        // para evitar que Odoo envíe peso_actual en el save/create
+        if (Math.abs(this.state.peso - nuevoPeso) > 0.01) {
+            this.state.peso = nuevoPeso;
+            this.state.timestamp = new Date().toLocaleTimeString("es-CO");
         }
     }
 
     async updatePeso() {
-        const record = this.props.record;
-        const state = record?.data?.state;
-
-        if (state === "completado" || state === "cancelado") {
-            this.stopPolling();
+        if (this.cerrado) {
             return;
         }
+        const record = this.props.record;
 
         try {
             // Siempre leer el peso global (es la fuente de verdad de la báscula)
             const globalResult = await this.orm.call(
                 "secadora.pesaje",
                 "obtener_peso_actual_global_ui",
-                []
+                [this.codigoBascula]
             );
 
             let nuevoPeso = 0.0;
+            let estable = null;
 
             if (globalResult && globalResult.success && globalResult.peso_actual > 0.01) {
                 nuevoPeso = globalResult.peso_actual;
+                estable = globalResult.estable ?? null;
             } else if (record && record.resId) {
                 // Fallback: leer del registro si no hay peso global
                 const result = await this.orm.call(
                     "secadora.pesaje",
                     "read",
-                    [[record.resId], ["peso_actual"]],
+                    [[record.resId], ["peso_actual", "peso_actual_estable"]],
                     { context: { bin_size: false } }
                 );
                 if (result && result.length > 0) {
                     nuevoPeso = result[0].peso_actual || 0.0;
+                    estable = result[0].peso_actual_estable;
                 }
             }
 
-            // Solo actualizar el state del widget, NUNCA tocar record.data
-            // para evitar que Odoo envíe peso_actual en el save/create
-            if (Math.abs(this.state.peso - nuevoPeso) > 0.01) {
-                this.state.peso = nuevoPeso;
-                this.state.timestamp = new Date().toLocaleTimeString("es-CO");
-            }
+            this.aplicarPeso(nuevoPeso, estable);
 
         } catch (error) {
             console.error("[PESO WIDGET] Error updating peso:", error);
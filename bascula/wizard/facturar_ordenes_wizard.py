@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+
+
+class FacturarOrdenesWizard(models.TransientModel):
+    _name = 'secadora.facturar.ordenes.wizard'
+    _description = 'Facturar Órdenes de Servicio en Lote'
+
+    orden_ids = fields.Many2many(
+        'secadora.orden.servicio',
+        string='Órdenes',
+        domain=[('state', '=', 'listo_liquidar'), ('factura_id', '=', False)],
+        default=lambda self: self._default_orden_ids(),
+    )
+    agrupar_por_cliente = fields.Boolean(
+        string='Una factura por cliente',
+        help='Junta en una sola factura las órdenes de un mismo cliente y empresa',
+    )
+    en_segundo_plano = fields.Boolean(
+        string='Procesar en segundo plano',
+        default=True,
+        help='Las facturas se crean en tandas desde un proceso programado; '
+             'al terminar se notifica el resultado.',
+    )
+    cantidad = fields.Integer(
+        string='Órdenes a Facturar',
+        compute='_compute_cantidad',
+    )
+
+    @api.model
+    def _default_orden_ids(self):
+        """Órdenes seleccionadas en la lista que están listas para liquidar;
+        sin selección, todas las de la empresa.
+
+        El menú Acción siempre envía active_domain (el filtro de la lista)
+        junto con active_ids, y "seleccionar todo" ya llega expandido en
+        active_ids: el dominio solo se usa si no hay active_ids.
+        """
+        Orden = self.env['secadora.orden.servicio']
+        domain = [('state', '=', 'listo_liquidar'), ('factura_id', '=', False)]
+        ctx = self.env.context
+        if ctx.get('active_model') == 'secadora.orden.servicio':
+            if ctx.get('active_ids'):
+                domain.append(('id', 'in', ctx['active_ids']))
+            elif ctx.get('active_domain'):
+                domain += ctx['active_domain']
+        else:
+            domain.append(('company_id', '=', self.env.company.id))
+        return Orden.search(domain)
+
+    @api.depends('orden_ids')
+    def _compute_cantidad(self):
+        for wizard in self:
+            wizard.cantidad = len(wizard.orden_ids)
+
+    def action_facturar(self):
+        self.ensure_one()
+        ordenes = self.orden_ids.filtered(
+            lambda o: o.state == 'listo_liquidar' and not o.factura_id and not o.facturacion_lote
+        )
+        if not ordenes:
+            raise UserError('No hay órdenes listas para liquidar sin factura (ni en cola de facturación).')
+
+        if self.en_segundo_plano:
+            ordenes._encolar_facturacion(self.agrupar_por_cliente)
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'title': 'Facturación en lote',
+                    'message': f'{len(ordenes)} órdenes en cola. Se le avisará al terminar.',
+                    'type': 'info',
+                    'next': {'type': 'ir.actions.act_window_close'},
+                },
+            }
+
+        facturas, _omitidas = ordenes._facturar_en_lote(self.agrupar_por_cliente)
+        if not facturas:
+            raise UserError('No hay líneas para facturar. Verifica servicios y/o empaques.')
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Facturas Generadas',
+            'res_model': 'account.move',
+            'view_mode': 'list,form',
+            'domain': [('id', 'in', facturas.ids)],
+            'target': 'current',
+        }
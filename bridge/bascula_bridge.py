@@ -15,15 +15,20 @@ import serial
 from serial.tools import list_ports
 import requests
 import time
-import re
+import json
+import gzip
 import logging
+import threading
 import sys
 import os
 import xmlrpc.client
 import secrets
-from datetime import datetime
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 
+from cola_lecturas import ColaLecturas
+from filtro_estabilidad import FiltroEstabilidad, parsear_linea
+
 load_dotenv()
 
 # ===== CONFIGURACIÓN =====
@@ -73,6 +78,51 @@ STOP_BITS_MAP = {
 # Intervalo de lectura (en segundos)
 INTERVALO_LECTURA = float(os.getenv("BASCULA_INTERVALO_LECTURA", "0.5"))  # Leer cada 500ms
 
+# Detector de estabilidad: muestras en la ventana y desviación estándar
+# máxima (kg) para considerar que el vehículo ya se detuvo.
+FILTRO_VENTANA = int(os.getenv("BASCULA_FILTRO_VENTANA", "8"))
+FILTRO_DESVIACION_MAX = float(os.getenv("BASCULA_FILTRO_DESVIACION_MAX", "5"))
+# Variación del peso (kg) que cuenta como cambio para enviar a Odoo;
+# por debajo de esto solo viaja el heartbeat.
+FILTRO_TOLERANCIA_CAMBIO = float(os.getenv("BASCULA_FILTRO_TOLERANCIA_CAMBIO", "2"))
+
+# Modo de envío a Odoo:
+#   "stream" = canal persistente (un POST chunked por ventana, conexión reutilizada)
+#   "http"   = un POST por lectura (modo anterior, se usa también como respaldo)
+MODO_ENVIO = os.getenv("BASCULA_MODO_ENVIO", "stream").lower()
+
+# Duración de cada ventana del stream (segundos). Al cerrar la ventana Odoo
+# responde con el pesaje activo, por eso reemplaza la consulta periódica.
+STREAM_VENTANA = float(os.getenv("BASCULA_STREAM_VENTANA", "5"))
+
+# Si el stream falla, usar HTTP durante estos segundos antes de reintentarlo
+STREAM_REINTENTO = float(os.getenv("BASCULA_STREAM_REINTENTO", "60"))
+
+# Cola local de lecturas (store-and-forward hacia /api/bascula/lecturas_lote)
+COLA_ARCHIVO = os.getenv("BASCULA_COLA_ARCHIVO", "datos/cola_lecturas.sqlite3")
+LOTE_INTERVALO = float(os.getenv("BASCULA_LOTE_INTERVALO", "10"))  # Enviar lote cada 10s
+LOTE_MAX_LECTURAS = int(os.getenv("BASCULA_LOTE_MAX_LECTURAS", "1000"))
+
+# Identificador de la báscula en Odoo (cuando hay una sola)
+BASCULA_ID = os.getenv("BASCULA_ID", "principal")
+
+# Varias básculas en el mismo PC: "principal=COM3,auxiliar=COM4".
+# Vacío = una sola báscula BASCULA_ID en BASCULA_PUERTO_SERIAL.
+BASCULA_PUERTOS = os.getenv("BASCULA_PUERTOS", "")
+
+
+def _parsear_basculas(texto):
+    """Lista de (bascula_id, puerto) desde BASCULA_PUERTOS."""
+    basculas = []
+    for parte in texto.split(','):
+        bascula_id, _, puerto = parte.strip().partition('=')
+        if bascula_id.strip() and puerto.strip():
+            basculas.append((bascula_id.strip(), puerto.strip()))
+    return basculas or [(BASCULA_ID, PUERTO_SERIAL)]
+
+
+BASCULAS = _parsear_basculas(BASCULA_PUERTOS)
+
 # Nivel de logging
 log_level_name = os.getenv("BASCULA_LOG_LEVEL", "INFO").upper()
 LOG_LEVEL = getattr(logging, log_level_name, logging.INFO)
@@ -98,22 +148,32 @@ if sys.platform == 'win32':
 logger = logging.getLogger(__name__)
 
 
-class BasculaBridge:
-    """Bridge entre báscula Prometálicos y Odoo"""
+class LectorBascula:
+    """Una báscula física conectada a un puerto serial.
 
-    # Reenviar peso cada N ciclos aunque no cambie (heartbeat)
-    HEARTBEAT_CICLOS = 6  # ~3 segundos con intervalo 0.5s
+    Cada lector corre en su propio hilo leyendo el puerto sin bloquear a
+    las demás básculas; el bridge toma la última lectura de cada una en su
+    ciclo de envío. También guarda el estado de envío de esa báscula
+    (pesaje activo, último peso enviado, heartbeat).
+    """
 
-    def __init__(self):
+    def __init__(self, bascula_id, puerto_serial):
+        self.bascula_id = bascula_id
+        self.puerto_serial = puerto_serial
         self.serial_conn = None
+        self.conectado = False
         self.pesaje_activo = None
         self.ultimo_peso = None
         self.ultimo_peso_global = None
         self.ciclos_sin_envio = 0
         self.ciclos_sin_envio_global = 0
-        self.conectado = False
-        self.api_key = API_KEY
-        self.puerto_serial = PUERTO_SERIAL
+        self.ultimo_estable = None
+        self.filtro = FiltroEstabilidad(FILTRO_VENTANA, FILTRO_DESVIACION_MAX)
+        self._ultima_lectura = None
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return f"{self.bascula_id} ({self.puerto_serial})"
 
     def _es_puerto_candidato(self, port_info):
         texto = f"{port_info.device} {port_info.description} {port_info.hwid}".lower()
@@ -141,48 +201,7 @@ class BasculaBridge:
         logger.info(f"🔎 Puerto detectado automáticamente: {elegido}")
         return elegido
 
-    def _tiene_credenciales(self):
-        return all([ODOO_DB, ODOO_USER, ODOO_PASSWORD])
-
-    def _obtener_api_key_desde_credenciales(self):
-        """Obtiene (o crea) la API key de báscula desde Odoo usando credenciales."""
-        try:
-            common = xmlrpc.client.ServerProxy(f"{ODOO_URL}/xmlrpc/2/common")
-            uid = common.authenticate(ODOO_DB, ODOO_USER, ODOO_PASSWORD, {})
-            if not uid:
-                logger.error("❌ No se pudo autenticar en Odoo con las credenciales suministradas")
-                return None
-
-            models = xmlrpc.client.ServerProxy(f"{ODOO_URL}/xmlrpc/2/object")
-            api_key = models.execute_kw(
-                ODOO_DB,
-                uid,
-                ODOO_PASSWORD,
-                'ir.config_parameter',
-                'get_param',
-                ['bascula.api_key', '']
-            )
-
-            if api_key:
-                logger.info("✅ API key obtenida desde Odoo con credenciales")
-                return api_key
-
-            nueva_api_key = secrets.token_urlsafe(32)
-            models.execute_kw(
-                ODOO_DB,
-                uid,
-                ODOO_PASSWORD,
-                'ir.config_parameter',
-                'set_param',
-                ['bascula.api_key', nueva_api_key]
-            )
-            logger.info("✅ Se creó automáticamente 'bascula.api_key' en Odoo")
-            return nueva_api_key
-        except Exception as e:
-            logger.error(f"❌ No se pudo obtener API key desde credenciales: {e}")
-            return None
-
-    def conectar_bascula(self):
+    def conectar(self):
         """Conecta al puerto serial de la báscula"""
         try:
             puerto = self._detectar_puerto_bascula()
@@ -191,7 +210,7 @@ class BasculaBridge:
                 return False
 
             self.puerto_serial = puerto
-            logger.info(f"Conectando a báscula en puerto {self.puerto_serial}...")
+            logger.info(f"Conectando a báscula {self.bascula_id} en puerto {self.puerto_serial}...")
             bytesize = DATA_BITS_MAP.get(DATA_BITS, serial.EIGHTBITS)
             parity = PARITY_MAP.get(PARITY, serial.PARITY_NONE)
             stopbits = STOP_BITS_MAP.get(STOP_BITS, serial.STOPBITS_ONE)
@@ -205,10 +224,10 @@ class BasculaBridge:
                 timeout=TIMEOUT
             )
             self.conectado = True
-            logger.info("✅ Conectado a báscula Prometálicos")
+            logger.info(f"✅ Conectado a báscula Prometálicos {self}")
             return True
         except serial.SerialException as e:
-            logger.error(f"❌ Error conectando a báscula: {e}")
+            logger.error(f"❌ Error conectando a báscula {self.bascula_id}: {e}")
             logger.error("Verifica que:")
             logger.error("  - El puerto COM es correcto (o usa BASCULA_PUERTO_SERIAL=auto)")
             logger.error("  - La báscula está encendida")
@@ -218,8 +237,18 @@ class BasculaBridge:
             logger.error(f"❌ Error inesperado: {e}")
             return False
 
+    def cerrar(self):
+        if self.serial_conn and self.serial_conn.is_open:
+            self.serial_conn.close()
+            logger.info(f"🔌 Conexión serial cerrada: {self}")
+
     def leer_peso(self):
-        """Lee el peso actual de la báscula (descarta datos viejos del buffer)"""
+        """Lee la báscula y alimenta el filtro de estabilidad.
+
+        Procesa TODAS las tramas disponibles (el buffer queda vacío, sin
+        datos viejos) y devuelve la lectura del filtro tras la última:
+        (peso_crudo, estable, peso_asentado), o None si no llegó nada.
+        """
         try:
             if not self.serial_conn or not self.serial_conn.is_open:
                 return None
@@ -227,49 +256,147 @@ class BasculaBridge:
             if self.serial_conn.in_waiting == 0:
                 return None
 
-            # Leer TODAS las líneas disponibles y quedarse con la última válida.
-            # Esto evita que el buffer se llene con datos viejos.
-            ultima_linea = None
+            hubo_muestra = False
             while self.serial_conn.in_waiting > 0:
                 linea = self.serial_conn.readline().decode('ascii', errors='ignore').strip()
-                if linea:
-                    ultima_linea = linea
-
-            if not ultima_linea:
-                return None
+                if not linea:
+                    continue
 
-            # Prometálicos típicamente envía:
-            # "  12345.50 kg" o "  12345.50 Kg" o solo "12345.50"
-            # Extraer solo el número usando regex
-            match = re.search(r'([\d.]+)', ultima_linea)
-            if match:
-                peso_str = match.group(1)
-                peso = float(peso_str)
+                peso, estado_indicador = parsear_linea(linea)
+                if peso is None:
+                    continue
 
                 # Validar que el peso sea razonable (entre 0 y 100,000 kg)
-                if 0 <= peso <= 100000:
-                    return peso
-                else:
-                    logger.warning(f"Peso fuera de rango: {peso} kg")
-                    return None
+                if not 0 <= peso <= 100000:
+                    logger.warning(f"Peso fuera de rango ({self.bascula_id}): {peso} kg")
+                    continue
+
+                self.filtro.agregar(peso, estado_indicador)
+                hubo_muestra = True
+
+            return self.filtro.lectura() if hubo_muestra else None
 
         except ValueError as e:
             logger.debug(f"Error parseando peso: {e}")
             return None
         except Exception as e:
-            logger.error(f"Error leyendo báscula: {e}")
+            logger.error(f"Error leyendo báscula {self.bascula_id}: {e}")
             return None
 
-    def obtener_pesaje_activo(self):
-        """Obtiene el ID del pesaje activo desde Odoo"""
+    def bucle_lectura(self, detener):
+        """Hilo lector: guarda la última lectura válida del puerto."""
+        while not detener.is_set():
+            lectura = self.leer_peso()
+            if lectura is not None:
+                with self._lock:
+                    self._ultima_lectura = lectura
+            detener.wait(INTERVALO_LECTURA)
+
+    def tomar_lectura(self):
+        """Última lectura pendiente de procesar (None si no llegó ninguna nueva).
+
+        Returns:
+            tuple: (peso_crudo, estable, peso_asentado) o None
+        """
+        with self._lock:
+            lectura = self._ultima_lectura
+            self._ultima_lectura = None
+        return lectura
+
+    def hay_cambio(self, peso, estable):
+        """True si la lectura difiere de la última enviada a Odoo.
+
+        El ruido por debajo de FILTRO_TOLERANCIA_CAMBIO no cuenta como
+        cambio; que el peso se estabilice (o deje de estarlo) sí.
+        """
+        if self.ultimo_peso_global is None or estable != self.ultimo_estable:
+            return True
+        return abs(peso - self.ultimo_peso_global) > FILTRO_TOLERANCIA_CAMBIO
+
+    def marcar_enviado(self, peso, estable):
+        self.ultimo_peso_global = peso
+        self.ultimo_estable = estable
+        self.ciclos_sin_envio_global = 0
+
+    def actualizar_pesaje_activo(self, nuevo_pesaje):
+        """Registra el pesaje activo que Odoo reporta para esta báscula."""
+        if nuevo_pesaje != self.pesaje_activo:
+            # Resetear peso al cambiar de pesaje
+            self.ultimo_peso = None
+            self.ciclos_sin_envio = 0
+            self.pesaje_activo = nuevo_pesaje
+            if self.pesaje_activo:
+                logger.info(f"\n🎯 Nuevo pesaje activo en {self.bascula_id}: {self.pesaje_activo}")
+
+
+class BasculaBridge:
+    """Bridge entre básculas Prometálicos y Odoo"""
+
+    # Reenviar peso cada N ciclos aunque no cambie (heartbeat)
+    HEARTBEAT_CICLOS = 6  # ~3 segundos con intervalo 0.5s
+
+    def __init__(self):
+        self.lectores = [LectorBascula(bascula_id, puerto) for bascula_id, puerto in BASCULAS]
+        self.api_key = API_KEY
+        # Sesión compartida: keep-alive y reutilización de la conexión TLS
+        # en vez de un handshake nuevo por cada POST.
+        self.session = requests.Session()
+        self.session.headers.update({'X-Odoo-Database': ODOO_DB})
+        self.stream_suspendido_hasta = 0.0
+        self.cola = ColaLecturas(COLA_ARCHIVO)
+        self.detener = threading.Event()
+
+    def _tiene_credenciales(self):
+        return all([ODOO_DB, ODOO_USER, ODOO_PASSWORD])
+
+    def _obtener_api_key_desde_credenciales(self):
+        """Obtiene (o crea) la API key de báscula desde Odoo usando credenciales."""
+        try:
+            common = xmlrpc.client.ServerProxy(f"{ODOO_URL}/xmlrpc/2/common")
+            uid = common.authenticate(ODOO_DB, ODOO_USER, ODOO_PASSWORD, {})
+            if not uid:
+                logger.error("❌ No se pudo autenticar en Odoo con las credenciales suministradas")
+                return None
+
+            models = xmlrpc.client.ServerProxy(f"{ODOO_URL}/xmlrpc/2/object")
+            api_key = models.execute_kw(
+                ODOO_DB,
+                uid,
+                ODOO_PASSWORD,
+                'ir.config_parameter',
+                'get_param',
+                ['bascula.api_key', '']
+            )
+
+            if api_key:
+                logger.info("✅ API key obtenida desde Odoo con credenciales")
+                return api_key
+
+            nueva_api_key = secrets.token_urlsafe(32)
+            models.execute_kw(
+                ODOO_DB,
+                uid,
+                ODOO_PASSWORD,
+                'ir.config_parameter',
+                'set_param',
+                ['bascula.api_key', nueva_api_key]
+            )
+            logger.info("✅ Se creó automáticamente 'bascula.api_key' en Odoo")
+            return nueva_api_key
+        except Exception as e:
+            logger.error(f"❌ No se pudo obtener API key desde credenciales: {e}")
+            return None
+
+    def obtener_pesaje_activo(self, lector):
+        """Obtiene el ID del pesaje activo de una báscula desde Odoo"""
         try:
             url = f"{ODOO_URL}/api/bascula/pesaje_activo"
-            payload = {"api_key": self.api_key, "db": ODOO_DB}
+            payload = {"api_key": self.api_key, "db": ODOO_DB, "bascula": lector.bascula_id}
 
-            response = requests.post(
+            response = self.session.post(
                 url,
                 json=payload,
-                headers={'Content-Type': 'application/json', 'X-Odoo-Database': ODOO_DB},
+                headers={'Content-Type': 'application/json'},
                 timeout=5
             )
 
@@ -280,7 +407,7 @@ class BasculaBridge:
                 if result.get('success'):
                     pesaje_id = result.get('pesaje_id')
                     placa = result.get('placa', '')
-                    logger.info(f"📋 Pesaje activo: ID {pesaje_id}, Placa: {placa}")
+                    logger.info(f"📋 Pesaje activo en {lector.bascula_id}: ID {pesaje_id}, Placa: {placa}")
                     return pesaje_id
                 else:
                     logger.debug(f"No hay pesajes activos: {result.get('message')}")
@@ -299,21 +426,24 @@ class BasculaBridge:
             logger.error(f"❌ Error obteniendo pesaje activo: {e}")
             return None
 
-    def enviar_peso_odoo(self, pesaje_id, peso):
-        """Envía el peso actual a Odoo"""
+    def enviar_peso_odoo(self, lector, peso, estable=None, peso_estable=None):
+        """Envía el peso actual de una báscula a su pesaje activo en Odoo"""
         try:
             url = f"{ODOO_URL}/api/bascula/actualizar_peso"
             payload = {
-                "pesaje_id": pesaje_id,
+                "pesaje_id": lector.pesaje_activo,
+                "bascula": lector.bascula_id,
                 "peso": peso,
+                "estable": estable,
+                "peso_estable": peso_estable,
                 "api_key": self.api_key,
                 "db": ODOO_DB,
             }
 
-            response = requests.post(
+            response = self.session.post(
                 url,
                 json=payload,
-                headers={'Content-Type': 'application/json', 'X-Odoo-Database': ODOO_DB},
+                headers={'Content-Type': 'application/json'},
                 timeout=3
             )
 
@@ -334,20 +464,23 @@ class BasculaBridge:
             logger.error(f"❌ Error enviando peso: {e}")
             return False
 
-    def enviar_peso_global_odoo(self, peso):
+    def enviar_peso_global_odoo(self, lector, peso, estable=None, peso_estable=None):
         """Envía el peso global a Odoo para formularios nuevos sin guardar."""
         try:
             url = f"{ODOO_URL}/api/bascula/actualizar_peso_global"
             payload = {
+                "bascula": lector.bascula_id,
                 "peso": peso,
+                "estable": estable,
+                "peso_estable": peso_estable,
                 "api_key": self.api_key,
                 "db": ODOO_DB,
             }
 
-            response = requests.post(
+            response = self.session.post(
                 url,
                 json=payload,
-                headers={'Content-Type': 'application/json', 'X-Odoo-Database': ODOO_DB},
+                headers={'Content-Type': 'application/json'},
                 timeout=3
             )
 
@@ -390,72 +523,250 @@ class BasculaBridge:
 
         return True
 
+    def _usar_stream(self):
+        return MODO_ENVIO == 'stream' and time.monotonic() >= self.stream_suspendido_hasta
+
+    def _generar_ventana_stream(self):
+        """Cuerpo NDJSON de una ventana del stream.
+
+        Toma la última lectura de cada báscula durante STREAM_VENTANA
+        segundos y produce una línea por lectura que cambió (o por
+        heartbeat), etiquetada con la báscula. La línea lleva el pesaje
+        activo de esa báscula cuando lo hay; Odoo actualiza además su peso
+        global. Todas las básculas comparten la misma conexión.
+        """
+        cabecera = {
+            "api_key": self.api_key,
+            "db": ODOO_DB,
+            "basculas": [lector.bascula_id for lector in self.lectores],
+        }
+        yield (json.dumps(cabecera) + "\n").encode('utf-8')
+
+        fin = time.monotonic() + STREAM_VENTANA
+        while time.monotonic() < fin:
+            for lector in self.lectores:
+                tomada = lector.tomar_lectura()
+                if tomada is None:
+                    continue
+                peso, estable, peso_estable = tomada
+                lector.ciclos_sin_envio_global += 1
+                cambio = lector.hay_cambio(peso, estable)
+                heartbeat = lector.ciclos_sin_envio_global >= self.HEARTBEAT_CICLOS
+
+                if cambio or heartbeat:
+                    lectura = {
+                        "bascula": lector.bascula_id,
+                        "peso": peso,
+                        "estable": estable,
+                        "peso_estable": peso_estable,
+                    }
+                    if lector.pesaje_activo:
+                        lectura["pesaje_id"] = lector.pesaje_activo
+                        if peso != lector.ultimo_peso:
+                            estado = "estable" if estable else "en movimiento"
+                            logger.info(f"⚖️  Peso leído ({lector.bascula_id}): {peso:.2f} kg ({estado})")
+                        lector.ultimo_peso = peso
+                    lector.marcar_enviado(peso, estable)
+                    self.encolar_lectura(lector, peso)
+                    yield (json.dumps(lectura) + "\n").encode('utf-8')
+
+            time.sleep(INTERVALO_LECTURA)
+
+    def ejecutar_ventana_stream(self):
+        """Envía una ventana de lecturas por el canal persistente.
+
+        El cuerpo es un generador: requests lo envía con
+        Transfer-Encoding: chunked y cada lectura sale en cuanto se lee,
+        sobre la misma conexión TLS de la sesión. La respuesta trae el
+        pesaje activo de cada báscula.
+
+        Returns:
+            bool: False si el canal falló y hay que pasar al modo HTTP.
+        """
+        try:
+            response = self.session.post(
+                f"{ODOO_URL}/api/bascula/stream",
+                data=self._generar_ventana_stream(),
+                headers={'Content-Type': 'application/x-ndjson'},
+                timeout=(5, STREAM_VENTANA + 10)
+            )
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"⚠️  Stream interrumpido, se usa HTTP: {e}")
+            return False
+
+        if response.status_code != 200:
+            logger.warning(f"⚠️  Stream no disponible (HTTP {response.status_code}), se usa HTTP")
+            return False
+
+        try:
+            result = response.json()
+        except ValueError:
+            logger.warning("⚠️  Respuesta inválida del stream, se usa HTTP")
+            return False
+
+        if not result.get('success'):
+            logger.error(f"❌ Error desde Odoo: {result.get('message')}")
+            return False
+
+        activos = result.get('pesajes_activos') or {}
+        for lector in self.lectores:
+            activo = activos.get(lector.bascula_id) or {}
+            lector.actualizar_pesaje_activo(activo.get('pesaje_id'))
+        return True
+
+    def encolar_lectura(self, lector, peso):
+        """Guarda la lectura en la cola local para la traza en Odoo."""
+        try:
+            fecha = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+            self.cola.agregar(lector.bascula_id, fecha, peso, lector.pesaje_activo)
+        except Exception as e:
+            logger.error(f"❌ Error guardando lectura en la cola local: {e}")
+
+    def enviar_lote_odoo(self, session):
+        """Envía a Odoo el siguiente lote de la cola (gzip).
+
+        Returns:
+            int: lecturas confirmadas, o -1 si el envío falló.
+        """
+        pendientes = self.cola.pendientes(LOTE_MAX_LECTURAS)
+        if not pendientes:
+            return 0
+
+        payload = {
+            "api_key": self.api_key,
+            "db": ODOO_DB,
+            "lecturas": [lectura for _id, lectura in pendientes],
+        }
+        try:
+            response = session.post(
+                f"{ODOO_URL}/api/bascula/lecturas_lote",
+                data=gzip.compress(json.dumps(payload).encode('utf-8')),
+                headers={'Content-Type': 'application/json', 'Content-Encoding': 'gzip'},
+                timeout=30
+            )
+            if response.status_code != 200:
+                logger.warning(f"⚠️  Lote no enviado (HTTP {response.status_code})")
+                return -1
+            result = response.json()
+            if not result.get('success'):
+                logger.error(f"❌ Lote rechazado por Odoo: {result.get('message')}")
+                return -1
+        except Exception as e:
+            logger.debug(f"Lote no enviado, se reintentará: {e}")
+            return -1
+
+        self.cola.confirmar(pendientes[-1][0])
+        return len(pendientes)
+
+    def _bucle_lotes(self):
+        """Hilo que vacía la cola local hacia Odoo cada LOTE_INTERVALO segundos."""
+        # Sesión propia: requests.Session no se comparte entre hilos.
+        with requests.Session() as session:
+            session.headers.update({'X-Odoo-Database': ODOO_DB})
+            while not self.detener.wait(LOTE_INTERVALO):
+                # Vaciar todo lo acumulado (p. ej. tras un corte) lote a lote
+                while not self.detener.is_set():
+                    enviadas = self.enviar_lote_odoo(session)
+                    if enviadas > 0:
+                        logger.debug(f"📦 Lote de {enviadas} lecturas enviado")
+                    if enviadas < LOTE_MAX_LECTURAS:
+                        break
+
+    def ciclo_http(self, contador_lecturas):
+        """Un ciclo del modo HTTP: un POST por lectura enviada."""
+        for lector in self.lectores:
+            # Obtener pesaje activo cada 10 lecturas (cada ~5 segundos)
+            if contador_lecturas % 10 == 0:
+                lector.actualizar_pesaje_activo(self.obtener_pesaje_activo(lector))
+
+            # Última lectura de la báscula
+            tomada = lector.tomar_lectura()
+            if tomada is None:
+                continue
+            peso, estable, peso_estable = tomada
+
+            # --- Peso global (para formularios nuevos sin guardar) ---
+            lector.ciclos_sin_envio_global += 1
+            cambio_global = lector.hay_cambio(peso, estable)
+            heartbeat_global = lector.ciclos_sin_envio_global >= self.HEARTBEAT_CICLOS
+
+            if cambio_global or heartbeat_global:
+                self.encolar_lectura(lector, peso)
+                self.enviar_peso_global_odoo(lector, peso, estable, peso_estable)
+                lector.marcar_enviado(peso, estable)
+
+            # --- Peso a pesaje específico ---
+            if lector.pesaje_activo:
+                lector.ciclos_sin_envio += 1
+                cambio_peso = cambio_global or peso != lector.ultimo_peso
+                heartbeat = lector.ciclos_sin_envio >= self.HEARTBEAT_CICLOS
+
+                if cambio_peso or heartbeat:
+                    if peso != lector.ultimo_peso:
+                        estado = "estable" if estable else "en movimiento"
+                        logger.info(f"⚖️  Peso leído ({lector.bascula_id}): {peso:.2f} kg ({estado})")
+
+                    if self.enviar_peso_odoo(lector, peso, estable, peso_estable):
+                        logger.debug(f"✅ Peso enviado a Odoo")
+                        lector.ultimo_peso = peso
+                        lector.ciclos_sin_envio = 0
+
     def run(self):
         """Loop principal del bridge"""
         logger.info("=" * 60)
         logger.info("🔌 BRIDGE BÁSCULA PROMETÁLICOS → ODOO CLOUDPEPPER")
         logger.info("=" * 60)
         logger.info(f"Odoo URL: {ODOO_URL}")
-        logger.info(f"Puerto Serial (config): {PUERTO_SERIAL}")
+        for lector in self.lectores:
+            logger.info(f"Báscula {lector.bascula_id}: puerto (config) {lector.puerto_serial}")
         logger.info(f"Intervalo: {INTERVALO_LECTURA}s")
+        logger.info(f"Modo de envío: {MODO_ENVIO}")
         logger.info("=" * 60)
 
         # Verificar configuración
         if not self.verificar_configuracion():
             return
 
-        # Conectar a báscula
-        if not self.conectar_bascula():
-            logger.error("No se pudo conectar a la báscula. Abortando.")
+        # Conectar a las básculas
+        if not all(lector.conectar() for lector in self.lectores):
+            logger.error("No se pudo conectar a todas las básculas. Abortando.")
+            for lector in self.lectores:
+                lector.cerrar()
             return
 
+        # Un hilo lector por puerto: una báscula lenta no frena a las demás
+        for lector in self.lectores:
+            threading.Thread(
+                target=lector.bucle_lectura, args=(self.detener,),
+                name=f"lector-{lector.bascula_id}", daemon=True,
+            ).start()
+
+        pendientes = self.cola.tamano()
+        if pendientes:
+            logger.info(f"📦 {pendientes} lecturas pendientes en la cola local")
+        threading.Thread(target=self._bucle_lotes, name="lotes", daemon=True).start()
+
         logger.info("\n✅ Bridge iniciado correctamente")
         logger.info("🔍 Esperando pesajes en Odoo...\n")
 
         contador_lecturas = 0
 
+        if MODO_ENVIO == 'stream':
+            # Las ventanas del stream traen el pesaje activo al cerrar;
+            # consultar una vez para no esperar la primera ventana.
+            for lector in self.lectores:
+                lector.actualizar_pesaje_activo(self.obtener_pesaje_activo(lector))
+
         try:
             while True:
-                # Obtener pesaje activo cada 10 lecturas (cada ~5 segundos)
-                if contador_lecturas % 10 == 0:
-                    nuevo_pesaje = self.obtener_pesaje_activo()
-                    if nuevo_pesaje != self.pesaje_activo:
-                        # Resetear peso al cambiar de pesaje
-                        self.ultimo_peso = None
-                        self.ciclos_sin_envio = 0
-                        self.pesaje_activo = nuevo_pesaje
-                        if self.pesaje_activo:
-                            logger.info(f"\n🎯 Nuevo pesaje activo: {self.pesaje_activo}")
-
-                # Leer peso de báscula
-                peso = self.leer_peso()
-
-                # --- Peso global (para formularios nuevos sin guardar) ---
-                if peso is not None:
-                    self.ciclos_sin_envio_global += 1
-                    cambio_global = peso != self.ultimo_peso_global
-                    heartbeat_global = self.ciclos_sin_envio_global >= self.HEARTBEAT_CICLOS
-
-                    if cambio_global or heartbeat_global:
-                        self.enviar_peso_global_odoo(peso)
-                        self.ultimo_peso_global = peso
-                        self.ciclos_sin_envio_global = 0
-
-                # --- Peso a pesaje específico ---
-                if self.pesaje_activo and peso is not None:
-                    self.ciclos_sin_envio += 1
-                    cambio_peso = peso != self.ultimo_peso
-                    heartbeat = self.ciclos_sin_envio >= self.HEARTBEAT_CICLOS
-
-                    if cambio_peso or heartbeat:
-                        if cambio_peso:
-                            logger.info(f"⚖️  Peso leído: {peso:.2f} kg")
-
-                        if self.enviar_peso_odoo(self.pesaje_activo, peso):
-                            logger.debug(f"✅ Peso enviado a Odoo")
-                            self.ultimo_peso = peso
-                            self.ciclos_sin_envio = 0
-
+                if self._usar_stream():
+                    if not self.ejecutar_ventana_stream():
+                        # Respaldo: HTTP por lectura hasta reintentar el stream
+                        self.stream_suspendido_hasta = time.monotonic() + STREAM_REINTENTO
+                        contador_lecturas = 0
+                    continue
+
+                self.ciclo_http(contador_lecturas)
                 contador_lecturas += 1
                 time.sleep(INTERVALO_LECTURA)
 
@@ -464,9 +775,11 @@ class BasculaBridge:
         except Exception as e:
             logger.error(f"\n❌ Error fatal: {e}")
         finally:
-            if self.serial_conn and self.serial_conn.is_open:
-                self.serial_conn.close()
-                logger.info("🔌 Conexión serial cerrada")
+            self.detener.set()
+            self.session.close()
+            self.cola.cerrar()
+            for lector in self.lectores:
+                lector.cerrar()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Cola local de lecturas (store-and-forward)
+==========================================
+
+Cola en disco (SQLite) donde el bridge guarda cada lectura que envía.
+Un hilo aparte la vacía en lotes comprimidos hacia /api/bascula/lecturas_lote.
+Si se cae internet las lecturas se acumulan aquí y se reenvían al volver la
+conexión, así Odoo conserva la traza completa de pesos.
+
+Las lecturas solo se borran cuando Odoo confirma el lote; si el bridge se
+reinicia a mitad de un envío, el lote se reenvía y Odoo descarta duplicados.
+
+Autor: Secadora La Gran Colombia S.A.S
+Fecha: 2026-02
+"""
+
+import os
+import sqlite3
+import threading
+
+
+class ColaLecturas:
+    """Cola FIFO persistente de lecturas de báscula."""
+
+    def __init__(self, ruta):
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        # Un solo objeto conexión compartido entre el hilo lector y el de
+        # envío; el lock serializa el acceso.
+        self._conn = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS lecturas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                bascula TEXT NOT NULL,
+                fecha TEXT NOT NULL,
+                peso REAL NOT NULL,
+                pesaje_id INTEGER
+            )
+        """)
+
+    def agregar(self, bascula, fecha, peso, pesaje_id=None):
+        """Agrega una lectura al final de la cola."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO lecturas (bascula, fecha, peso, pesaje_id) VALUES (?, ?, ?, ?)",
+                (bascula, fecha, peso, pesaje_id),
+            )
+
+    def pendientes(self, limite):
+        """Primeras `limite` lecturas pendientes: lista de (id, dict)."""
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT id, bascula, fecha, peso, pesaje_id FROM lecturas ORDER BY id LIMIT ?",
+                (limite,),
+            ).fetchall()
+        return [
+            (fila[0], {
+                "bascula": fila[1],
+                "fecha": fila[2],
+                "peso": fila[3],
+                "pesaje_id": fila[4],
+            })
+            for fila in filas
+        ]
+
+    def confirmar(self, hasta_id):
+        """Borra las lecturas ya confirmadas por Odoo (id <= hasta_id)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM lecturas WHERE id <= ?", (hasta_id,))
+
+    def tamano(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM lecturas").fetchone()[0]
+
+    def cerrar(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Detector de estabilidad del peso
+================================
+
+Filtro sobre las muestras de la báscula: guarda las últimas N en un buffer
+circular, calcula mediana y desviación estándar de la ventana y marca la
+lectura como "estable" cuando el camión dejó de moverse. El valor asentado
+(mediana) es el que debe capturar una pesada.
+
+Si el indicador Prometálicos envía su propio estado (ST = estable,
+US = en movimiento), ese estado manda: con movimiento nunca hay lectura
+estable aunque la ventana esté quieta.
+
+Autor: Secadora La Gran Colombia S.A.S
+Fecha: 2026-02
+"""
+
+import re
+import statistics
+from collections import deque
+
+# Estado del indicador al inicio de la trama, p. ej. "ST,GS,+012345kg"
+_RE_ESTADO = re.compile(r'^\W*(ST|US|OL)\b', re.IGNORECASE)
+_RE_PESO = re.compile(r'([\d.]+)')
+
+
+def parsear_linea(linea):
+    """Extrae (peso, estado_indicador) de una trama del indicador.
+
+    estado_indicador: True (estable), False (movimiento/sobrecarga) o
+    None si la trama no trae estado. peso es None si no hay número.
+    """
+    estado = None
+    match_estado = _RE_ESTADO.search(linea)
+    if match_estado:
+        estado = match_estado.group(1).upper() == 'ST'
+
+    # Prometálicos típicamente envía:
+    # "  12345.50 kg" o "  12345.50 Kg" o solo "12345.50"
+    match = _RE_PESO.search(linea)
+    if not match:
+        return None, estado
+    return float(match.group(1)), estado
+
+
+class FiltroEstabilidad:
+    """Ventana móvil de muestras con mediana, varianza y bandera de estabilidad."""
+
+    def __init__(self, ventana=8, desviacion_max=5.0):
+        self.muestras = deque(maxlen=max(2, ventana))
+        self.desviacion_max = desviacion_max
+        self.estado_indicador = None
+
+    def agregar(self, peso, estado_indicador=None):
+        """Agrega una muestra (y el estado del indicador si la trama lo trae)."""
+        self.muestras.append(peso)
+        self.estado_indicador = estado_indicador
+
+    def reiniciar(self):
+        self.muestras.clear()
+        self.estado_indicador = None
+
+    @property
+    def mediana(self):
+        return statistics.median(self.muestras) if self.muestras else None
+
+    @property
+    def desviacion(self):
+        if len(self.muestras) < 2:
+            return None
+        return statistics.pstdev(self.muestras)
+
+    @property
+    def estable(self):
+        """Ventana llena, dispersión bajo el umbral y sin movimiento en el indicador."""
+        if self.estado_indicador is False:
+            return False
+        if len(self.muestras) < self.muestras.maxlen:
+            return False
+        return self.desviacion <= self.desviacion_max
+
+    def lectura(self):
+        """(peso_crudo, estable, peso_asentado) de la última muestra.
+
+        peso_asentado es la mediana de la ventana cuando la lectura es
+        estable, o None mientras el peso se está moviendo.
+        """
+        if not self.muestras:
+            return None
+        estable = self.estable
+        return self.muestras[-1], estable, round(self.mediana, 2) if estable else None
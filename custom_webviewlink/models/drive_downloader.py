@@ -12,8 +12,11 @@ La ruta de la clave JSON se guarda en el parámetro del sistema
 """
 
 import io
+import os
 import re
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from odoo import models
 
@@ -34,6 +37,10 @@ DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
 # bloquearía el worker de Odoo indefinidamente al imprimir el reporte.
 DRIVE_TIMEOUT = 30
 
+# Descargas simultáneas al traer varios archivos (reporte de viajes por
+# pagar). Cada hilo usa su propio cliente: httplib2 no es thread-safe.
+DRIVE_DESCARGAS_PARALELAS = 4
+
 
 class DriveDownloader(models.AbstractModel):
     _name = 'custom_webviewlink.drive_downloader'
@@ -56,6 +63,10 @@ class DriveDownloader(models.AbstractModel):
         que quien llame pueda degradar con gracia (mostrar el enlace en vez del
         PDF) en lugar de romper la impresión.
         """
+        return self._construir_servicio(self._ruta_credencial())
+
+    def _ruta_credencial(self):
+        """Ruta de la clave JSON de la cuenta de servicio, o None."""
         path = self.env['ir.config_parameter'].sudo().get_param(
             'custom_webviewlink.drive_sa_json_path'
         )
@@ -65,6 +76,13 @@ class DriveDownloader(models.AbstractModel):
                 'custom_webviewlink.drive_sa_json_path (ruta de la clave JSON).'
             )
             return None
+        return path
+
+    def _construir_servicio(self, path):
+        """Cliente de Drive para la clave en `path`, o None. No usa el
+        entorno (ni la base de datos): se puede llamar desde otros hilos."""
+        if not path:
+            return None
         try:
             import httplib2
             from google.oauth2 import service_account
@@ -106,25 +124,64 @@ class DriveDownloader(models.AbstractModel):
             service = self._get_drive_service()
         if not service:
             return None
+        buf = io.BytesIO()
+        if not self._descargar_en(file_id, service, buf):
+            return None
+        return buf.getvalue()
+
+    def _descargar_en(self, file_id, service, fh):
+        """Descarga el archivo `file_id` en el objeto de archivo `fh`.
+        True si quedó un PDF; False (con warning) si no. Nunca lanza."""
         try:
             from googleapiclient.http import MediaIoBaseDownload
             request = service.files().get_media(fileId=file_id)
-            buf = io.BytesIO()
-            downloader = MediaIoBaseDownload(buf, request)
+            downloader = MediaIoBaseDownload(fh, request)
             done = False
             while not done:
                 _status, done = downloader.next_chunk()
-            data = buf.getvalue()
+            fh.seek(0)
+            inicio = fh.read(8)
             # Sanity check mínimo: un PDF empieza con %PDF. Solo se soportan
             # PDFs SUBIDOS a Drive; un Google Doc/Sheet NATIVO no se descarga
             # con get_media (da 403 y cae al except de abajo), no llega aquí.
-            if not data.startswith(b'%PDF'):
+            if not inicio.startswith(b'%PDF'):
                 _logger.warning(
                     'Drive: el archivo %s se descargó pero no es un PDF '
-                    '(primeros bytes: %r). Se omite.', file_id, data[:8]
+                    '(primeros bytes: %r). Se omite.', file_id, inicio
                 )
-                return None
-            return data
+                return False
+            return True
         except Exception as e:
             _logger.warning('Drive: falló la descarga de %s: %s', file_id, e)
-            return None
+            return False
+
+    def descargar_pdfs_a_carpeta(self, urls, carpeta, max_workers=DRIVE_DESCARGAS_PARALELAS):
+        """Inicia en un pool de hilos la descarga de varios enlaces a
+        archivos dentro de `carpeta`, sin esperar a que terminen.
+
+        Devuelve (executor, {url: Future}); cada Future da la ruta del PDF
+        descargado o None. Quien llama hace executor.shutdown() al terminar.
+        Los archivos van directo a disco: los PDFs no se acumulan en memoria.
+        """
+        path = self._ruta_credencial() if urls else None
+        local = threading.local()
+
+        def _descargar(i, url):
+            file_id = self._extraer_file_id(url)
+            if not file_id:
+                return None
+            if not hasattr(local, 'service'):
+                local.service = self._construir_servicio(path)
+            if not local.service:
+                return None
+            ruta = os.path.join(carpeta, f'drive_{i}.pdf')
+            with open(ruta, 'w+b') as fh:
+                ok = self._descargar_en(file_id, local.service, fh)
+            if not ok:
+                os.unlink(ruta)
+                return None
+            return ruta
+
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='drive')
+        futuros = {url: executor.submit(_descargar, i, url) for i, url in enumerate(urls)}
+        return executor, futuros
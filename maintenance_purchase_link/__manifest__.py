@@ -29,6 +29,7 @@
         'views/maintenance_cost_views.xml',
         'views/maintenance_horometro_views.xml',
         'wizards/assign_invoice_wizard_views.xml',
+        'wizards/horometro_import_wizard_views.xml',
         'views/maintenance_menus.xml',
         'report/maintenance_cost_report.xml',
     ],
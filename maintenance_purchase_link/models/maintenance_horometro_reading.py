@@ -47,16 +47,65 @@ class MaintenanceHorometroReading(models.Model):
     @api.model_create_multi
     def create(self, vals_list):
         records = super().create(vals_list)
-        records._check_maintenance_trigger()
+        # En la importación masiva el disparo se hace una vez al final
+        # (_run_deferred_maintenance_trigger), no por cada lectura.
+        if not self.env.context.get('defer_maintenance_trigger'):
+            records._check_maintenance_trigger()
         return records
 
+    @api.model
+    def _import_readings(self, vals_list, only_latest=True):
+        """Importa lecturas en lote.
+
+        Inserta todas las lecturas con un solo create y, al final, evalúa el
+        mantenimiento una vez por equipo con su lectura más reciente, de modo
+        que un mes de lecturas genera a lo sumo una OT por equipo. Con
+        only_latest solo se guarda la lectura más reciente de cada equipo
+        (por fecha y, a igual fecha, la última del archivo).
+        Devuelve las lecturas creadas.
+        """
+        if only_latest:
+            vals_list = self._latest_vals_per_equipment(vals_list)
+        readings = self.with_context(defer_maintenance_trigger=True).create(vals_list)
+        readings._run_deferred_maintenance_trigger()
+        return readings
+
+    @api.model
+    def _latest_vals_per_equipment(self, vals_list):
+        """Deja en vals_list solo la lectura más reciente de cada equipo."""
+        today = fields.Date.context_today(self)
+        latest = {}
+        for vals in vals_list:
+            date = fields.Date.to_date(vals.get('date')) or today
+            current = latest.get(vals['equipment_id'])
+            if not current or date >= current[0]:
+                latest[vals['equipment_id']] = (date, vals)
+        return [vals for _date, vals in latest.values()]
+
+    def _latest_reading_per_equipment(self):
+        """Lectura más reciente (fecha, id) de cada equipo del recordset."""
+        latest = {}
+        for reading in self.sorted(lambda r: (r.date, r.id)):
+            latest[reading.equipment_id.id] = reading.id
+        return self.browse(latest.values())
+
+    def _run_deferred_maintenance_trigger(self):
+        """Disparo diferido de la importación masiva: una evaluación por
+        equipo, con su última lectura. Los módulos que dependen de las
+        lecturas (planes de tareas) se enganchan aquí."""
+        self._latest_reading_per_equipment()._check_maintenance_trigger()
+
     def _check_maintenance_trigger(self):
+        # Las OT se crean en un solo create al final; last_maintenance se
+        # actualiza en memoria para que varias lecturas del mismo equipo en
+        # el recordset se evalúen en orden, como si llegaran una a una.
+        triggered = []
         for reading in self:
             eq = reading.equipment_id
             if not eq.horometro_interval or eq.horometro_interval <= 0:
                 continue
             if (reading.value - eq.horometro_last_maintenance) >= eq.horometro_interval:
-                request = self.env['maintenance.request'].create({
+                triggered.append((reading, {
                     'name': _('Mant. preventivo - %(equipo)s (%(horas).0f hrs)',
                               equipo=eq.name, horas=reading.value),
                     'equipment_id': eq.id,
@@ -67,6 +116,10 @@ class MaintenanceHorometroReading(models.Model):
                         actual=reading.value,
                         ultimo=eq.horometro_last_maintenance,
                     ),
-                })
-                reading.triggered_request_id = request.id
+                }))
                 eq.horometro_last_maintenance = reading.value
+        if not triggered:
+            return
+        requests = self.env['maintenance.request'].create([vals for _reading, vals in triggered])
+        for (reading, _vals), request in zip(triggered, requests):
+            reading.triggered_request_id = request.id
@@ -1,2 +1,3 @@
 from . import test_maintenance_cost
 from . import test_horometro
+from . import test_horometro_import
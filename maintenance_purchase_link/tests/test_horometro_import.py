@@ -0,0 +1,110 @@
+import base64
+
+from odoo.tests.common import TransactionCase
+from odoo.exceptions import UserError
+
+
+class TestHorometroImport(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=True))
+
+        cls.category = cls.env.ref(
+            'maintenance_purchase_link.equipment_category_secado'
+        )
+        cls.Reading = cls.env['maintenance.horometro.reading']
+        cls.equipment = cls.env['maintenance.equipment'].create({
+            'name': 'Horno de Secado Import',
+            'category_id': cls.category.id,
+            'horometro_interval': 500.0,
+            'horometro_last_maintenance': 0.0,
+        })
+        cls.equipment2 = cls.env['maintenance.equipment'].create({
+            'name': 'Elevador Import',
+            'serial_no': 'ELV-001',
+            'category_id': cls.category.id,
+            'horometro_interval': 500.0,
+            'horometro_last_maintenance': 0.0,
+        })
+
+    def _requests(self, equipment):
+        return self.env['maintenance.request'].search([
+            ('equipment_id', '=', equipment.id),
+        ])
+
+    def test_import_keeps_latest_per_equipment(self):
+        """Solo se guarda la lectura más reciente de cada equipo."""
+        readings = self.Reading._import_readings([
+            {'equipment_id': self.equipment.id, 'date': '2026-01-02', 'value': 300.0},
+            {'equipment_id': self.equipment.id, 'date': '2026-01-03', 'value': 450.0},
+            {'equipment_id': self.equipment.id, 'date': '2026-01-01', 'value': 100.0},
+            {'equipment_id': self.equipment2.id, 'date': '2026-01-02', 'value': 50.0},
+        ])
+        self.assertEqual(len(readings), 2)
+        self.assertEqual(
+            readings.filtered(lambda r: r.equipment_id == self.equipment).value,
+            450.0,
+        )
+
+    def test_import_triggers_once_per_equipment(self):
+        """Un mes de lecturas que cruza varios intervalos genera una sola OT."""
+        vals_list = [
+            {'equipment_id': self.equipment.id, 'date': f'2026-01-{day:02d}', 'value': day * 50.0}
+            for day in range(1, 31)
+        ]
+        readings = self.Reading._import_readings(vals_list, only_latest=False)
+        self.assertEqual(len(readings), 30)
+        requests = self._requests(self.equipment)
+        self.assertEqual(len(requests), 1)
+        latest = readings.filtered(lambda r: r.value == 1500.0)
+        self.assertEqual(latest.triggered_request_id, requests)
+        self.assertEqual(len(readings.triggered_request_id), 1)
+        self.assertAlmostEqual(self.equipment.horometro_last_maintenance, 1500.0)
+
+    def test_import_below_threshold(self):
+        """Sin alcanzar el intervalo no se genera OT."""
+        self.Reading._import_readings([
+            {'equipment_id': self.equipment.id, 'date': '2026-01-01', 'value': 200.0},
+            {'equipment_id': self.equipment.id, 'date': '2026-01-02', 'value': 400.0},
+        ], only_latest=False)
+        self.assertFalse(self._requests(self.equipment))
+
+    def _wizard(self, content, **vals):
+        return self.env['maintenance.horometro.import.wizard'].create(dict(
+            vals, file=base64.b64encode(content.encode('utf-8')), filename='lecturas.csv',
+        ))
+
+    def test_wizard_import_csv(self):
+        """El asistente lee el CSV (punto y coma, serie, fecha DD/MM/AAAA)."""
+        wizard = self._wizard(
+            'equipo;fecha;lectura;notas\n'
+            'Horno de Secado Import;01/01/2026;100\n'
+            'Horno de Secado Import;15/01/2026;520,5;fin de cosecha\n'
+            'ELV-001;2026-01-10;80\n'
+        )
+        result = wizard.action_import()
+        self.assertEqual(result['tag'], 'display_notification')
+        readings = self.Reading.search([
+            ('equipment_id', 'in', (self.equipment | self.equipment2).ids),
+        ])
+        self.assertEqual(len(readings), 2)
+        latest = readings.filtered(lambda r: r.equipment_id == self.equipment)
+        self.assertAlmostEqual(latest.value, 520.5)
+        self.assertEqual(latest.notes, 'fin de cosecha')
+        self.assertTrue(latest.triggered_request_id)
+        self.assertEqual(len(self._requests(self.equipment2)), 0)
+
+    def test_wizard_reports_errors(self):
+        """Las filas inválidas se reportan y no se importa nada."""
+        wizard = self._wizard(
+            'equipo,fecha,lectura\n'
+            'Equipo inexistente,2026-01-01,100\n'
+            'Horno de Secado Import,31-31-2026,100\n'
+        )
+        with self.assertRaises(UserError):
+            wizard.action_import()
+        self.assertFalse(self.Reading.search([
+            ('equipment_id', '=', self.equipment.id),
+        ]))
@@ -1 +1,2 @@
 from . import assign_invoice_wizard
+from . import horometro_import_wizard
@@ -0,0 +1,158 @@
+import base64
+import csv
+import io
+from datetime import datetime
+
+from odoo import fields, models, _
+from odoo.exceptions import UserError
+
+# Encabezados aceptados para cada columna del CSV
+COLUMNAS = {
+    'equipment': ('equipo', 'equipment', 'serie', 'serial'),
+    'date': ('fecha', 'date'),
+    'value': ('lectura', 'horas', 'valor', 'value'),
+    'notes': ('notas', 'nota', 'notes'),
+}
+FORMATOS_FECHA = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y')
+MAX_ERRORES = 20
+
+
+class HorometroImportWizard(models.TransientModel):
+    _name = 'maintenance.horometro.import.wizard'
+    _description = 'Importar lecturas de horómetro'
+
+    file = fields.Binary(
+        string='Archivo CSV',
+        required=True,
+    )
+    filename = fields.Char(
+        string='Nombre del archivo',
+    )
+    only_latest = fields.Boolean(
+        string='Solo la última lectura por equipo',
+        default=True,
+        help='Guarda únicamente la lectura más reciente de cada equipo. '
+             'Desmarcar para guardar el histórico completo; en ambos casos '
+             'el mantenimiento se evalúa una sola vez por equipo.',
+    )
+
+    def action_import(self):
+        self.ensure_one()
+        vals_list = self._parse_csv()
+        # OTs de los equipos importados, antes y después, para el resumen
+        Request = self.env['maintenance.request']
+        request_domain = [('equipment_id', 'in', list({v['equipment_id'] for v in vals_list}))]
+        requests_before = Request.search_count(request_domain)
+        readings = self.env['maintenance.horometro.reading']._import_readings(
+            vals_list, only_latest=self.only_latest,
+        )
+        requests = Request.search_count(request_domain) - requests_before
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Lecturas importadas'),
+                'message': _(
+                    '%(lecturas)s lecturas de %(equipos)s equipos. '
+                    'OTs generadas: %(ots)s.',
+                    lecturas=len(readings),
+                    equipos=len(readings.equipment_id),
+                    ots=requests,
+                ),
+                'type': 'success',
+                'sticky': False,
+                'next': {'type': 'ir.actions.act_window_close'},
+            },
+        }
+
+    def _parse_csv(self):
+        """Lee el CSV y devuelve los vals de las lecturas.
+
+        Acepta ',' o ';' como separador, equipos por nombre o número de
+        serie y fechas AAAA-MM-DD o DD/MM/AAAA. Los errores de todas las
+        filas se reportan juntos.
+        """
+        try:
+            content = base64.b64decode(self.file).decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise UserError(_('El archivo debe estar codificado en UTF-8.'))
+        # El separador se toma del encabezado: en los datos la coma puede ser
+        # el separador decimal de la lectura.
+        first_line = content.split('\n', 1)[0]
+        delimiter = ';' if ';' in first_line else ','
+        reader = csv.reader(io.StringIO(content), delimiter=delimiter)
+        header = next(reader, None)
+        if not header:
+            raise UserError(_('El archivo está vacío.'))
+        columns = self._map_columns(header)
+        rows = [(number, row) for number, row in enumerate(reader, start=2) if any(row)]
+
+        # Equipos de todas las filas en una sola búsqueda
+        names = {row[columns['equipment']].strip() for _number, row in rows
+                 if len(row) > columns['equipment']}
+        equipments = self.env['maintenance.equipment'].search([
+            '|', ('name', 'in', list(names)), ('serial_no', 'in', list(names)),
+        ])
+        equipment_map = {eq.serial_no: eq.id for eq in equipments if eq.serial_no}
+        equipment_map.update({eq.name: eq.id for eq in equipments})
+
+        vals_list = []
+        errors = []
+        for number, row in rows:
+            try:
+                vals_list.append(self._parse_row(row, columns, equipment_map))
+            except (ValueError, IndexError) as e:
+                errors.append(_('Fila %(fila)s: %(error)s', fila=number, error=e))
+        if errors:
+            if len(errors) > MAX_ERRORES:
+                errors = errors[:MAX_ERRORES] + [_('... y %s errores más.', len(errors) - MAX_ERRORES)]
+            raise UserError('\n'.join(errors))
+        if not vals_list:
+            raise UserError(_('El archivo no tiene lecturas.'))
+        return vals_list
+
+    def _map_columns(self, header):
+        """Índice de cada columna según el encabezado."""
+        header = [col.strip().lower() for col in header]
+        columns = {}
+        for key, aliases in COLUMNAS.items():
+            for index, col in enumerate(header):
+                if col in aliases:
+                    columns[key] = index
+                    break
+        missing = [COLUMNAS[key][0] for key in ('equipment', 'date', 'value') if key not in columns]
+        if missing:
+            raise UserError(_(
+                'Faltan columnas en el encabezado: %(faltan)s. '
+                'Se esperan: equipo, fecha, lectura y, opcionalmente, notas.',
+                faltan=', '.join(missing),
+            ))
+        return columns
+
+    def _parse_row(self, row, columns, equipment_map):
+        name = row[columns['equipment']].strip()
+        if name not in equipment_map:
+            raise ValueError(_('equipo "%s" no encontrado', name))
+        raw_value = row[columns['value']].strip()
+        if ',' in raw_value and '.' not in raw_value:
+            raw_value = raw_value.replace(',', '.')  # decimal con coma
+        try:
+            value = float(raw_value)
+        except ValueError:
+            raise ValueError(_('lectura "%s" no es un número', raw_value))
+        vals = {
+            'equipment_id': equipment_map[name],
+            'date': self._parse_date(row[columns['date']].strip()),
+            'value': value,
+        }
+        if 'notes' in columns and len(row) > columns['notes'] and row[columns['notes']].strip():
+            vals['notes'] = row[columns['notes']].strip()
+        return vals
+
+    def _parse_date(self, text):
+        for fmt in FORMATOS_FECHA:
+            try:
+                return datetime.strptime(text, fmt).date()
+            except ValueError:
+                continue
+        raise ValueError(_('fecha "%s" no válida (use AAAA-MM-DD o DD/MM/AAAA)', text))
@@ -7,12 +7,23 @@ class MaintenanceHorometroReading(models.Model):
     @api.model_create_multi
     def create(self, vals_list):
         records = super().create(vals_list)
-        if not self.env.context.get('skip_task_plan_update'):
+        if not self.env.context.get('skip_task_plan_update') \
+                and not self.env.context.get('defer_maintenance_trigger'):
             records._update_task_plan_lines()
         return records
 
+    def _run_deferred_maintenance_trigger(self):
+        super()._run_deferred_maintenance_trigger()
+        if not self.env.context.get('skip_task_plan_update'):
+            self._update_task_plan_lines()
+
     def _update_task_plan_lines(self):
-        """Al registrar lectura de horómetro, actualizar las líneas de plan de tareas."""
+        """Al registrar lecturas de horómetro, actualizar las líneas de plan de tareas.
+
+        Toma la lectura más reciente de cada equipo, busca sus líneas en una
+        sola consulta, las escribe agrupadas por valor y genera las OTs una
+        sola vez para todas.
+        """
         PlanLine = self.env['maintenance.task.plan.line']
         # Buscar el counter type de horómetro
         hour_meter_types = self.env['maintenance.counter.type'].search([
@@ -21,15 +32,24 @@ class MaintenanceHorometroReading(models.Model):
         if not hour_meter_types:
             return
 
-        for reading in self:
-            plan_lines = PlanLine.search([
-                ('equipment_id', '=', reading.equipment_id.id),
-                ('counter_type_id', 'in', hour_meter_types.ids),
-                ('plan_id.active', '=', True),
-            ])
-            if plan_lines:
-                plan_lines.write({
-                    'current_counter_reading': reading.value,
-                })
-                # Generar OTs automáticamente si alcanzó el umbral
-                plan_lines._generate_requests()
+        latest = self._latest_reading_per_equipment()
+        plan_lines = PlanLine.search([
+            ('equipment_id', 'in', latest.equipment_id.ids),
+            ('counter_type_id', 'in', hour_meter_types.ids),
+            ('plan_id.active', '=', True),
+        ])
+        if not plan_lines:
+            return
+
+        lines_by_equipment = plan_lines.grouped('equipment_id')
+        lines_by_value = {}
+        for reading in latest:
+            lines = lines_by_equipment.get(reading.equipment_id)
+            if lines:
+                lines_by_value[reading.value] = lines_by_value.get(reading.value, PlanLine) | lines
+        for value, lines in lines_by_value.items():
+            lines.write({
+                'current_counter_reading': value,
+            })
+        # Generar OTs automáticamente si alcanzó el umbral
+        plan_lines._generate_requests()
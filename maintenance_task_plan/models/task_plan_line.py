@@ -120,18 +120,22 @@ class MaintenanceTaskPlanLine(models.Model):
     def _generate_requests(self):
         """Generar OTs para líneas que alcanzaron el umbral."""
         Request = self.env['maintenance.request']
-        created = self.env['maintenance.request']
-
-        for line in self:
-            if line.current_counter_reading < line.next_counter_reading:
-                continue
-
-            # Verificar si ya existe una OT abierta para esta línea
-            open_request = Request.search([
-                ('task_plan_line_id', '=', line.id),
-                ('stage_id.done', '=', False),
-            ], limit=1)
-            if open_request:
+        due = self.filtered(
+            lambda l: l.current_counter_reading >= l.next_counter_reading
+        )
+        if not due:
+            return Request
+
+        # Líneas que ya tienen una OT abierta, en una sola consulta
+        open_line_ids = set(Request.search([
+            ('task_plan_line_id', 'in', due.ids),
+            ('stage_id.done', '=', False),
+        ]).task_plan_line_id.ids)
+
+        lines = []
+        vals_list = []
+        for line in due:
+            if line.id in open_line_ids:
                 continue
 
             unit = line.counter_unit or ''
@@ -147,7 +151,8 @@ class MaintenanceTaskPlanLine(models.Model):
             else:
                 description = note
 
-            request = Request.create({
+            lines.append(line)
+            vals_list.append({
                 'name': line.plan_id.name,
                 'equipment_id': line.equipment_id.id,
                 'task_plan_id': line.plan_id.id,
@@ -156,9 +161,10 @@ class MaintenanceTaskPlanLine(models.Model):
                 'category_id': line.plan_id.category_id.id or False,
                 'description': description,
             })
-            line.last_request_id = request.id
-            created |= request
 
+        created = Request.create(vals_list)
+        for line, request in zip(lines, created):
+            line.last_request_id = request.id
         return created
 
     @api.model
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# ============================================================
+# BENCHMARK de las búsquedas de la ingesta de facturas por correo — Odoo v18
+#
+# Siembra un histórico de correos procesados (10.000 por defecto) y
+# proveedores, y compara para cada búsqueda que hace un correo:
+#   1. Proveedor: vat con dos variantes en OR  vs  nit_normalizado
+#   2. Impuesto por línea: search por tasa     vs  una búsqueda por lote
+#   3. Duplicado por CUFE: recorrido de tabla  vs  índice único parcial
+# Reporta consultas SQL y tiempo, y verifica que den lo mismo.
+#
+# Uso (dentro del contenedor v18):
+#   docker exec -it odoo_enterprise odoo shell -d odoo_col --no-http
+#   >>> exec(open('/mnt/extra-addons/odoo-secadora/scripts/benchmark_ingesta_facturas_email.py').read())
+#   >>> benchmark()                           # 10.000 correos, 2.000 proveedores
+#   >>> benchmark(correos=50000, proveedores=5000)
+#
+# NO guarda nada: la siembra y las mediciones corren dentro de un
+# savepoint que se revierte.
+# ============================================================
+
+import random
+import time
+import uuid
+
+from odoo.addons.secadora_factura_email.models.factura_email import INDICE_CUFE
+from odoo.addons.secadora_factura_email.models.res_partner import normalizar_nit
+
+env = env(user=1)  # __system__: salta ir.rule
+env = env(context=dict(env.context, tracking_disable=True, mail_create_nolog=True))
+
+TASAS = [19.0, 5.0, 19.0, 0.0, 19.0]  # tasas de las líneas simuladas
+
+
+def _sembrar(correos, proveedores):
+    """Crea proveedores con NIT y correos procesados con CUFE distinto.
+    Devuelve (nits, cufes) sembrados."""
+    nits = [str(800000000 + i) for i in range(proveedores)]
+    env['res.partner'].create([{
+        'name': f'Proveedor benchmark {nit}',
+        # Mezcla de formatos, como llegan en la práctica
+        'vat': f'{nit}-{i % 10}' if i % 2 else nit,
+        'company_type': 'company',
+    } for i, nit in enumerate(nits)])
+    cufes = [uuid.uuid4().hex * 2 for _i in range(correos)]
+    FacturaEmail = env['secadora.factura.email']
+    for i in range(0, correos, 1000):
+        FacturaEmail.create([{
+            'name': f'BENCH-{j}',
+            'state': 'procesado',
+            'cufe': cufes[j],
+            'emisor_nit': nits[j % proveedores],
+        } for j in range(i, min(i + 1000, correos))])
+    env.flush_all()
+    return nits, cufes
+
+
+def _medir(funcion, argumentos):
+    env.invalidate_all()
+    consultas = env.cr.sql_log_count
+    t0 = time.perf_counter()
+    resultado = [funcion(a) for a in argumentos]
+    return resultado, env.cr.sql_log_count - consultas, time.perf_counter() - t0
+
+
+def _reportar(nombre, n, anterior, nuevo, etiquetas=('Anterior', 'Nuevo')):
+    (datos_a, sql_a, t_a), (datos_n, sql_n, t_n) = anterior, nuevo
+    print(f'\n  {nombre} ({n} búsquedas)')
+    print(f'    {etiquetas[0]:<10} {sql_a:6d} consultas  {t_a:8.3f} s')
+    print(f'    {etiquetas[1]:<10} {sql_n:6d} consultas  {t_n:8.3f} s')
+    print('    [OK] Mismos resultados.' if datos_a == datos_n else '    [!] Los resultados difieren.')
+
+
+# --- Búsquedas anteriores (copiadas del código previo) ------------------
+
+def _partner_anterior(nit):
+    nit_limpio = nit.replace('-', '').replace('.', '').strip()
+    nit_buscar = nit_limpio.split('-')[0] if '-' in nit else nit_limpio
+    return env['res.partner'].search([
+        '|', ('vat', '=', nit_buscar), ('vat', '=', nit),
+    ], limit=1).id
+
+
+def _impuesto_anterior(tasa, company_id):
+    return env['account.tax'].search([
+        ('type_tax_use', '=', 'purchase'),
+        ('amount', '=', tasa),
+        ('company_id', '=', company_id),
+    ], limit=1).id or None
+
+
+def _duplicado(cufe):
+    return env['secadora.factura.email'].search([
+        ('cufe', '=', cufe), ('state', '=', 'procesado'), ('id', '!=', 0),
+    ], limit=1).id
+
+
+# --- Búsquedas nuevas ------------------------------------------------------
+
+def _partner_nuevo(nit):
+    nit_limpio = nit.replace('-', '').replace('.', '').strip()
+    return env['res.partner'].search([
+        ('nit_normalizado', 'in', list({normalizar_nit(nit), nit_limpio})),
+    ], limit=1).id
+
+
+def _plan(cufe):
+    env.cr.execute(
+        "EXPLAIN SELECT id FROM secadora_factura_email "
+        "WHERE cufe = %s AND state = 'procesado' AND id != 0 LIMIT 1", (cufe,)
+    )
+    return ' / '.join(fila[0].strip() for fila in env.cr.fetchall())
+
+
+def benchmark(correos=10000, proveedores=2000, busquedas=1000):
+    FacturaEmail = env['secadora.factura.email']
+    company_id = env.company.id
+    with env.cr.savepoint(flush=False) as sp:
+        t0 = time.perf_counter()
+        nits, cufes = _sembrar(correos, proveedores)
+        env.cr.execute('ANALYZE secadora_factura_email')
+        env.cr.execute('ANALYZE res_partner')
+        print(f'\n===== {correos} correos, {proveedores} proveedores '
+              f'(siembra {time.perf_counter() - t0:.1f} s) =====')
+
+        # 1. Proveedor. La comparación usa los proveedores con vat sin DV,
+        # los únicos que la búsqueda anterior encontraba con el NIT del XML.
+        sin_dv, con_dv = nits[::2], nits[1::2]
+        muestra = random.sample(sin_dv, min(busquedas, len(sin_dv)))
+        _reportar('Proveedor por NIT', len(muestra),
+                  _medir(_partner_anterior, muestra), _medir(_partner_nuevo, muestra))
+        muestra = random.sample(con_dv, min(busquedas, len(con_dv)))
+        antes = sum(map(bool, _medir(_partner_anterior, muestra)[0]))
+        ahora = sum(map(bool, _medir(_partner_nuevo, muestra)[0]))
+        print(f'    Proveedores con vat "NIT-DV": {ahora} de {len(muestra)} '
+              f'encontrados (antes {antes}).')
+
+        # 2. Impuesto por línea (5 líneas por correo), en un lote de ingesta
+        tasas = [TASAS[i % len(TASAS)] for i in range(busquedas * len(TASAS))]
+        lote = FacturaEmail._con_impuestos_del_lote()
+        _reportar('Impuesto por tasa', len(tasas),
+                  _medir(lambda tasa: _impuesto_anterior(tasa, company_id), tasas),
+                  _medir(lambda tasa: lote._impuestos_compra_por_tasa(company_id).get(tasa), tasas))
+
+        # 3. Duplicado por CUFE, sin índices (recorrido) y con el índice único
+        muestra = random.sample(cufes, min(busquedas, len(cufes)))
+        with env.cr.savepoint(flush=False) as sin_indices:
+            env.cr.execute('SET LOCAL enable_indexscan = off')
+            env.cr.execute('SET LOCAL enable_bitmapscan = off')
+            recorrido = _medir(_duplicado, muestra)
+            plan_recorrido = _plan(muestra[0])
+            sin_indices.rollback()
+        con_indice = _medir(_duplicado, muestra)
+        _reportar('Duplicado por CUFE', len(muestra), recorrido, con_indice,
+                  etiquetas=('Recorrido', 'Índice'))
+        plan = _plan(muestra[0])
+        print(f'    Plan sin índice: {plan_recorrido}')
+        print(f'    Plan con índice: {plan}')
+        if INDICE_CUFE not in plan:
+            print(f'    [!] El plan no usa {INDICE_CUFE}: ¿se creó el índice (ver init)?')
+        sp.rollback()
+    env.invalidate_all()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# ============================================================
+# BENCHMARK del recálculo de peso comercial — Odoo v18
+#
+# Compara, sobre los mismos análisis de laboratorio:
+#   1. el cálculo actual por registro (_compute_peso_comercial vía ORM)
+#   2. el recálculo masivo (_recalcular_peso_comercial_masivo, NumPy)
+# y verifica que ambos den exactamente el mismo peso comercial,
+# diferencia y detalle.
+#
+# Uso (dentro del contenedor v18):
+#   docker exec -it odoo_enterprise odoo shell -d odoo_col --no-http
+#   >>> exec(open('/mnt/extra-addons/odoo-secadora/scripts/benchmark_peso_comercial.py').read())
+#   >>> benchmark()            # todos los análisis
+#   >>> benchmark(limite=2000)
+#
+# NO guarda nada: todo corre dentro de un savepoint que se revierte.
+# ============================================================
+
+import time
+
+env = env(user=1)  # __system__: salta ir.rule
+
+CAMPOS = ['peso_comercial', 'diferencia_peso', 'detalle_descuento']
+
+
+def _leer(analisis):
+    analisis.invalidate_recordset(CAMPOS)
+    return {a['id']: (a['peso_comercial'], a['diferencia_peso'], a['detalle_descuento'])
+            for a in analisis.read(CAMPOS)}
+
+
+def _por_registro(analisis):
+    """Recálculo como lo hace hoy el ORM: registro por registro."""
+    for fname in CAMPOS:
+        env.add_to_compute(analisis._fields[fname], analisis)
+    analisis._recompute_recordset(CAMPOS)
+    analisis.flush_recordset(CAMPOS)
+
+
+def benchmark(limite=None):
+    Analisis = env['secadora.analisis.lab']
+    analisis = Analisis.search([], limit=limite)
+    print(f'\n===== {len(analisis)} análisis =====')
+    if not analisis:
+        return
+
+    with env.cr.savepoint(flush=False) as sp:
+        env.registry.clear_cache()  # sin reglas en caché para ambos caminos
+        t0 = time.perf_counter()
+        _por_registro(analisis)
+        t_orm = time.perf_counter() - t0
+        esperado = _leer(analisis)
+
+        env.registry.clear_cache()
+        t0 = time.perf_counter()
+        resumen = analisis._recalcular_peso_comercial_masivo()
+        t_masivo = time.perf_counter() - t0
+        obtenido = _leer(analisis)
+        sp.rollback()
+    env.invalidate_all()
+
+    distintos = [i for i in esperado if esperado[i] != obtenido.get(i)]
+    print(f'  Por registro (ORM): {t_orm:8.3f} s')
+    print(f'  Masivo (NumPy):     {t_masivo:8.3f} s  '
+          f'({resumen["vectorizados"]} vectorizados, {resumen["por_registro"]} por registro)')
+    if t_masivo:
+        print(f'  Aceleración:        {t_orm / t_masivo:8.1f} x')
+    if distintos:
+        print(f'  [!] {len(distintos)} análisis con resultado distinto, p. ej. id {distintos[0]}:')
+        print(f'      ORM:    {esperado[distintos[0]]}')
+        print(f'      masivo: {obtenido.get(distintos[0])}')
+    else:
+        print('  [OK] Resultados idénticos.')
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+# ============================================================
+# BENCHMARK de la serialización de los tableros — Odoo v18
+#
+# Compara, sobre los mismos registros:
+#   1. la serialización anterior (dicts armados recorriendo el ORM)
+#   2. secadora.serializador.columnas (una consulta con JOIN, columnas)
+# para la grilla de arroz (posiciones y pesajes en tránsito) y para el
+# tablero de transporte (fletes y sus facturas). Reporta consultas SQL,
+# tamaño del JSON y tiempo, y verifica que los datos sean los mismos.
+#
+# Uso (dentro del contenedor v18):
+#   docker exec -it odoo_enterprise odoo shell -d odoo_col --no-http
+#   >>> exec(open('/mnt/extra-addons/odoo-secadora/scripts/benchmark_serializacion_tableros.py').read())
+#   >>> benchmark()                               # datos actuales
+#   >>> benchmark(posiciones=2000, fletes=20000)  # + registros sembrados
+#
+# NO guarda nada: la siembra y las mediciones corren dentro de un
+# savepoint que se revierte.
+# ============================================================
+
+import json
+import time
+
+from odoo.addons.secadora_transporte.models.flete import CAMPOS_FACTURA_TABLERO
+
+env = env(user=1)  # __system__: salta ir.rule
+
+CAMPOS_FLETE = [
+    ('transportadora_id', 'transportadora_id'),
+    ('placa', 'placa_texto'),
+    ('costo_total', 'costo_total'),
+    ('factura_id', 'factura_transportadora_id'),
+]
+
+
+def _sembrar(modelo, dominio, cantidad, extra=None):
+    """Duplica el primer registro del dominio hasta sumar `cantidad` nuevos."""
+    if not cantidad:
+        return
+    base = env[modelo].search(dominio, limit=1)
+    if not base:
+        print(f'  [!] No hay {modelo} para sembrar.')
+        return
+    vals = base.copy_data(extra or {})[0]
+    env[modelo].create([dict(vals) for _i in range(cantidad)])
+
+
+# --- Serialización anterior (copiada del código previo al serializador) ---
+
+def _posiciones_anterior(posiciones):
+    modalidad_labels = dict(env['secadora.orden.servicio']._fields['modalidad_salida'].selection)
+    return [{
+        'id': p.id,
+        'name': p.name,
+        'sitio_id': p.sitio_id.id if p.sitio_id else False,
+        'pesaje_id': p.pesaje_id.id if p.pesaje_id else False,
+        'peso_kg': p.peso_kg,
+        'tercero': p.tercero_id.name if p.tercero_id else '',
+        'producto': p.producto_id.name if p.producto_id else '',
+        'variedad': p.variedad_id.name if p.variedad_id else '',
+        'pesaje_name': p.pesaje_name or '',
+        'placa_texto': p.placa_texto or '',
+        'conductor': p.conductor_id.name if p.conductor_id else '',
+        'tipo_operacion': p.tipo_operacion_id.name if p.tipo_operacion_id else '',
+        'modalidad_salida': modalidad_labels.get(p.modalidad_salida, '') if p.modalidad_salida else '',
+        'modalidad_salida_raw': p.modalidad_salida or '',
+        'es_division': p.es_division,
+        'es_division_hija': bool(p.posicion_origen_id),
+        'es_combinacion': p.es_comercial,
+        'es_preasignado': p.es_preasignado,
+        'es_semilla': p.es_semilla,
+        'permite_combinar': p.permite_combinar,
+        'humedad': p.humedad,
+        'impurezas': p.impurezas,
+    } for p in posiciones]
+
+
+def _transito_anterior(pesajes):
+    return [{
+        'id': pes.id,
+        'tercero': pes.tercero_id.name if pes.tercero_id else '',
+        'producto': pes.producto_id.name if pes.producto_id else '',
+        'variedad': pes.variedad_id.name if pes.variedad_id else '',
+        'peso_bruto': pes.peso_bruto,
+        'placa_texto': pes.placa_texto or '',
+        'conductor': pes.conductor_id.name if pes.conductor_id else '',
+        'tipo_operacion': pes.tipo_operacion_id.name if pes.tipo_operacion_id else '',
+        'pesaje_name': pes.name or '',
+        'humedad': pes.humedad,
+        'impurezas': pes.impurezas,
+    } for pes in pesajes]
+
+
+def _fletes_anterior(fletes):
+    filas = [{
+        'transportadora_id': x.transportadora_id.id or False,
+        'placa': x.placa_texto or '',
+        'costo_total': x.costo_total,
+        'factura_id': x.factura_transportadora_id.id or False,
+    } for x in fletes]
+    facturas = [{
+        'id': f.id,
+        'name': f.name or '',
+        'ref': f.ref or '',
+        'fecha': str(f.invoice_date) if f.invoice_date else '',
+        'estado': f.state,
+        'estado_pago_raw': f.payment_state or '',
+        'total': f.amount_total,
+        'saldo': f.amount_residual,
+        'por_pagar': f.es_por_pagar(),
+    } for f in fletes.mapped('factura_transportadora_id').sudo()]
+    return filas, facturas
+
+
+# --- Serialización nueva -----------------------------------------------
+
+def _fletes_columnas(fletes):
+    Serializador = env['secadora.serializador.columnas']
+    filas = Serializador._serializar(fletes, CAMPOS_FLETE)
+    facturas = Serializador._serializar(
+        env['account.move'].browse({fid for fid in filas['factura_id'] if fid}),
+        CAMPOS_FACTURA_TABLERO,
+    )
+    AccountMove = env['account.move']
+    facturas['por_pagar'] = [
+        AccountMove._es_por_pagar_valores(estado, pago)
+        for estado, pago in zip(facturas['estado'], facturas['estado_pago_raw'])
+    ]
+    return filas, facturas
+
+
+def _filas(columnas):
+    return [dict(zip(columnas, fila)) for fila in zip(*columnas.values())]
+
+
+def _medir(funcion, registros):
+    env.invalidate_all()
+    consultas = env.cr.sql_log_count
+    t0 = time.perf_counter()
+    resultado = funcion(registros)
+    return resultado, env.cr.sql_log_count - consultas, time.perf_counter() - t0
+
+
+def _reportar(nombre, n, anterior, nuevo, iguales):
+    (datos_a, sql_a, t_a), (datos_n, sql_n, t_n) = anterior, nuevo
+    bytes_a = len(json.dumps(datos_a, default=str))
+    bytes_n = len(json.dumps(datos_n, default=str))
+    print(f'\n  {nombre} ({n} registros)')
+    print(f'    Anterior:  {sql_a:6d} consultas  {bytes_a:10d} bytes  {t_a:8.3f} s')
+    print(f'    Columnas:  {sql_n:6d} consultas  {bytes_n:10d} bytes  {t_n:8.3f} s')
+    print('    [OK] Mismos datos.' if iguales else '    [!] Los datos difieren.')
+
+
+def benchmark(posiciones=0, fletes=0):
+    Posicion = env['secadora.posicion.arroz']
+    with env.cr.savepoint(flush=False) as sp:
+        _sembrar('secadora.posicion.arroz', [('state', '=', 'activo')], posiciones)
+        _sembrar('secadora.flete', [('state', '!=', 'cancelado')], fletes, {'pesaje_id': False})
+        env.flush_all()
+
+        activas = Posicion.search([('state', '=', 'activo')])
+        anterior = _medir(_posiciones_anterior, activas)
+        nuevo = _medir(Posicion._tablero_posiciones_data, activas)
+        _reportar('Grilla: posiciones', len(activas), anterior, nuevo,
+                  anterior[0] == _filas(nuevo[0]))
+
+        transito = env['secadora.pesaje'].search([
+            ('state', '=', 'en_transito'), ('direccion', '=', 'entrada'),
+        ])
+        anterior = _medir(_transito_anterior, transito)
+        nuevo = _medir(Posicion._tablero_transito_data, transito)
+        _reportar('Grilla: en tránsito', len(transito), anterior, nuevo,
+                  anterior[0] == _filas(nuevo[0]))
+
+        todos = env['secadora.flete'].search(
+            env['secadora.flete']._domain_tablero({})
+        )
+        anterior = _medir(_fletes_anterior, todos)
+        nuevo = _medir(_fletes_columnas, todos)
+        facturas_anterior = sorted(anterior[0][1], key=lambda f: f['id'])
+        facturas_nuevo = sorted(_filas(nuevo[0][1]), key=lambda f: f['id'])
+        _reportar('Transporte: fletes y facturas', len(todos), anterior, nuevo,
+                  anterior[0][0] == _filas(nuevo[0][0])
+                  and facturas_anterior == facturas_nuevo)
+        sp.rollback()
+    env.invalidate_all()
@@ -19,6 +19,7 @@
         'data/sequence_data.xml',
         'data/descuento_calidad_data.xml',
         'data/origen_muestra_data.xml',
+        'data/produccion_lote_cron.xml',
         'views/descuento_calidad_views.xml',
         'views/origen_muestra_views.xml',
         'views/analisis_lab_views.xml',
@@ -4,6 +4,10 @@ from . import origen_muestra
 from . import analisis_lab
 from . import descuento_calidad
 from . import pesaje
+from . import pesaje_distribucion
+from . import lote
+from . import lugar
+from . import vehiculo
 from . import orden_servicio
 from . import produccion_lote_report
 from . import res_config_settings
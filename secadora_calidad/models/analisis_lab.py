@@ -1,6 +1,27 @@
 # -*- coding: utf-8 -*-
 
+import logging
+from collections import defaultdict
+
 from odoo import models, fields, api
+from odoo.tools import SQL, split_every
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_logger = logging.getLogger(__name__)
+
+# Parámetros que pueden tener reglas de descuento (ver secadora.descuento.calidad)
+PARAMETROS_DESCUENTO = [
+    'humedad', 'impurezas', 'grano_partido', 'grano_partido_verde', 'grano_rojo',
+    'infestacion', 'cascarilla_pct', 'harina_pct', 'grano_yesado_pct',
+    'grano_ambarino_pct', 'grano_con_dano_pct',
+]
+CAMPOS_PESO_COMERCIAL = ['peso_comercial', 'diferencia_peso', 'detalle_descuento']
+# Análisis por consulta/UPDATE en el recálculo masivo
+RECALCULO_LOTE = 5000
 
 
 class AnalisisLab(models.Model):
@@ -168,7 +189,28 @@ class AnalisisLab(models.Model):
         for vals in vals_list:
             if vals.get('name', 'Nuevo') == 'Nuevo':
                 vals['name'] = self.env['ir.sequence'].next_by_code('secadora.analisis.lab') or 'Nuevo'
-        return super().create(vals_list)
+        records = super().create(vals_list)
+        # La temperatura del reporte de producción sale del último análisis
+        self.env['secadora.produccion.lote.report']._marcar_pendientes(
+            records.filtered('temperatura').pesaje_id.ids
+        )
+        return records
+
+    def write(self, vals):
+        campos_reporte = {'pesaje_id', 'temperatura', 'fecha_hora'} & set(vals)
+        pesajes_antes = self.pesaje_id if campos_reporte else None
+        res = super().write(vals)
+        if campos_reporte:
+            self.env['secadora.produccion.lote.report']._marcar_pendientes(
+                (pesajes_antes | self.pesaje_id).ids
+            )
+        return res
+
+    def unlink(self):
+        pesaje_ids = self.filtered('temperatura').pesaje_id.ids
+        res = super().unlink()
+        self.env['secadora.produccion.lote.report']._marcar_pendientes(pesaje_ids)
+        return res
 
     @api.onchange('origen_muestra_id')
     def _onchange_origen_muestra_id(self):
@@ -226,71 +268,266 @@ class AnalisisLab(models.Model):
                 record.detalle_descuento = 'Sin tipo de operación — sin descuentos'
                 continue
 
-            # Buscar reglas: producto específico + genéricas
-            domain = [
-                ('tipo_operacion_id', '=', tipo_op.id),
-                ('active', '=', True),
-            ]
-            todas_reglas = Descuento.search(domain)
-
-            # Para cada parámetro, elegir la regla más específica
-            reglas_a_aplicar = {}
-            for regla in todas_reglas:
-                param = regla.parametro
-                if regla.producto_id and producto and regla.producto_id == producto:
-                    # Producto específico: siempre tiene prioridad
-                    reglas_a_aplicar[param] = regla
-                elif not regla.producto_id:
-                    # Genérica: solo si no hay específica ya asignada
-                    if param not in reglas_a_aplicar or not reglas_a_aplicar[param].producto_id:
-                        reglas_a_aplicar[param] = regla
-
-            factores = []
-            kg_descuentos = []
-            detalles = []
-            detalles.append(f"Peso neto: {peso_neto:.2f} kg")
-            detalles.append(f"Tipo operación: {tipo_op.name}")
-            if producto:
-                detalles.append(f"Producto: {producto.display_name}")
-            detalles.append("---")
+            # Reglas ya resueltas (la más específica por parámetro) y
+            # compiladas; en caché por tipo de operación, producto y empresa.
+            reglas_a_aplicar = Descuento._reglas_compiladas(
+                tipo_op.id, producto.id, record.company_id.id)
 
-            for regla in sorted(reglas_a_aplicar.values(), key=lambda r: r.sequence):
-                resultado = regla.calcular_descuento(record)
+            aplicados = []
+            for regla in reglas_a_aplicar:
+                if regla.parametro not in record._fields:
+                    continue
+                resultado = Descuento._aplicar_regla(
+                    regla, record[regla.parametro], peso_neto)
                 if not resultado['detalle']:
                     continue
-                if resultado['tipo'] == 'factor':
-                    factores.append(resultado['valor'])
-                    detalles.append(f"× {resultado['detalle']}")
-                elif resultado['tipo'] == 'kg':
-                    kg_descuentos.append(resultado['valor'])
-                    detalles.append(f"- {resultado['detalle']}")
+                aplicados.append((resultado['tipo'], resultado['valor'], resultado['detalle']))
 
             # peso_comercial = peso_neto × (∏ factores) - (∑ kg)
             producto_factores = 1.0
-            for f in factores:
-                producto_factores *= f
+            for tipo, valor, _detalle in aplicados:
+                if tipo == 'factor':
+                    producto_factores *= valor
 
-            suma_kg = sum(kg_descuentos)
+            suma_kg = sum(valor for tipo, valor, _detalle in aplicados if tipo == 'kg')
 
             peso_comercial = peso_neto * producto_factores - suma_kg
 
-            if factores or kg_descuentos:
-                detalles.append("---")
-                if factores:
-                    detalles.append(
-                        f"Factor total: {' × '.join(f'{f:.6f}' for f in factores)} = {producto_factores:.6f}"
-                    )
+            record.peso_comercial = peso_comercial
+            record.diferencia_peso = peso_neto - peso_comercial
+            record.detalle_descuento = self._detalle_peso_comercial(
+                peso_neto, tipo_op.name, producto.display_name if producto else '',
+                aplicados, producto_factores, suma_kg, peso_comercial)
+
+    @api.model
+    def _detalle_peso_comercial(self, peso_neto, tipo_nombre, producto_nombre,
+                                aplicados, producto_factores, suma_kg, peso_comercial):
+        """Desglose de detalle_descuento; mismo texto en el cálculo por registro y el masivo.
+
+        aplicados: [(tipo, valor, detalle)] de las reglas que descontaron, en orden.
+        """
+        detalles = []
+        detalles.append(f"Peso neto: {peso_neto:.2f} kg")
+        detalles.append(f"Tipo operación: {tipo_nombre}")
+        if producto_nombre:
+            detalles.append(f"Producto: {producto_nombre}")
+        detalles.append("---")
+
+        factores = []
+        hay_kg = False
+        for tipo, valor, detalle in aplicados:
+            if tipo == 'factor':
+                factores.append(valor)
+                detalles.append(f"× {detalle}")
+            elif tipo == 'kg':
+                hay_kg = True
+                detalles.append(f"- {detalle}")
+
+        if factores or hay_kg:
+            detalles.append("---")
+            if factores:
                 detalles.append(
-                    f"Peso comercial: {peso_neto:.2f} × {producto_factores:.6f}"
-                    + (f" - {suma_kg:.2f}" if suma_kg else "")
-                    + f" = {peso_comercial:.2f} kg"
+                    f"Factor total: {' × '.join(f'{f:.6f}' for f in factores)} = {producto_factores:.6f}"
                 )
+            detalles.append(
+                f"Peso comercial: {peso_neto:.2f} × {producto_factores:.6f}"
+                + (f" - {suma_kg:.2f}" if suma_kg else "")
+                + f" = {peso_comercial:.2f} kg"
+            )
+        else:
+            detalles.append("Sin descuentos aplicables")
+        return '\n'.join(detalles)
+
+    def _recalcular_peso_comercial_masivo(self):
+        """Recalcula peso_comercial, diferencia_peso y detalle_descuento en bloque.
+
+        Para miles de análisis (p. ej. tras cambiar un umbral en plena
+        cosecha): lee parámetros y peso neto con una consulta, aplica los
+        modos doble_descuento, porcentaje_por_punto y factor_por_punto por
+        columnas con NumPy y escribe con un solo UPDATE por lote. El
+        resultado es idéntico al de _compute_peso_comercial, que se sigue
+        usando para los análisis con reglas de fórmula personalizada (o si
+        NumPy no está instalado).
+
+        Returns:
+            dict: {'vectorizados': int, 'por_registro': int}
+        """
+        resumen = {'vectorizados': 0, 'por_registro': 0}
+        if not self:
+            return resumen
+        self.env.flush_all()
+        por_registro = self.browse()
+        for ids in split_every(RECALCULO_LOTE, self.ids):
+            pendientes = self.browse(ids)._recalcular_lote_vectorizado()
+            resumen['vectorizados'] += len(ids) - len(pendientes)
+            por_registro |= pendientes
+
+        if por_registro:
+            campos = [self._fields[fname] for fname in CAMPOS_PESO_COMERCIAL]
+            self.env.add_to_compute(campos[0], por_registro)
+            for campo in campos[1:]:
+                self.env.add_to_compute(campo, por_registro)
+            por_registro._recompute_recordset(CAMPOS_PESO_COMERCIAL)
+            por_registro.flush_recordset(CAMPOS_PESO_COMERCIAL)
+            resumen['por_registro'] = len(por_registro)
+        return resumen
+
+    def _recalcular_lote_vectorizado(self):
+        """Un lote de _recalcular_peso_comercial_masivo.
+
+        Devuelve los análisis que deben ir por el cálculo por registro.
+        """
+        if np is None:
+            _logger.warning('Recálculo masivo de peso comercial sin NumPy: se usa el cálculo por registro.')
+            return self
+        Descuento = self.env['secadora.descuento.calidad']
+        Pesaje = self.env['secadora.pesaje']
+        activar = self.env['ir.config_parameter'].sudo().get_param(
+            'calidad.activar_peso_comercial', 'True') == 'True'
+
+        parametros = [p for p in PARAMETROS_DESCUENTO if p in self._fields]
+        self.env.cr.execute(SQL(
+            """
+            SELECT a.id, a.company_id,
+                   COALESCE(a.tipo_operacion_id, p.tipo_operacion_id),
+                   p.producto_id, p.id, p.peso_neto, %s
+              FROM secadora_analisis_lab a
+              LEFT JOIN secadora_pesaje p ON p.id = a.pesaje_id
+             WHERE a.id = ANY(%s)
+            """,
+            SQL(', ').join(SQL.identifier('a', p) for p in parametros),
+            self.ids,
+        ))
+        filas = self.env.cr.fetchall()
+
+        campo_peso = Pesaje._fields['peso_neto']
+        campos_param = [self._fields[p] for p in parametros]
+        resultados = {}  # id -> (peso_comercial, diferencia, detalle)
+        grupos = defaultdict(list)
+        for fila in filas:
+            analisis_id, company_id, tipo_id, producto_id, pesaje_id = fila[:5]
+            # Misma conversión que hace el ORM al leer (redondeo por digits)
+            peso_neto = campo_peso.convert_to_cache(fila[5], Pesaje)
+            if not activar or not pesaje_id or peso_neto <= 0:
+                resultados[analisis_id] = (0.0, 0.0, '')
+            elif not tipo_id:
+                resultados[analisis_id] = (peso_neto, 0.0, 'Sin tipo de operación — sin descuentos')
             else:
-                detalles.append("Sin descuentos aplicables")
-
-            record.peso_comercial = peso_comercial
-            record.diferencia_peso = peso_neto - peso_comercial
-            record.detalle_descuento = '\n'.join(detalles)
+                valores = [campo.convert_to_cache(v, self) for campo, v in zip(campos_param, fila[6:])]
+                grupos[(tipo_id, producto_id or False, company_id)].append(
+                    (analisis_id, peso_neto, valores))
+
+        nombres_tipo = dict(
+            (t.id, t.name) for t in self.env['secadora.tipo.operacion'].browse({k[0] for k in grupos}))
+        nombres_producto = dict(
+            (p.id, p.display_name) for p in self.env['product.product'].browse({k[1] for k in grupos if k[1]}))
+
+        por_registro = []
+        for (tipo_id, producto_id, company_id), miembros in grupos.items():
+            reglas = [
+                r for r in Descuento._reglas_compiladas(tipo_id, producto_id, company_id)
+                if r.parametro in parametros
+            ]
+            if any(r.modo_descuento == 'formula_personalizada' for r in reglas):
+                por_registro.extend(m[0] for m in miembros)
+                continue
+            resultados.update(self._descuentos_por_columnas(
+                reglas, parametros, miembros,
+                nombres_tipo[tipo_id], nombres_producto.get(producto_id, ''),
+            ))
+
+        self._escribir_peso_comercial(resultados)
+        return self.browse(por_registro)
+
+    @api.model
+    def _descuentos_por_columnas(self, reglas, parametros, miembros, tipo_nombre, producto_nombre):
+        """Aplica las reglas a un grupo de análisis con operaciones sobre arrays.
+
+        Las operaciones y su orden son las mismas que en _aplicar_regla y
+        _compute_peso_comercial (multiplicar por 1.0 o sumar 0.0 donde la
+        regla no aplica no cambia el resultado), así los valores coinciden
+        bit a bit con el cálculo por registro.
+        """
+        Descuento = self.env['secadora.descuento.calidad']
+        ids = [m[0] for m in miembros]
+        peso = np.array([m[1] for m in miembros], dtype=np.float64)
+        matriz = np.array([m[2] for m in miembros], dtype=np.float64).reshape(len(miembros), len(parametros))
+        columnas = {p: matriz[:, i] for i, p in enumerate(parametros)}
+
+        producto_factores = np.ones(len(ids))
+        suma_kg = np.zeros(len(ids))
+        aplicadas = []  # (regla, mascara, valores, exceso, resultado)
+        for regla in reglas:
+            valor = columnas[regla.parametro]
+            mascara = valor > regla.umbral
+            exceso = valor - regla.umbral
+            if regla.modo_descuento == 'doble_descuento':
+                denominador = 100.0 - regla.umbral
+                if denominador <= 0:
+                    continue
+                resultado = np.minimum((100.0 - valor) / denominador, 1.0)
+                producto_factores = producto_factores * np.where(mascara, resultado, 1.0)
+            elif regla.modo_descuento == 'porcentaje_por_punto':
+                resultado = peso * (exceso / 100.0) * regla.factor
+                suma_kg = suma_kg + np.where(mascara, resultado, 0.0)
+            elif regla.modo_descuento == 'factor_por_punto':
+                resultado = exceso * regla.factor
+                suma_kg = suma_kg + np.where(mascara, resultado, 0.0)
+            else:
+                continue
+            aplicadas.append((regla, mascara, valor, exceso, resultado))
+
+        peso_comercial = peso * producto_factores - suma_kg
+        diferencia = peso - peso_comercial
+
+        resultados = {}
+        for i, analisis_id in enumerate(ids):
+            aplicados = [
+                ('factor' if regla.modo_descuento == 'doble_descuento' else 'kg',
+                 float(resultado[i]),
+                 Descuento._detalle_regla(regla, float(valor[i]), float(peso[i]),
+                                          float(exceso[i]), float(resultado[i])))
+                for regla, mascara, valor, exceso, resultado in aplicadas
+                if mascara[i]
+            ]
+            resultados[analisis_id] = (
+                float(peso_comercial[i]),
+                float(diferencia[i]),
+                self._detalle_peso_comercial(
+                    float(peso[i]), tipo_nombre, producto_nombre, aplicados,
+                    float(producto_factores[i]), float(suma_kg[i]), float(peso_comercial[i])),
+            )
+        return resultados
+
+    def _escribir_peso_comercial(self, resultados):
+        """Escribe {id: (peso_comercial, diferencia, detalle)} con un solo UPDATE."""
+        if not resultados:
+            return
+        campo_pc = self._fields['peso_comercial']
+        campo_dif = self._fields['diferencia_peso']
+        ids = list(resultados)
+        self.env.cr.execute(SQL(
+            """
+            UPDATE secadora_analisis_lab a
+               SET peso_comercial = v.peso_comercial,
+                   diferencia_peso = v.diferencia_peso,
+                   detalle_descuento = v.detalle,
+                   write_uid = %s,
+                   write_date = (now() at time zone 'UTC')
+              FROM unnest(%s::int[], %s::numeric[], %s::numeric[], %s::text[])
+                   AS v(id, peso_comercial, diferencia_peso, detalle)
+             WHERE a.id = v.id
+            """,
+            self.env.uid,
+            ids,
+            [campo_pc.convert_to_column(resultados[i][0], self) for i in ids],
+            [campo_dif.convert_to_column(resultados[i][1], self) for i in ids],
+            [resultados[i][2] for i in ids],
+        ))
+        registros = self.browse(ids)
+        registros.invalidate_recordset(CAMPOS_PESO_COMERCIAL + ['write_uid', 'write_date'])
+        # Los campos que dependen del peso comercial (p. ej. en el pesaje)
+        registros.modified(CAMPOS_PESO_COMERCIAL)
 
     def action_confirmar(self):
         for record in self:
@@ -1,13 +1,34 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api, _
+from collections import namedtuple
+
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import ValidationError
-from odoo.tools.safe_eval import safe_eval
+from odoo.tools.safe_eval import safe_eval, test_expr, unsafe_eval, _SAFE_OPCODES, _BUILTINS
+
+
+# Regla ya resuelta que guarda la caché de _reglas_compiladas: valores
+# planos (la ormcache vive más que el cursor, no puede guardar records) y la
+# fórmula personalizada ya compilada.
+ReglaCompilada = namedtuple('ReglaCompilada', [
+    'id', 'sequence', 'parametro', 'etiqueta', 'umbral', 'modo_descuento', 'factor', 'codigo',
+])
+
+
+def _compilar_formula(formula):
+    """Valida la fórmula con las reglas de safe_eval y devuelve el código compilado."""
+    return test_expr(formula, _SAFE_OPCODES, mode='eval', filename='descuento_calidad')
+
+
+def _evaluar_formula(codigo, ctx):
+    """Evalúa una fórmula compilada con _compilar_formula (mismo entorno que safe_eval)."""
+    return unsafe_eval(codigo, {'__builtins__': dict(_BUILTINS)}, ctx)
 
 
 class DescuentoCalidad(models.Model):
     _name = 'secadora.descuento.calidad'
     _description = 'Regla de Descuento por Calidad'
+    _inherit = ['secadora.cache.mixin']
     _order = 'sequence, id'
 
     name = fields.Char(string='Nombre', required=True)
@@ -115,66 +136,102 @@ class DescuentoCalidad(models.Model):
                         _('Error de sintaxis en la fórmula: %s') % str(e)
                     )
 
-    def calcular_descuento(self, analisis):
-        """Calcular el descuento para un análisis dado.
+    def _compilar(self):
+        """Instantánea de la regla para la caché (ver ReglaCompilada)."""
+        self.ensure_one()
+        etiquetas = dict(self._fields['parametro'].selection)
+        codigo = None
+        if self.modo_descuento == 'formula_personalizada' and self.formula:
+            codigo = _compilar_formula(self.formula)
+        return ReglaCompilada(
+            id=self.id,
+            sequence=self.sequence,
+            parametro=self.parametro,
+            etiqueta=etiquetas.get(self.parametro, self.parametro),
+            umbral=self.umbral,
+            modo_descuento=self.modo_descuento,
+            factor=self.factor,
+            codigo=codigo,
+        )
 
-        Args:
-            analisis: record de secadora.analisis.lab
+    @api.model
+    @tools.ormcache('tipo_operacion_id', 'producto_id', 'company_id')
+    def _reglas_compiladas(self, tipo_operacion_id, producto_id, company_id):
+        """Reglas que aplican a (tipo de operación, producto, empresa), ya compiladas.
+
+        Una sola consulta por combinación mientras no cambie ninguna regla
+        (create/write/unlink limpian la caché). Por parámetro se deja la
+        regla más específica: la del producto gana sobre la genérica.
+        Devuelve una tupla de ReglaCompilada ordenada por secuencia.
+        """
+        todas_reglas = self.sudo().search([
+            ('tipo_operacion_id', '=', tipo_operacion_id),
+            ('active', '=', True),
+            ('company_id', 'in', [False, company_id]),
+        ])
+
+        reglas_a_aplicar = {}
+        for regla in todas_reglas:
+            param = regla.parametro
+            if regla.producto_id and producto_id and regla.producto_id.id == producto_id:
+                # Producto específico: siempre tiene prioridad
+                reglas_a_aplicar[param] = regla
+            elif not regla.producto_id:
+                # Genérica: solo si no hay específica ya asignada
+                if param not in reglas_a_aplicar or not reglas_a_aplicar[param].producto_id:
+                    reglas_a_aplicar[param] = regla
+
+        return tuple(
+            regla._compilar()
+            for regla in sorted(reglas_a_aplicar.values(), key=lambda r: r.sequence)
+        )
+
+    @api.model
+    def _aplicar_regla(self, regla, valor, peso_neto):
+        """Descuento de una ReglaCompilada para un valor del parámetro.
 
         Returns:
             dict: {'tipo': 'factor'|'kg', 'valor': float, 'detalle': str}
         """
-        self.ensure_one()
-        if self.parametro not in analisis._fields:
-            return {'tipo': 'factor', 'valor': 1.0, 'detalle': ''}
-        valor = getattr(analisis, self.parametro, 0.0) or 0.0
-        peso_neto = analisis.pesaje_id.peso_neto if analisis.pesaje_id else 0.0
-        parametro_label = dict(self._fields['parametro'].selection).get(self.parametro, self.parametro)
+        valor = valor or 0.0
+        parametro_label = regla.etiqueta
 
-        if valor <= self.umbral:
+        if valor <= regla.umbral:
             return {'tipo': 'factor', 'valor': 1.0, 'detalle': ''}
 
-        exceso = valor - self.umbral
+        exceso = valor - regla.umbral
 
-        if self.modo_descuento == 'doble_descuento':
+        if regla.modo_descuento == 'doble_descuento':
             # Factor = (100 - valor_real) / (100 - umbral), capped a 1.0
-            denominador = 100.0 - self.umbral
+            denominador = 100.0 - regla.umbral
             if denominador <= 0:
                 return {'tipo': 'factor', 'valor': 1.0, 'detalle': ''}
             factor_calc = (100.0 - valor) / denominador
             factor_calc = min(factor_calc, 1.0)
-            detalle = (
-                f"{parametro_label}: (100 - {valor:.2f}) / (100 - {self.umbral:.2f}) "
-                f"= {factor_calc:.6f}"
-            )
+            detalle = self._detalle_regla(regla, valor, peso_neto, exceso, factor_calc)
             return {'tipo': 'factor', 'valor': factor_calc, 'detalle': detalle}
 
-        elif self.modo_descuento == 'porcentaje_por_punto':
+        elif regla.modo_descuento == 'porcentaje_por_punto':
             # kg = peso × (exceso/100) × factor
-            kg = peso_neto * (exceso / 100.0) * self.factor
-            detalle = (
-                f"{parametro_label}: {peso_neto:.2f} × ({exceso:.2f}/100) × {self.factor:.4f} "
-                f"= {kg:.2f} kg"
-            )
+            kg = peso_neto * (exceso / 100.0) * regla.factor
+            detalle = self._detalle_regla(regla, valor, peso_neto, exceso, kg)
             return {'tipo': 'kg', 'valor': kg, 'detalle': detalle}
 
-        elif self.modo_descuento == 'factor_por_punto':
+        elif regla.modo_descuento == 'factor_por_punto':
             # kg = exceso × factor
-            kg = exceso * self.factor
-            detalle = (
-                f"{parametro_label}: {exceso:.2f} × {self.factor:.4f} = {kg:.2f} kg"
-            )
+            kg = exceso * regla.factor
+            detalle = self._detalle_regla(regla, valor, peso_neto, exceso, kg)
             return {'tipo': 'kg', 'valor': kg, 'detalle': detalle}
 
-        elif self.modo_descuento == 'formula_personalizada':
+        elif regla.modo_descuento == 'formula_personalizada' and regla.codigo:
             ctx = {
                 'peso': peso_neto,
                 'valor': valor,
-                'umbral': self.umbral,
+                'umbral': regla.umbral,
                 'exceso': exceso,
-                'factor': self.factor,
+                'factor': regla.factor,
             }
-            result = safe_eval(self.formula, ctx, nocopy=True)
+            result = _evaluar_formula(regla.codigo, ctx)
             detalle = f"{parametro_label} (fórmula): {result['tipo']}={result['valor']:.4f}"
             return {
                 'tipo': result['tipo'],
@@ -183,3 +240,62 @@ class DescuentoCalidad(models.Model):
             }
 
         return {'tipo': 'factor', 'valor': 1.0, 'detalle': ''}
+
+    @api.model
+    def _detalle_regla(self, regla, valor, peso_neto, exceso, resultado):
+        """Línea del detalle para una regla que descontó (modos sin fórmula).
+
+        La usan _aplicar_regla y el recálculo masivo de análisis, que calcula
+        los valores por columnas; así el texto es idéntico en ambos caminos.
+        """
+        parametro_label = regla.etiqueta
+        if regla.modo_descuento == 'doble_descuento':
+            return (
+                f"{parametro_label}: (100 - {valor:.2f}) / (100 - {regla.umbral:.2f}) "
+                f"= {resultado:.6f}"
+            )
+        if regla.modo_descuento == 'porcentaje_por_punto':
+            return (
+                f"{parametro_label}: {peso_neto:.2f} × ({exceso:.2f}/100) × {regla.factor:.4f} "
+                f"= {resultado:.2f} kg"
+            )
+        return f"{parametro_label}: {exceso:.2f} × {regla.factor:.4f} = {resultado:.2f} kg"
+
+    def action_recalcular_analisis(self):
+        """Recalcula en bloque el peso comercial de los análisis afectados por estas reglas."""
+        tipos = self.mapped('tipo_operacion_id')
+        analisis = self.env['secadora.analisis.lab'].search([
+            '|',
+            ('tipo_operacion_id', 'in', tipos.ids),
+            '&',
+            ('tipo_operacion_id', '=', False),
+            ('pesaje_id.tipo_operacion_id', 'in', tipos.ids),
+        ])
+        resumen = analisis._recalcular_peso_comercial_masivo()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Peso comercial recalculado'),
+                'message': _('%(total)s análisis recalculados (%(por_registro)s con fórmula personalizada).',
+                             total=len(analisis), por_registro=resumen['por_registro']),
+                'type': 'success',
+                'sticky': False,
+            }
+        }
+
+    def calcular_descuento(self, analisis):
+        """Calcular el descuento para un análisis dado.
+
+        Args:
+            analisis: record de secadora.analisis.lab
+
+        Returns:
+            dict: {'tipo': 'factor'|'kg', 'valor': float, 'detalle': str}
+        """
+        self.ensure_one()
+        if self.parametro not in analisis._fields:
+            return {'tipo': 'factor', 'valor': 1.0, 'detalle': ''}
+        valor = getattr(analisis, self.parametro, 0.0) or 0.0
+        peso_neto = analisis.pesaje_id.peso_neto if analisis.pesaje_id else 0.0
+        return self._aplicar_regla(self._compilar(), valor, peso_neto)
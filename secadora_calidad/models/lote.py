@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models
+from odoo.tools import SQL
+
+
+class SecadoraLote(models.Model):
+    _inherit = 'secadora.lote'
+
+    def write(self, vals):
+        res = super().write(vals)
+        # Las hectáreas del reporte de producción salen del lote (o de su nombre)
+        if {'hectareas', 'name'} & set(vals):
+            self.env['secadora.produccion.lote.report']._marcar_pendientes(condicion=SQL("""
+                p.lote_id = ANY(%(ids)s) OR EXISTS (
+                    SELECT 1 FROM secadora_pesaje_distribucion d
+                     WHERE d.pesaje_id = p.id AND d.lote_id = ANY(%(ids)s))
+            """, ids=self.ids))
+        return res
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models
+from odoo.tools import SQL
+
+
+class SecadoraLugar(models.Model):
+    _inherit = 'secadora.lugar'
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'incluir_reporte_produccion' in vals:
+            self.env['secadora.produccion.lote.report']._marcar_pendientes(condicion=SQL("""
+                p.origen_id = ANY(%(ids)s) OR EXISTS (
+                    SELECT 1 FROM secadora_pesaje_distribucion d
+                     WHERE d.pesaje_id = p.id AND d.finca_id = ANY(%(ids)s))
+            """, ids=self.ids))
+        return res
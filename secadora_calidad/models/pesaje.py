@@ -5,6 +5,14 @@ from odoo import models, fields, api
 
 _logger = logging.getLogger(__name__)
 
+# Campos del pesaje que alimentan secadora.produccion.lote.report (incluye
+# los que recalculan peso_neto y placa_texto)
+CAMPOS_REPORTE_PRODUCCION = {
+    'name', 'fecha', 'state', 'direccion', 'origen_id', 'lote_id', 'bultos',
+    'peso_bruto', 'peso_tara', 'tercero_id', 'variedad_id', 'company_id',
+    'empresa_arroz_id', 'vehiculo_id', 'humedad', 'impurezas', 'grano_partido',
+}
+
 
 class SecadoraPesajeCalidad(models.Model):
     _inherit = 'secadora.pesaje'
@@ -34,6 +42,13 @@ class SecadoraPesajeCalidad(models.Model):
         help='Humedad del último análisis de laboratorio confirmado'
     )
 
+    reporte_produccion_pendiente = fields.Boolean(
+        string='Pendiente en Reporte de Producción',
+        readonly=True,
+        copy=False,
+        help='Sus filas del reporte de producción se recalculan en el próximo refresco.',
+    )
+
     def _compute_analisis_count(self):
         for record in self:
             record.analisis_count = len(record.analisis_lab_ids)
@@ -55,6 +70,8 @@ class SecadoraPesajeCalidad(models.Model):
 
     def write(self, vals):
         res = super().write(vals)
+        if CAMPOS_REPORTE_PRODUCCION & set(vals):
+            self.env['secadora.produccion.lote.report']._marcar_pendientes(self.ids)
         # Re-sincronizar datos de identidad a los análisis vinculados NO
         # confirmados. Solo campos que identifican el pesaje; humedad/impurezas
         # NO se tocan porque el laboratorio las re-mide en el propio análisis.
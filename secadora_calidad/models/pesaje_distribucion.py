@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, api
+
+
+class SecadoraPesajeDistribucion(models.Model):
+    _inherit = 'secadora.pesaje.distribucion'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['secadora.produccion.lote.report']._marcar_pendientes(records.pesaje_id.ids)
+        return records
+
+    def write(self, vals):
+        pesajes_antes = self.pesaje_id
+        res = super().write(vals)
+        self.env['secadora.produccion.lote.report']._marcar_pendientes(
+            (pesajes_antes | self.pesaje_id).ids
+        )
+        return res
+
+    def unlink(self):
+        pesaje_ids = self.pesaje_id.ids
+        res = super().unlink()
+        self.env['secadora.produccion.lote.report']._marcar_pendientes(pesaje_ids)
+        return res
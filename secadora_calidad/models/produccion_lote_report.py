@@ -1,10 +1,36 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, tools
+import logging
+
+from odoo import models, fields, api, tools
+from odoo.tools import SQL
+from odoo.tools.sql import TableKind, create_index, table_kind
+
+_logger = logging.getLogger(__name__)
+
+# Columnas de la tabla materializada (todas menos id), en el orden del SELECT
+COLUMNAS = (
+    'pesaje_id', 'name', 'fecha', 'finca_id', 'lote_id', 'tercero_id',
+    'variedad_id', 'company_id', 'empresa_arroz_id', 'placa', 'bultos',
+    'peso_kg', 'hectareas', 'produccion_ha', 'peso_kg_corregido',
+    'produccion_ha_corregida', 'bultos_ha', 'bultos_ha_corregido',
+    'humedad', 'impurezas', 'grano_partido', 'temperatura',
+)
+
+# Índices para los filtros y agrupaciones del pivot/búsqueda
+INDICES = {
+    'fecha': ['fecha'],
+    'finca_lote': ['finca_id', 'lote_id'],
+    'lote': ['lote_id'],
+    'tercero': ['tercero_id'],
+    'variedad': ['variedad_id'],
+    'company': ['company_id'],
+    'pesaje': ['pesaje_id'],
+}
 
 
 class ProduccionLoteReport(models.Model):
-    """Vista SQL de producción (entradas) por Finca y Lote.
+    """Reporte de producción (entradas) por Finca y Lote, materializado.
 
     Una fila por (pesaje de entrada completado, finca, lote):
     - Pesaje sin líneas de distribución: una fila con su origen/lote y peso neto.
@@ -13,12 +39,23 @@ class ProduccionLoteReport(models.Model):
     Las métricas de calidad vienen NULLIF(0): un 0 significa "no medido" y no
     debe diluir los promedios del pivot. La temperatura sale del último
     análisis de laboratorio del pesaje que la tenga registrada.
+
+    Antes era una vista SQL que recalculaba todo (DISTINCT ON, anti-join y
+    LATERAL) en cada apertura del pivot. Ahora las filas viven en una tabla
+    con índices: los cambios de pesajes, líneas de distribución, análisis,
+    lotes y fincas marcan el pesaje como pendiente
+    (secadora.pesaje.reporte_produccion_pendiente) y el cron de refresco
+    recalcula solo esos pesajes, segundos después de confirmarse el cambio.
+    Otro cron reconstruye la tabla completa cada noche, por si algún cambio
+    no pasó por el ORM; también se puede lanzar a mano.
     """
     _name = 'secadora.produccion.lote.report'
     _description = 'Producción por Finca y Lote'
     _auto = False
     _order = 'fecha desc, id desc'
 
+    CRON_REFRESCO = 'secadora_calidad.ir_cron_refrescar_produccion_lote'
+
     pesaje_id = fields.Many2one('secadora.pesaje', string='Pesaje', readonly=True)
     name = fields.Char(string='Número', readonly=True)
     fecha = fields.Date(string='Fecha', readonly=True)
@@ -60,99 +97,262 @@ class ProduccionLoteReport(models.Model):
     temperatura = fields.Float(string='Temperatura (°C)', readonly=True, digits=(5, 2), aggregator='avg')
 
     def init(self):
-        tools.drop_view_if_exists(self.env.cr, self._table)
-        self.env.cr.execute("""
-            CREATE OR REPLACE VIEW secadora_produccion_lote_report AS (
-                WITH lab AS (
-                    -- Último análisis de laboratorio por pesaje con temperatura medida
-                    SELECT DISTINCT ON (al.pesaje_id)
-                           al.pesaje_id,
-                           al.temperatura
-                    FROM secadora_analisis_lab al
-                    WHERE al.pesaje_id IS NOT NULL
-                      AND COALESCE(al.temperatura, 0) > 0
-                    ORDER BY al.pesaje_id, al.fecha_hora DESC, al.id DESC
-                ),
-                tot AS (
-                    SELECT pesaje_id, SUM(bultos) AS total_bultos
-                    FROM secadora_pesaje_distribucion
-                    GROUP BY pesaje_id
-                ),
-                base AS (
-                    -- Caso simple: pesaje sin líneas de distribución
-                    SELECT p.id AS pesaje_id,
-                           p.origen_id AS finca_id,
-                           p.lote_id,
-                           COALESCE(p.bultos, 0) AS bultos,
-                           p.peso_neto AS peso_kg
-                    FROM secadora_pesaje p
-                    WHERE NOT EXISTS (
-                        SELECT 1 FROM secadora_pesaje_distribucion d
-                        WHERE d.pesaje_id = p.id
-                    )
-                    UNION ALL
-                    -- Carga mixta: una fila por línea, peso prorrateado por bultos
-                    SELECT d.pesaje_id,
-                           d.finca_id,
-                           d.lote_id,
-                           d.bultos,
-                           CASE WHEN t.total_bultos > 0
-                                THEN p.peso_neto * d.bultos::numeric / t.total_bultos
-                                ELSE 0 END AS peso_kg
-                    FROM secadora_pesaje_distribucion d
-                    JOIN secadora_pesaje p ON p.id = d.pesaje_id
-                    JOIN tot t ON t.pesaje_id = d.pesaje_id
+        cr = self.env.cr
+        # La tabla se recrea en cada actualización del módulo: así su
+        # estructura siempre corresponde a la consulta de _consulta_fuente.
+        if table_kind(cr, self._table) == TableKind.View:
+            tools.drop_view_if_exists(cr, self._table)
+        cr.execute(SQL("DROP TABLE IF EXISTS %s", SQL.identifier(self._table)))
+        cr.execute(SQL("""
+            CREATE TABLE %s (
+                id SERIAL PRIMARY KEY,
+                pesaje_id INTEGER NOT NULL REFERENCES secadora_pesaje(id) ON DELETE CASCADE,
+                name VARCHAR,
+                fecha DATE,
+                finca_id INTEGER,
+                lote_id INTEGER,
+                tercero_id INTEGER,
+                variedad_id INTEGER,
+                company_id INTEGER,
+                empresa_arroz_id INTEGER,
+                placa VARCHAR,
+                bultos INTEGER,
+                peso_kg NUMERIC,
+                hectareas NUMERIC,
+                produccion_ha NUMERIC,
+                peso_kg_corregido NUMERIC,
+                produccion_ha_corregida NUMERIC,
+                bultos_ha NUMERIC,
+                bultos_ha_corregido NUMERIC,
+                humedad NUMERIC,
+                impurezas NUMERIC,
+                grano_partido NUMERIC,
+                temperatura NUMERIC
+            )
+        """, SQL.identifier(self._table)))
+        for sufijo, columnas in INDICES.items():
+            create_index(cr, f'{self._table}_{sufijo}_idx', self._table, columnas)
+        # Cola de pesajes pendientes: índice parcial, solo los marcados
+        create_index(
+            cr, 'secadora_pesaje_reporte_produccion_pendiente_idx', 'secadora_pesaje',
+            ['id'], where='reporte_produccion_pendiente',
+        )
+        self._reconstruir()
+
+    @api.model
+    def _consulta_fuente(self, pesaje_ids=None):
+        """SELECT de las filas del reporte, de todos los pesajes o solo de
+        pesaje_ids (el filtro se aplica dentro de cada subconsulta para que
+        no se recorran las tablas completas)."""
+        if pesaje_ids is None:
+            filtro_lab = filtro_tot = filtro_simple = filtro_mixta = SQL()
+        else:
+            pesaje_ids = list(pesaje_ids)
+            filtro_lab = SQL("AND al.pesaje_id = ANY(%s)", pesaje_ids)
+            filtro_tot = SQL("WHERE pesaje_id = ANY(%s)", pesaje_ids)
+            filtro_simple = SQL("AND p.id = ANY(%s)", pesaje_ids)
+            filtro_mixta = SQL("WHERE d.pesaje_id = ANY(%s)", pesaje_ids)
+        return SQL("""
+            WITH lab AS (
+                -- Último análisis de laboratorio por pesaje con temperatura medida
+                SELECT DISTINCT ON (al.pesaje_id)
+                       al.pesaje_id,
+                       al.temperatura
+                FROM secadora_analisis_lab al
+                WHERE al.pesaje_id IS NOT NULL
+                  AND COALESCE(al.temperatura, 0) > 0
+                  %(filtro_lab)s
+                ORDER BY al.pesaje_id, al.fecha_hora DESC, al.id DESC
+            ),
+            tot AS (
+                SELECT pesaje_id, SUM(bultos) AS total_bultos
+                FROM secadora_pesaje_distribucion
+                %(filtro_tot)s
+                GROUP BY pesaje_id
+            ),
+            base AS (
+                -- Caso simple: pesaje sin líneas de distribución
+                SELECT p.id AS pesaje_id,
+                       p.origen_id AS finca_id,
+                       p.lote_id,
+                       COALESCE(p.bultos, 0) AS bultos,
+                       p.peso_neto AS peso_kg
+                FROM secadora_pesaje p
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM secadora_pesaje_distribucion d
+                    WHERE d.pesaje_id = p.id
                 )
-                SELECT ROW_NUMBER() OVER (ORDER BY b.pesaje_id, b.lote_id) AS id,
-                       b.pesaje_id,
-                       p.name,
-                       p.fecha,
-                       b.finca_id,
-                       b.lote_id,
-                       p.tercero_id,
-                       p.variedad_id,
-                       p.company_id,
-                       p.empresa_arroz_id,
-                       p.placa_texto AS placa,
-                       b.bultos,
-                       b.peso_kg,
-                       ha.hectareas,
-                       CASE WHEN ha.hectareas > 0
-                            THEN b.peso_kg / ha.hectareas END AS produccion_ha,
-                       corr.peso_kg_corregido,
-                       CASE WHEN ha.hectareas > 0
-                            THEN corr.peso_kg_corregido / ha.hectareas END AS produccion_ha_corregida,
-                       CASE WHEN ha.hectareas > 0
-                            THEN b.peso_kg / 62.5 / ha.hectareas END AS bultos_ha,
-                       CASE WHEN ha.hectareas > 0
-                            THEN corr.peso_kg_corregido / 62.5 / ha.hectareas END AS bultos_ha_corregido,
-                       NULLIF(p.humedad, 0) AS humedad,
-                       NULLIF(p.impurezas, 0) AS impurezas,
-                       NULLIF(p.grano_partido, 0) AS grano_partido,
-                       lab.temperatura
-                FROM base b
-                JOIN secadora_pesaje p ON p.id = b.pesaje_id
-                JOIN secadora_lugar lg ON lg.id = b.finca_id
-                LEFT JOIN secadora_lote l ON l.id = b.lote_id
-                LEFT JOIN LATERAL (
-                    -- Hectáreas efectivas: campo del catálogo, o el nombre
-                    -- del lote si es numérico (convención de la secadora)
-                    SELECT COALESCE(
-                        NULLIF(l.hectareas, 0),
-                        CASE WHEN TRIM(l.name) ~ '^\\d+([.,]\\d+)?$'
-                             THEN REPLACE(TRIM(l.name), ',', '.')::numeric
-                        END) AS hectareas
-                ) ha ON TRUE
-                LEFT JOIN LATERAL (
-                    -- Peso ajustado a humedad base 22%: solo cuando la humedad
-                    -- medida es menor a 22 (arroz más seco vale más)
-                    SELECT CASE WHEN COALESCE(p.humedad, 0) > 0 AND p.humedad < 22
-                                THEN b.peso_kg * (100 - p.humedad) / 78.0
-                                ELSE b.peso_kg END AS peso_kg_corregido
-                ) corr ON TRUE
-                LEFT JOIN lab ON lab.pesaje_id = b.pesaje_id
-                WHERE p.direccion = 'entrada'
-                  AND p.state = 'completado'
-                  AND COALESCE(lg.incluir_reporte_produccion, TRUE)
+                %(filtro_simple)s
+                UNION ALL
+                -- Carga mixta: una fila por línea, peso prorrateado por bultos
+                SELECT d.pesaje_id,
+                       d.finca_id,
+                       d.lote_id,
+                       d.bultos,
+                       CASE WHEN t.total_bultos > 0
+                            THEN p.peso_neto * d.bultos::numeric / t.total_bultos
+                            ELSE 0 END AS peso_kg
+                FROM secadora_pesaje_distribucion d
+                JOIN secadora_pesaje p ON p.id = d.pesaje_id
+                JOIN tot t ON t.pesaje_id = d.pesaje_id
+                %(filtro_mixta)s
             )
+            SELECT b.pesaje_id,
+                   p.name,
+                   p.fecha,
+                   b.finca_id,
+                   b.lote_id,
+                   p.tercero_id,
+                   p.variedad_id,
+                   p.company_id,
+                   p.empresa_arroz_id,
+                   p.placa_texto AS placa,
+                   b.bultos,
+                   b.peso_kg,
+                   ha.hectareas,
+                   CASE WHEN ha.hectareas > 0
+                        THEN b.peso_kg / ha.hectareas END AS produccion_ha,
+                   corr.peso_kg_corregido,
+                   CASE WHEN ha.hectareas > 0
+                        THEN corr.peso_kg_corregido / ha.hectareas END AS produccion_ha_corregida,
+                   CASE WHEN ha.hectareas > 0
+                        THEN b.peso_kg / 62.5 / ha.hectareas END AS bultos_ha,
+                   CASE WHEN ha.hectareas > 0
+                        THEN corr.peso_kg_corregido / 62.5 / ha.hectareas END AS bultos_ha_corregido,
+                   NULLIF(p.humedad, 0) AS humedad,
+                   NULLIF(p.impurezas, 0) AS impurezas,
+                   NULLIF(p.grano_partido, 0) AS grano_partido,
+                   lab.temperatura
+            FROM base b
+            JOIN secadora_pesaje p ON p.id = b.pesaje_id
+            JOIN secadora_lugar lg ON lg.id = b.finca_id
+            LEFT JOIN secadora_lote l ON l.id = b.lote_id
+            LEFT JOIN LATERAL (
+                -- Hectáreas efectivas: campo del catálogo, o el nombre
+                -- del lote si es numérico (convención de la secadora)
+                SELECT COALESCE(
+                    NULLIF(l.hectareas, 0),
+                    CASE WHEN TRIM(l.name) ~ '^\\d+([.,]\\d+)?$'
+                         THEN REPLACE(TRIM(l.name), ',', '.')::numeric
+                    END) AS hectareas
+            ) ha ON TRUE
+            LEFT JOIN LATERAL (
+                -- Peso ajustado a humedad base 22%%: solo cuando la humedad
+                -- medida es menor a 22 (arroz más seco vale más)
+                SELECT CASE WHEN COALESCE(p.humedad, 0) > 0 AND p.humedad < 22
+                            THEN b.peso_kg * (100 - p.humedad) / 78.0
+                            ELSE b.peso_kg END AS peso_kg_corregido
+            ) corr ON TRUE
+            LEFT JOIN lab ON lab.pesaje_id = b.pesaje_id
+            WHERE p.direccion = 'entrada'
+              AND p.state = 'completado'
+              AND COALESCE(lg.incluir_reporte_produccion, TRUE)
+            ORDER BY b.pesaje_id, b.lote_id
+        """, filtro_lab=filtro_lab, filtro_tot=filtro_tot,
+             filtro_simple=filtro_simple, filtro_mixta=filtro_mixta)
+
+    @api.model
+    def _insertar(self, pesaje_ids=None):
+        columnas = SQL(', ').join(SQL.identifier(c) for c in COLUMNAS)
+        self.env.cr.execute(SQL(
+            "INSERT INTO %s (%s) %s",
+            SQL.identifier(self._table), columnas, self._consulta_fuente(pesaje_ids),
+        ))
+        return self.env.cr.rowcount
+
+    # ------------------------------------------------------------------
+    # Refresco
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _marcar_pendientes(self, pesaje_ids=None, condicion=None):
+        """Marca pesajes para recalcular sus filas en el próximo refresco.
+
+        pesaje_ids: ids de pesajes; condicion: SQL sobre secadora_pesaje
+        (alias p) para marcarlos por otra relación (lote, finca). Al
+        confirmar la transacción se dispara el cron de refresco.
+        """
+        if pesaje_ids is not None:
+            pesaje_ids = [pid for pid in pesaje_ids if pid]
+            if not pesaje_ids:
+                return
+            condicion = SQL("p.id = ANY(%s)", pesaje_ids)
+        self.env.cr.execute(SQL("""
+            UPDATE secadora_pesaje p SET reporte_produccion_pendiente = TRUE
+             WHERE (%s) AND p.reporte_produccion_pendiente IS NOT TRUE
+        """, condicion))
+        if not self.env.cr.rowcount:
+            return
+        self.env['secadora.pesaje'].invalidate_model(['reporte_produccion_pendiente'])
+        datos = self.env.cr.precommit.data
+        if not datos.get('secadora_calidad.produccion_lote_disparado'):
+            datos['secadora_calidad.produccion_lote_disparado'] = True
+            cron = self.env.ref(self.CRON_REFRESCO, raise_if_not_found=False)
+            if cron:
+                cron.sudo()._trigger()
+
+    @api.model
+    def _refrescar_pendientes(self):
+        """Recalcula las filas de los pesajes marcados. Devuelve cuántos."""
+        self.env.flush_all()
+        cr = self.env.cr
+        # Tomar la cola y vaciarla en la misma sentencia: si otro proceso la
+        # toca a la vez, PostgreSQL aborta uno de los dos y no se duplican
+        # filas.
+        cr.execute("""
+            UPDATE secadora_pesaje SET reporte_produccion_pendiente = NULL
+             WHERE reporte_produccion_pendiente
+         RETURNING id
         """)
+        pesaje_ids = [fila[0] for fila in cr.fetchall()]
+        if not pesaje_ids:
+            return 0
+        self.env['secadora.pesaje'].invalidate_model(['reporte_produccion_pendiente'])
+        cr.execute(SQL(
+            "DELETE FROM %s WHERE pesaje_id = ANY(%s)",
+            SQL.identifier(self._table), pesaje_ids,
+        ))
+        self._insertar(pesaje_ids)
+        self.invalidate_model()
+        return len(pesaje_ids)
+
+    @api.model
+    def _reconstruir(self):
+        """Vuelve a calcular todo el reporte. Devuelve el número de filas."""
+        self.env.flush_all()
+        cr = self.env.cr
+        cr.execute("""
+            UPDATE secadora_pesaje SET reporte_produccion_pendiente = NULL
+             WHERE reporte_produccion_pendiente
+        """)
+        self.env['secadora.pesaje'].invalidate_model(['reporte_produccion_pendiente'])
+        cr.execute(SQL("TRUNCATE %s RESTART IDENTITY", SQL.identifier(self._table)))
+        filas = self._insertar()
+        self.invalidate_model()
+        return filas
+
+    @api.model
+    def _cron_refrescar(self):
+        cantidad = self._refrescar_pendientes()
+        if cantidad:
+            _logger.info('Reporte de producción: %s pesajes recalculados', cantidad)
+
+    @api.model
+    def _cron_reconstruir(self):
+        filas = self._reconstruir()
+        _logger.info('Reporte de producción reconstruido: %s filas', filas)
+
+    @api.model
+    def action_reconstruir(self):
+        """Reconstrucción manual desde la vista del reporte."""
+        filas = self._reconstruir()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Reporte de producción',
+                'message': f'Reporte reconstruido: {filas} filas.',
+                'type': 'success',
+                'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'},
+            }
+        }
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models
+from odoo.tools import SQL
+
+
+class SecadoraVehiculo(models.Model):
+    _inherit = 'secadora.vehiculo'
+
+    def write(self, vals):
+        res = super().write(vals)
+        # placa_texto del pesaje es un related almacenado de la placa
+        if 'placa' in vals:
+            self.env['secadora.produccion.lote.report']._marcar_pendientes(
+                condicion=SQL("p.vehiculo_id = ANY(%s)", self.ids))
+        return res
@@ -11,3 +11,10 @@ class ServicioRegla(models.Model):
         default=False,
         help='Marcar si este servicio lo presta la cuadrilla y debe incluirse en las liquidaciones de cuadrilla',
     )
+
+    def _vals_linea_servicio(self, orden):
+        """Extiende para copiar es_cuadrilla de la regla a la línea generada."""
+        vals = super()._vals_linea_servicio(orden)
+        if self.es_cuadrilla:
+            vals['es_cuadrilla'] = True
+        return vals
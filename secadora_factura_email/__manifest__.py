@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'Facturas Electrónicas desde Correo',
-    'version': '18.0.1.0.0',
+    'version': '18.0.1.1.0',
     'category': 'Accounting',
     'summary': 'Procesa facturas electrónicas colombianas (UBL/DIAN) recibidas por correo',
     'description': """
@@ -15,10 +15,12 @@
         - Creación de facturas de proveedor (account.move) en borrador
         - Búsqueda/creación automática de proveedores por NIT
         - Detección de duplicados por CUFE
+        - Cola de ingesta: el correo se captura al llegar y se procesa en crons
+          paralelos, con reintentos y métricas de duración por etapa
         - Soporte para Facturas, Notas Crédito y Notas Débito
     """,
     'author': 'Secadora La Gran Colombia S.A.S',
-    'depends': ['account', 'mail'],
+    'depends': ['account', 'mail', 'secadora_trabajos'],
     'data': [
         'security/security.xml',
         'security/ir.model.access.csv',
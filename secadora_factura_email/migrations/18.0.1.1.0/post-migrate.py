@@ -0,0 +1,59 @@
+"""Pasar el XML crudo de la columna xml_content a adjuntos gzip (xml_adjunto_id).
+
+xml_content ya no está almacenado: se calcula descomprimiendo el adjunto.
+Los registros se migran por lotes y al final se elimina la columna.
+"""
+import gzip
+import logging
+
+from odoo import api, SUPERUSER_ID
+
+_logger = logging.getLogger(__name__)
+
+LOTE = 500
+
+
+def migrate(cr, version):
+    if not version:
+        return
+
+    cr.execute("""
+        SELECT EXISTS (
+            SELECT FROM information_schema.columns
+            WHERE table_name = 'secadora_factura_email' AND column_name = 'xml_content'
+        )
+    """)
+    if not cr.fetchone()[0]:
+        _logger.info("Columna xml_content no existe, nada que migrar.")
+        return
+
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    Attachment = env['ir.attachment']
+    FacturaEmail = env['secadora.factura.email']
+    total = 0
+    while True:
+        cr.execute("""
+            SELECT id, name, xml_content FROM secadora_factura_email
+            WHERE xml_content IS NOT NULL AND xml_adjunto_id IS NULL
+            ORDER BY id LIMIT %s
+        """, (LOTE,))
+        filas = cr.fetchall()
+        if not filas:
+            break
+        adjuntos = Attachment.create([{
+            'name': f'{name or "factura"}.xml.gz',
+            'raw': gzip.compress(xml.encode('utf-8')),
+            'mimetype': 'application/gzip',
+            'res_model': FacturaEmail._name,
+            'res_id': rec_id,
+        } for rec_id, name, xml in filas])
+        for (rec_id, _name, _xml), adjunto in zip(filas, adjuntos):
+            cr.execute(
+                "UPDATE secadora_factura_email SET xml_adjunto_id = %s, xml_content = NULL WHERE id = %s",
+                (adjunto.id, rec_id),
+            )
+        total += len(filas)
+        env.invalidate_all()
+
+    cr.execute("ALTER TABLE secadora_factura_email DROP COLUMN xml_content")
+    _logger.info("XML crudo: %s registros migrados a adjuntos gzip.", total)
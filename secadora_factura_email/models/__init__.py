@@ -2,3 +2,5 @@
 
 from . import factura_email
 from . import fetchmail_server
+from . import res_partner
+from . import trabajo
@@ -1,58 +1,82 @@
 # -*- coding: utf-8 -*-
 
 import base64
+import contextlib
+import gzip
 import io
 import logging
+import multiprocessing
+import os
+import time
 import zipfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
 
-from lxml import etree
+from psycopg2 import errors as pg_errors
 
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import UserError
+from odoo.osv import expression
+from odoo.service.model import PG_CONCURRENCY_EXCEPTIONS_TO_RETRY
+from odoo.tools import SQL
+from odoo.tools.safe_eval import safe_eval
 
-_logger = logging.getLogger(__name__)
-
-# Namespaces UBL 2.1 DIAN Colombia
-NS = {
-    'cbc': 'urn:oasis:names:specification:ubl:schema:xsd:CommonBasicComponents-2',
-    'cac': 'urn:oasis:names:specification:ubl:schema:xsd:CommonAggregateComponents-2',
-    'fe': 'urn:oasis:names:specification:ubl:schema:xsd:Invoice-2',
-    'cn': 'urn:oasis:names:specification:ubl:schema:xsd:CreditNote-2',
-    'dn': 'urn:oasis:names:specification:ubl:schema:xsd:DebitNote-2',
-    'ext': 'urn:oasis:names:specification:ubl:schema:xsd:CommonExtensionComponents-2',
-    'sts': 'dian:gov:co:facturaelectronica:Structures-2-1',
-    'ds': 'http://www.w3.org/2000/09/xmldsig#',
-}
+from .res_partner import normalizar_nit
+from .ubl_dian import parsear_xml_dian, parsear_xml_gz
 
-# Mapeo de namespace raíz a tipo de documento Odoo
-MOVE_TYPE_MAP = {
-    '{urn:oasis:names:specification:ubl:schema:xsd:Invoice-2}Invoice': 'in_invoice',
-    '{urn:oasis:names:specification:ubl:schema:xsd:CreditNote-2}CreditNote': 'in_refund',
-    '{urn:oasis:names:specification:ubl:schema:xsd:DebitNote-2}DebitNote': 'in_invoice',
-}
-
-# Tag de línea según tipo de documento
-LINE_TAG_MAP = {
-    '{urn:oasis:names:specification:ubl:schema:xsd:Invoice-2}Invoice': 'cac:InvoiceLine',
-    '{urn:oasis:names:specification:ubl:schema:xsd:CreditNote-2}CreditNote': 'cac:CreditNoteLine',
-    '{urn:oasis:names:specification:ubl:schema:xsd:DebitNote-2}DebitNote': 'cac:DebitNoteLine',
-}
+_logger = logging.getLogger(__name__)
 
-# Tag de cantidad según tipo
-QTY_TAG_MAP = {
-    '{urn:oasis:names:specification:ubl:schema:xsd:Invoice-2}Invoice': 'cbc:InvoicedQuantity',
-    '{urn:oasis:names:specification:ubl:schema:xsd:CreditNote-2}CreditNote': 'cbc:CreditedQuantity',
-    '{urn:oasis:names:specification:ubl:schema:xsd:DebitNote-2}DebitNote': 'cbc:DebitedQuantity',
+# Límites de tamaño por defecto. Se ajustan con los parámetros del sistema
+# secadora_factura_email.<clave>; superarlos deja el correo en error.
+LIMITES_DEFECTO = {
+    'max_adjunto_mb': 25,      # cada adjunto del correo (ZIP, XML o PDF)
+    'max_xml_mb': 10,          # XML ya descomprimido
+    'max_pdf_mb': 20,          # PDF ya descomprimido
+    'max_ratio_zip': 100,      # tamaño descomprimido / comprimido de un miembro
+    'max_miembros_zip': 20,    # archivos dentro de un ZIP
 }
+# Tamaño de bloque al copiar adjuntos por streaming
+BLOQUE_LECTURA = 64 * 1024
+MB = 1024 * 1024
+
+# Cola de ingesta: correos que toma cada corrida de un cron de ingesta
+LOTE_INGESTA = 50
+# Intentos ante errores transitorios (concurrencia) antes de dejarlo en error
+MAX_INTENTOS_INGESTA = 5
+# Espera antes del primer reintento (segundos); se duplica en cada intento
+ESPERA_REINTENTO = 60
+
+# Reproceso masivo: registros por lote (un commit por lote en segundo plano)
+LOTE_REPROCESO = 200
+# Procesos que parsean XML en paralelo en el reproceso masivo
+PROCESOS_PARSEO = 4
+# Con menos XML que esto se parsea en el mismo proceso (no vale el fork)
+MINIMO_POOL_PARSEO = 20
+# Clase de un error según el inicio de error_msg, para los resúmenes
+CLASES_ERROR = [
+    ('Error parseando XML', 'XML inválido'),
+    ('Error buscando/creando proveedor', 'Proveedor'),
+    ('Error creando factura', 'Factura'),
+    ('No se encontr', 'Sin XML o sin adjuntos'),
+]
+
+# Un CUFE solo puede estar procesado una vez (índice único parcial, ver init)
+INDICE_CUFE = 'secadora_factura_email_cufe_procesado_uniq'
 
 
 class FacturaEmail(models.Model):
     _name = 'secadora.factura.email'
     _description = 'Factura Electrónica desde Correo'
-    _inherit = ['mail.thread']
+    _inherit = ['mail.thread', 'secadora.cola.mixin']
     _order = 'fecha_recepcion desc'
     _rec_name = 'name'
 
+    # Cola de ingesta (ver secadora.cola.mixin)
+    _cola_metodo_cron = '_cron_ingerir'
+    _cola_estado_espera = 'pendiente'
+    _cola_campo_inicio = 'fecha_inicio_proceso'
+
     name = fields.Char(
         string='Referencia',
         default='Nuevo',
@@ -61,6 +85,7 @@ class FacturaEmail(models.Model):
     )
     state = fields.Selection([
         ('pendiente', 'Pendiente'),
+        ('en_proceso', 'Procesando'),
         ('procesado', 'Procesado'),
         ('error', 'Error'),
         ('duplicado', 'Duplicado'),
@@ -96,7 +121,13 @@ class FacturaEmail(models.Model):
         readonly=True,
     )
     error_msg = fields.Text(string='Mensaje de Error')
-    xml_content = fields.Text(string='XML Crudo')
+    xml_adjunto_id = fields.Many2one(
+        'ir.attachment',
+        string='XML (gzip)',
+        readonly=True,
+        copy=False,
+    )
+    xml_content = fields.Text(string='XML Crudo', compute='_compute_xml_content')
     pdf_content = fields.Binary(string='PDF Original', attachment=True)
     pdf_filename = fields.Char(string='Nombre PDF')
 
@@ -111,12 +142,77 @@ class FacturaEmail(models.Model):
         required=True,
     )
 
+    # Cola de ingesta y métricas por etapa (segundos)
+    intentos = fields.Integer(string='Intentos', readonly=True, copy=False)
+    proximo_intento = fields.Datetime(
+        string='Próximo Intento', readonly=True, copy=False, index=True,
+    )
+    fecha_inicio_proceso = fields.Datetime(string='Inicio Proceso', readonly=True, copy=False)
+    fecha_procesado = fields.Datetime(string='Fin Proceso', readonly=True, copy=False)
+    espera_cola = fields.Float(
+        string='Espera en Cola (s)', readonly=True, copy=False, aggregator='avg',
+        help='Desde la recepción del correo hasta que un cron lo tomó.',
+    )
+    duracion_extraccion = fields.Float(
+        string='Extracción (s)', readonly=True, copy=False, aggregator='avg',
+        help='Lectura de adjuntos y descompresión de ZIPs.',
+    )
+    duracion_parseo = fields.Float(
+        string='Parseo XML (s)', readonly=True, copy=False, aggregator='avg',
+    )
+    duracion_creacion = fields.Float(
+        string='Proveedor y Factura (s)', readonly=True, copy=False, aggregator='avg',
+    )
+    duracion_total = fields.Float(
+        string='Proceso Total (s)', readonly=True, copy=False, aggregator='avg',
+    )
+
+    @api.depends('xml_adjunto_id')
+    def _compute_xml_content(self):
+        for rec in self:
+            adjunto = rec.xml_adjunto_id.sudo()
+            rec.xml_content = (
+                gzip.decompress(adjunto.raw).decode('utf-8', errors='replace')
+                if adjunto.raw else False
+            )
+
+    def init(self):
+        """Índice único del CUFE entre los procesados. Los duplicados
+        (estado 'duplicado') repiten el CUFE a propósito, por eso es parcial.
+        La detección de duplicados consulta este índice en vez de recorrer
+        la tabla."""
+        super().init()
+        cr = self.env.cr
+        cr.execute("""
+            SELECT cufe FROM secadora_factura_email
+             WHERE state = 'procesado' AND cufe IS NOT NULL
+             GROUP BY cufe HAVING COUNT(*) > 1
+             LIMIT 1
+        """)
+        if cr.fetchone():
+            _logger.warning(
+                'Facturas email: hay CUFEs procesados más de una vez; no se crea '
+                'el índice único %s hasta corregirlos.', INDICE_CUFE
+            )
+            return
+        cr.execute(f"""
+            CREATE UNIQUE INDEX IF NOT EXISTS {INDICE_CUFE}
+                ON secadora_factura_email (cufe)
+             WHERE state = 'procesado' AND cufe IS NOT NULL
+        """)
+
     # -------------------------------------------------------------------------
     # mail.thread: message_new — entrada desde fetchmail
     # -------------------------------------------------------------------------
     @api.model
     def message_new(self, msg_dict, custom_values=None):
-        """Llamado por fetchmail cuando llega un correo nuevo."""
+        """Llamado por fetchmail cuando llega un correo nuevo.
+
+        Solo captura el correo y lo deja en la cola de ingesta: los adjuntos
+        los agrega el gateway de correo después de message_new, y el parseo
+        y la creación de la factura corren en los crons de ingesta, fuera de
+        la transacción del fetchmail.
+        """
         defaults = {
             'fecha_recepcion': fields.Datetime.now(),
             'state': 'pendiente',
@@ -125,15 +221,140 @@ class FacturaEmail(models.Model):
         if custom_values:
             defaults.update(custom_values)
         record = super().message_new(msg_dict, custom_values=defaults)
+        self._disparar_cola()
+        return record
+
+    # -------------------------------------------------------------------------
+    # Cola de ingesta
+    # -------------------------------------------------------------------------
+    @api.model
+    def _cron_ingerir(self, limite=LOTE_INGESTA):
+        """Procesa correos de la cola de ingesta, uno por uno.
+
+        Cada cron que llama a este método es un espacio de ingesta (ver
+        data/cron_data.xml y secadora.cola.mixin): varios espacios trabajan
+        en paralelo sin tomar el mismo correo. Cada correo se confirma por
+        separado; uno que falle no frena ni deshace a los demás.
+        """
+        t0 = time.perf_counter()
+        hechos = self._con_impuestos_del_lote()._procesar_cola(
+            '_ingerir', limite=limite,
+            condicion=SQL(
+                "(proximo_intento IS NULL OR proximo_intento <= (now() AT TIME ZONE 'UTC'))"
+                " AND COALESCE(intentos, 0) < %s", MAX_INTENTOS_INGESTA,
+            ),
+            orden=SQL('proximo_intento NULLS FIRST, id'),
+            asignar=SQL('intentos = COALESCE(intentos, 0) + 1'),
+        )
+        if hechos:
+            segundos = time.perf_counter() - t0
+            _logger.info(
+                'Ingesta facturas email: %s correos en %.1f s (%.1f por minuto)',
+                hechos, segundos, 60.0 * hechos / segundos if segundos else 0.0,
+            )
+        pendientes = self.search_count(self._domain_cola())
+        self.env['ir.cron']._notify_progress(done=hechos, remaining=pendientes)
+
+    @api.model
+    def _domain_cola(self):
+        return [
+            ('state', '=', 'pendiente'),
+            '|', ('proximo_intento', '=', False),
+                 ('proximo_intento', '<=', fields.Datetime.now()),
+            '|', ('intentos', '=', False),
+                 ('intentos', '<', MAX_INTENTOS_INGESTA),
+        ]
+
+    def _ingerir(self):
+        """Procesa un correo tomado de la cola y confirma el resultado.
+
+        Los errores de datos (XML inválido, proveedor, factura) los registra
+        _procesar_xml en el propio correo. Los errores de concurrencia
+        (bloqueos, serialización) deshacen todo y reprograman el correo con
+        espera exponencial, hasta MAX_INTENTOS_INGESTA intentos.
+        """
+        self.ensure_one()
+        self = self.with_company(self.company_id)
+        cr = self.env.cr
+        t0 = time.perf_counter()
         try:
-            record._procesar_adjuntos()
+            with cr.savepoint():
+                self._procesar_adjuntos()
+                self.write({
+                    'fecha_procesado': fields.Datetime.now(),
+                    'espera_cola': (self.fecha_inicio_proceso - self.fecha_recepcion).total_seconds()
+                    if self.fecha_inicio_proceso and self.fecha_recepcion else 0.0,
+                    'duracion_total': time.perf_counter() - t0,
+                    'proximo_intento': False,
+                })
+            cr.commit()
         except Exception as e:
-            _logger.exception("Error procesando adjuntos del correo %s", record.id)
-            record.write({
+            cr.rollback()
+            self.invalidate_recordset()
+            self._reprogramar(e)
+            cr.commit()
+
+    def _reprogramar(self, error):
+        """Devuelve el correo a la cola con espera exponencial, o lo deja en
+        error si el fallo no es transitorio o se agotaron los intentos."""
+        self.ensure_one()
+        # Dos espacios con el mismo CUFE: el segundo choca con el índice
+        # único y al reintentar queda como duplicado.
+        transitorio = isinstance(error, PG_CONCURRENCY_EXCEPTIONS_TO_RETRY) or (
+            isinstance(error, pg_errors.UniqueViolation)
+            and error.diag.constraint_name == INDICE_CUFE
+        )
+        if transitorio and self.intentos < MAX_INTENTOS_INGESTA:
+            espera = ESPERA_REINTENTO * 2 ** (self.intentos - 1)
+            proximo = fields.Datetime.now() + timedelta(seconds=espera)
+            _logger.info(
+                'Ingesta factura email %s: error transitorio (%s), reintento %s en %s s',
+                self.id, error, self.intentos + 1, espera,
+            )
+            self.write({'state': 'pendiente', 'proximo_intento': proximo})
+            self._disparar_cola(at=proximo)
+            return
+        _logger.warning('Ingesta factura email %s falló: %s', self.id, error)
+        self.write({
+            'state': 'error',
+            'error_msg': str(error),
+            'proximo_intento': False,
+            'fecha_procesado': fields.Datetime.now(),
+        })
+
+    @api.model
+    def _liberar_atascados(self):
+        """Devuelve a la cola los correos que quedaron en proceso porque el
+        espacio que los tomó murió (ningún proceso tiene su lock).
+
+        Un correo que tumba al worker (límite de tiempo o memoria) lo
+        tumbaría en cada reintento: tras MAX_INTENTOS_INGESTA tomas queda en
+        error en vez de volver a la cola.
+        """
+        atascados = self._huerfanos()
+        # También los que quedaron pendientes con los intentos agotados: la
+        # toma ya no los considera.
+        agotados = atascados.filtered(lambda r: r.intentos >= MAX_INTENTOS_INGESTA) | self.search([
+            ('state', '=', 'pendiente'),
+            ('intentos', '>=', MAX_INTENTOS_INGESTA),
+        ])
+        if agotados:
+            _logger.warning(
+                'Ingesta facturas email: %s correos atascados agotaron los intentos: %s',
+                len(agotados), agotados.ids,
+            )
+            agotados.write({
                 'state': 'error',
-                'error_msg': str(e),
+                'error_msg': f'El proceso se interrumpió en {MAX_INTENTOS_INGESTA} intentos '
+                             '(límite de tiempo o memoria del servidor).',
+                'proximo_intento': False,
+                'fecha_procesado': fields.Datetime.now(),
             })
-        return record
+        devueltos = atascados - agotados
+        if devueltos:
+            _logger.warning('Ingesta facturas email: %s correos atascados vuelven a la cola', len(devueltos))
+            devueltos.write({'state': 'pendiente', 'proximo_intento': False})
+        return atascados
 
     # -------------------------------------------------------------------------
     # Procesamiento de adjuntos
@@ -141,6 +362,7 @@ class FacturaEmail(models.Model):
     def _procesar_adjuntos(self):
         """Extrae adjuntos del mensaje, descomprime ZIPs, busca XML y PDF."""
         self.ensure_one()
+        t0 = time.perf_counter()
         attachments = self.env['ir.attachment'].search([
             ('res_model', '=', self._name),
             ('res_id', '=', self.id),
@@ -149,61 +371,209 @@ class FacturaEmail(models.Model):
             self.write({'state': 'error', 'error_msg': 'No se encontraron adjuntos en el correo.'})
             return
 
-        xml_content = None
-        pdf_data = None
-        pdf_name = None
-
-        for attach in attachments:
-            fname = (attach.name or '').lower()
-            raw_data = base64.b64decode(attach.datas) if attach.datas else b''
-
-            if fname.endswith('.zip'):
-                xml_content, pdf_data, pdf_name = self._extraer_zip(raw_data, xml_content, pdf_data, pdf_name)
-            elif fname.endswith('.xml'):
-                xml_content = raw_data.decode('utf-8', errors='replace')
-            elif fname.endswith('.pdf'):
-                pdf_data = raw_data
-                pdf_name = attach.name
+        try:
+            xml_gz, pdf_data, pdf_name = self._extraer_de_adjuntos(attachments)
+        except UserError as e:
+            self.write({'state': 'error', 'error_msg': str(e)})
+            return
 
-        if not xml_content:
+        if not xml_gz:
             self.write({'state': 'error', 'error_msg': 'No se encontró archivo XML en los adjuntos.'})
             return
 
-        self.xml_content = xml_content
+        self._guardar_xml(xml_gz)
         if pdf_data:
             self.pdf_content = base64.b64encode(pdf_data)
             self.pdf_filename = pdf_name
+        self.duracion_extraccion = time.perf_counter() - t0
 
         # Parsear y crear factura
-        self._procesar_xml(xml_content, pdf_data, pdf_name)
-
-    def _extraer_zip(self, zip_bytes, xml_content, pdf_data, pdf_name):
-        """Extrae XML y PDF de un archivo ZIP."""
+        with gzip.GzipFile(fileobj=io.BytesIO(xml_gz)) as xml:
+            self._procesar_xml(xml, pdf_data, pdf_name)
+
+    def _extraer_de_adjuntos(self, adjuntos, nombre=None):
+        """Busca el XML y el PDF en los adjuntos (sueltos o dentro de ZIPs).
+
+        Los adjuntos se leen como streams desde el filestore, sin pasar por
+        base64. El XML se comprime con gzip a medida que se lee: nunca está
+        entero en memoria sin comprimir. Devuelve (xml_gz, pdf_data,
+        pdf_name); lanza UserError si algo supera los límites de tamaño.
+        """
+        limites = self._limites()
+        xml_gz = pdf_data = pdf_name = None
+        for attach in adjuntos:
+            fname = (nombre or attach.name or '').lower()
+            if not fname.endswith(('.zip', '.xml', '.pdf')):
+                continue
+            self._validar_tamano(attach.file_size, limites, 'max_adjunto_mb', attach.name)
+            with self._abrir_adjunto(attach) as fh:
+                if fname.endswith('.zip'):
+                    xml_gz, pdf_data, pdf_name = self._extraer_zip(fh, xml_gz, pdf_data, pdf_name, limites)
+                elif fname.endswith('.xml'):
+                    xml_gz = self._comprimir_limitado(fh, limites, 'max_xml_mb', attach.name)
+                else:
+                    pdf_data = self._leer_limitado(fh, limites, 'max_pdf_mb', attach.name)
+                    pdf_name = attach.name
+        return xml_gz, pdf_data, pdf_name
+
+    def _extraer_zip(self, fh, xml_gz, pdf_data, pdf_name, limites):
+        """Extrae XML y PDF de un archivo ZIP abierto en `fh`.
+
+        Antes de descomprimir se validan la cantidad de miembros, el tamaño
+        declarado y la tasa de compresión de cada uno (bombas ZIP); al
+        descomprimir se cuenta lo realmente leído, por si la cabecera miente.
+        """
         try:
-            with zipfile.ZipFile(io.BytesIO(zip_bytes), 'r') as zf:
-                for zinfo in zf.infolist():
+            with zipfile.ZipFile(fh, 'r') as zf:
+                miembros = zf.infolist()
+                if len(miembros) > limites['max_miembros_zip']:
+                    raise UserError(
+                        f'El ZIP tiene {len(miembros)} archivos; el máximo es '
+                        f"{limites['max_miembros_zip']:g} (parámetro "
+                        'secadora_factura_email.max_miembros_zip).'
+                    )
+                for zinfo in miembros:
                     fname_lower = zinfo.filename.lower()
-                    if fname_lower.endswith('.xml') and not xml_content:
-                        xml_content = zf.read(zinfo.filename).decode('utf-8', errors='replace')
-                    elif fname_lower.endswith('.pdf') and not pdf_data:
-                        pdf_data = zf.read(zinfo.filename)
-                        pdf_name = zinfo.filename
+                    es_xml = fname_lower.endswith('.xml') and not xml_gz
+                    es_pdf = fname_lower.endswith('.pdf') and not pdf_data
+                    if not (es_xml or es_pdf):
+                        continue
+                    clave = 'max_xml_mb' if es_xml else 'max_pdf_mb'
+                    self._validar_tamano(zinfo.file_size, limites, clave, zinfo.filename)
+                    if zinfo.compress_size and zinfo.file_size / zinfo.compress_size > limites['max_ratio_zip']:
+                        raise UserError(
+                            f'{zinfo.filename}: tasa de compresión sospechosa '
+                            f'({zinfo.file_size / zinfo.compress_size:.0f}:1, máximo '
+                            f"{limites['max_ratio_zip']:g}:1, parámetro "
+                            'secadora_factura_email.max_ratio_zip).'
+                        )
+                    with zf.open(zinfo) as miembro:
+                        if es_xml:
+                            xml_gz = self._comprimir_limitado(miembro, limites, clave, zinfo.filename)
+                        else:
+                            pdf_data = self._leer_limitado(miembro, limites, clave, zinfo.filename)
+                            pdf_name = zinfo.filename
         except zipfile.BadZipFile:
             _logger.warning("Adjunto ZIP inválido, se ignora.")
-        return xml_content, pdf_data, pdf_name
+        return xml_gz, pdf_data, pdf_name
+
+    # -------------------------------------------------------------------------
+    # Lectura por streaming y límites de tamaño
+    # -------------------------------------------------------------------------
+    @api.model
+    def _limites(self):
+        """Límites de tamaño vigentes (ver LIMITES_DEFECTO)."""
+        ICP = self.env['ir.config_parameter'].sudo()
+        return {
+            clave: float(ICP.get_param(f'secadora_factura_email.{clave}', defecto))
+            for clave, defecto in LIMITES_DEFECTO.items()
+        }
+
+    @api.model
+    def _validar_tamano(self, tamano, limites, clave, nombre):
+        if tamano and tamano > limites[clave] * MB:
+            raise UserError(
+                f'{nombre}: {tamano / MB:.1f} MB supera el límite de '
+                f'{limites[clave]:g} MB (parámetro secadora_factura_email.{clave}).'
+            )
+
+    @api.model
+    def _leer_limitado(self, fh, limites, clave, nombre):
+        """Lee `fh` completo, sin pasar del límite de la clave."""
+        maximo = int(limites[clave] * MB)
+        data = fh.read(maximo + 1)
+        self._validar_tamano(len(data), limites, clave, nombre)
+        return data
+
+    @api.model
+    def _comprimir_limitado(self, fh, limites, clave, nombre):
+        """Copia `fh` a un buffer gzip por bloques, sin pasar del límite de
+        la clave (contado sin comprimir). Devuelve los bytes gzip."""
+        maximo = int(limites[clave] * MB)
+        leidos = 0
+        buf = io.BytesIO()
+        with gzip.GzipFile(fileobj=buf, mode='wb') as gz:
+            while True:
+                bloque = fh.read(BLOQUE_LECTURA)
+                if not bloque:
+                    break
+                leidos += len(bloque)
+                if leidos > maximo:
+                    self._validar_tamano(leidos, limites, clave, nombre)
+                gz.write(bloque)
+        return buf.getvalue()
+
+    @api.model
+    def _abrir_adjunto(self, attach):
+        """Archivo abierto con el contenido del adjunto: el del filestore si
+        lo tiene, o un buffer con el contenido guardado en la base."""
+        attach = attach.sudo()
+        if attach.store_fname:
+            return open(attach._full_path(attach.store_fname), 'rb')
+        return io.BytesIO(attach.raw or b'')
+
+    def _guardar_xml(self, xml_gz):
+        """Guarda el XML (ya comprimido) como adjunto del registro."""
+        self.ensure_one()
+        anterior = self.xml_adjunto_id
+        self.xml_adjunto_id = self.env['ir.attachment'].sudo().create({
+            'name': f'{self.name or "factura"}.xml.gz',
+            'raw': xml_gz,
+            'mimetype': 'application/gzip',
+            'res_model': self._name,
+            'res_id': self.id,
+        })
+        anterior.sudo().unlink()
+
+    @contextlib.contextmanager
+    def _abrir_xml(self):
+        """Stream del XML guardado, ya descomprimido."""
+        self.ensure_one()
+        with self._abrir_adjunto(self.xml_adjunto_id) as fh, gzip.GzipFile(fileobj=fh) as xml:
+            yield xml
 
     # -------------------------------------------------------------------------
     # Parseo XML UBL/DIAN
     # -------------------------------------------------------------------------
-    def _procesar_xml(self, xml_string, pdf_data, pdf_name):
-        """Parsea el XML y crea la factura de proveedor."""
+    def _procesar_xml(self, xml, pdf_data, pdf_name):
+        """Parsea el XML (texto, bytes o stream) y crea la factura de
+        proveedor.
+
+        Los errores de datos quedan en el registro (estado error). Los de
+        concurrencia se propagan para que la cola de ingesta reintente.
+        Proveedor y factura se crean en un savepoint: si algo falla no
+        quedan a medias.
+        """
         self.ensure_one()
+        t0 = time.perf_counter()
         try:
-            datos = self._parsear_xml_dian(xml_string)
+            datos = self._parsear_xml_dian(xml)
         except Exception as e:
-            self.write({'state': 'error', 'error_msg': f'Error parseando XML: {e}'})
+            self.write({
+                'state': 'error',
+                'error_msg': f'Error parseando XML: {e}',
+                'duracion_parseo': time.perf_counter() - t0,
+            })
             return
-
+        t1 = time.perf_counter()
+        partner = self._preparar_factura(datos, duracion_parseo=t1 - t0)
+        if partner:
+            try:
+                with self.env.cr.savepoint():
+                    factura = self._crear_factura_proveedor(datos, partner, pdf_data, pdf_name)
+            except PG_CONCURRENCY_EXCEPTIONS_TO_RETRY:
+                raise
+            except Exception as e:
+                self.write({'state': 'error', 'error_msg': f'Error creando factura: {e}'})
+            else:
+                self._marcar_procesado(factura)
+        self.duracion_creacion = time.perf_counter() - t1
+
+    def _preparar_factura(self, datos, duracion_parseo=0.0):
+        """Guarda los datos parseados, descarta duplicados por CUFE y busca
+        o crea el proveedor. Devuelve el proveedor, o None si el registro ya
+        quedó como duplicado o en error."""
+        self.ensure_one()
         # Guardar datos extraídos en el registro
         self.write({
             'numero_factura': datos.get('numero_factura'),
@@ -215,6 +585,7 @@ class FacturaEmail(models.Model):
             'total_factura': datos.get('total'),
             'tipo_documento': datos.get('tipo_documento'),
             'name': datos.get('numero_factura') or self.name,
+            'duracion_parseo': duracion_parseo,
         })
 
         # Detectar duplicados por CUFE
@@ -229,159 +600,31 @@ class FacturaEmail(models.Model):
                     'state': 'duplicado',
                     'error_msg': f"CUFE ya procesado en registro #{existente.id} ({existente.name})",
                 })
-                return
+                return None
 
         # Buscar o crear proveedor
         try:
-            partner = self._buscar_o_crear_partner(datos)
-            self.partner_id = partner
+            with self.env.cr.savepoint():
+                partner = self._buscar_o_crear_partner(datos)
+        except PG_CONCURRENCY_EXCEPTIONS_TO_RETRY:
+            raise
         except Exception as e:
             self.write({'state': 'error', 'error_msg': f'Error buscando/creando proveedor: {e}'})
-            return
-
-        # Crear factura
-        try:
-            factura = self._crear_factura_proveedor(datos, partner, pdf_data, pdf_name)
-            self.write({
-                'factura_id': factura.id,
-                'state': 'procesado',
-                'error_msg': False,
-            })
-        except Exception as e:
-            self.write({'state': 'error', 'error_msg': f'Error creando factura: {e}'})
-
-    def _extraer_documento_interno(self, root):
-        """Si el XML es un AttachedDocument DIAN, extrae el Invoice/CreditNote/DebitNote del CDATA."""
-        NS_AD = {'ad': 'urn:oasis:names:specification:ubl:schema:xsd:AttachedDocument-2'}
-        NS_AD.update(NS)
-
-        if 'AttachedDocument' not in root.tag:
-            return root
-
-        # El documento real está en cac:Attachment/cac:ExternalReference/cbc:Description (CDATA)
-        description = root.find('.//cac:Attachment//cac:ExternalReference//cbc:Description', NS_AD)
-        if description is not None and description.text:
-            inner_xml = description.text.strip()
-            try:
-                return etree.fromstring(inner_xml.encode('utf-8'))
-            except etree.XMLSyntaxError:
-                _logger.warning("No se pudo parsear el XML interno del AttachedDocument")
-
-        raise UserError(
-            'El XML es un AttachedDocument pero no se encontró la factura embebida dentro del CDATA.'
-        )
-
-    def _parsear_xml_dian(self, xml_string):
-        """Parsea un XML de factura electrónica colombiana UBL 2.1."""
-        root = etree.fromstring(xml_string.encode('utf-8'))
-
-        # Si es AttachedDocument, extraer el Invoice/CreditNote/DebitNote del CDATA
-        root = self._extraer_documento_interno(root)
-
-        # Determinar tipo de documento
-        root_tag = root.tag
-        move_type = MOVE_TYPE_MAP.get(root_tag)
-        if not move_type:
-            raise UserError(f'Tipo de documento XML no reconocido: {root_tag}')
-
-        tipo_doc_map = {
-            'in_invoice': 'invoice',
-            'in_refund': 'credit_note',
-        }
-        # Nota débito es in_invoice pero tipo_documento distinto
-        if 'DebitNote' in root_tag:
-            tipo_doc = 'debit_note'
-        else:
-            tipo_doc = tipo_doc_map.get(move_type, 'invoice')
-
-        datos = {
-            'move_type': move_type,
-            'tipo_documento': tipo_doc,
-            'numero_factura': self._xml_text(root, './/cbc:ID'),
-            'cufe': self._xml_text(root, './/cbc:UUID'),
-            'fecha_emision': self._xml_text(root, './/cbc:IssueDate'),
-            'fecha_vencimiento': self._xml_text(root, './/cbc:DueDate') or self._xml_text(root, './/cac:PaymentMeans/cbc:PaymentDueDate'),
-            'moneda': self._xml_text(root, './/cbc:DocumentCurrencyCode'),
-            'notas': self._xml_text(root, './/cbc:Note'),
-        }
-
-        # Emisor (Proveedor)
-        supplier = root.find('.//cac:AccountingSupplierParty', NS)
-        if supplier is not None:
-            party = supplier.find('.//cac:Party', NS)
-            datos['emisor_nit'] = self._xml_text(supplier, './/cbc:CompanyID')
-            datos['emisor_razon_social'] = self._xml_text(
-                supplier, './/cbc:RegistrationName'
-            )
-            if party is not None:
-                datos['emisor_telefono'] = self._xml_text(party, './/cbc:Telephone')
-                datos['emisor_email'] = self._xml_text(party, './/cbc:ElectronicMail')
-                # Dirección
-                address = party.find('.//cac:PhysicalLocation//cac:Address', NS)
-                if address is None:
-                    address = party.find('.//cac:PostalAddress', NS)
-                if address is not None:
-                    datos['emisor_direccion'] = self._xml_text(address, 'cbc:AddressLine/cbc:Line')
-                    datos['emisor_ciudad'] = self._xml_text(address, 'cbc:CityName')
-                    datos['emisor_departamento'] = self._xml_text(address, 'cbc:CountrySubentity')
-
-        # Receptor (nosotros — para validación)
-        receptor = root.find('.//cac:AccountingCustomerParty', NS)
-        if receptor is not None:
-            datos['receptor_nit'] = self._xml_text(receptor, './/cbc:CompanyID')
-
-        # Total
-        monetary = root.find('.//cac:LegalMonetaryTotal', NS)
-        if monetary is not None:
-            payable = self._xml_text(monetary, 'cbc:PayableAmount')
-            datos['total'] = float(payable) if payable else 0.0
-        else:
-            datos['total'] = 0.0
-
-        # Líneas de factura
-        line_tag = LINE_TAG_MAP.get(root_tag, 'cac:InvoiceLine')
-        qty_tag = QTY_TAG_MAP.get(root_tag, 'cbc:InvoicedQuantity')
-        datos['items'] = []
-        for line in root.findall(f'.//{line_tag}', NS):
-            item = self._parsear_linea(line, qty_tag)
-            if item:
-                datos['items'].append(item)
-
-        return datos
-
-    def _parsear_linea(self, line_node, qty_tag):
-        """Parsea una línea de factura UBL."""
-        descripcion = self._xml_text(line_node, './/cac:Item//cbc:Description')
-        if not descripcion:
-            descripcion = self._xml_text(line_node, './/cac:Item//cbc:Name')
-        if not descripcion:
-            descripcion = 'Producto/Servicio'
-
-        cantidad_str = self._xml_text(line_node, f'.//{qty_tag}')
-        cantidad = float(cantidad_str) if cantidad_str else 1.0
-
-        precio_str = self._xml_text(line_node, './/cac:Price//cbc:PriceAmount')
-        precio_unitario = float(precio_str) if precio_str else 0.0
-
-        # Impuestos de la línea
-        porcentaje_iva = 0.0
-        tax_subtotal = line_node.find('.//cac:TaxTotal//cac:TaxSubtotal', NS)
-        if tax_subtotal is not None:
-            pct = self._xml_text(tax_subtotal, './/cac:TaxCategory//cbc:Percent')
-            if pct:
-                porcentaje_iva = float(pct)
+            return None
+        self.partner_id = partner
+        return partner
 
-        return {
-            'descripcion': descripcion,
-            'cantidad': cantidad,
-            'precio_unitario': precio_unitario,
-            'porcentaje_iva': porcentaje_iva,
-        }
+    def _marcar_procesado(self, factura):
+        self.write({
+            'factura_id': factura.id,
+            'state': 'procesado',
+            'error_msg': False,
+        })
 
-    def _xml_text(self, node, xpath):
-        """Extrae texto de un nodo XML de forma segura."""
-        el = node.find(xpath, NS)
-        return el.text.strip() if el is not None and el.text else None
+    def _parsear_xml_dian(self, fuente):
+        """Parsea un XML de factura electrónica colombiana UBL 2.1 (ver
+        ubl_dian.parsear_xml_dian)."""
+        return parsear_xml_dian(fuente)
 
     # -------------------------------------------------------------------------
     # Proveedor
@@ -392,22 +635,19 @@ class FacturaEmail(models.Model):
         if not nit:
             raise UserError('El XML no contiene NIT del emisor.')
 
-        # Limpiar NIT (quitar DV, guiones, puntos)
+        # Limpiar NIT (quitar guiones, puntos)
         nit_limpio = nit.replace('-', '').replace('.', '').strip()
-        # Si tiene dígito de verificación (últimos dígitos después de guión), separar
-        # El NIT en Colombia puede venir como 900123456-1
-        nit_buscar = nit_limpio.split('-')[0] if '-' in nit else nit_limpio
 
+        # Búsqueda por el NIT normalizado (columna indexada): el NIT sin DV,
+        # o tal cual si el DV viene pegado (900123456-1 -> 9001234561).
         partner = self.env['res.partner'].search([
-            '|',
-            ('vat', '=', nit_buscar),
-            ('vat', '=', nit),
+            ('nit_normalizado', 'in', list({normalizar_nit(nit), nit_limpio})),
         ], limit=1)
 
         if not partner:
             vals = {
                 'name': datos.get('emisor_razon_social') or nit,
-                'vat': nit_buscar,
+                'vat': nit_limpio,
                 'supplier_rank': 1,
                 'company_type': 'company',
             }
@@ -421,18 +661,63 @@ class FacturaEmail(models.Model):
                 vals['city'] = datos['emisor_ciudad']
 
             partner = self.env['res.partner'].create(vals)
-            _logger.info("Proveedor creado: %s (NIT: %s)", partner.name, nit_buscar)
+            _logger.info("Proveedor creado: %s (NIT: %s)", partner.name, nit_limpio)
 
         return partner
 
     # -------------------------------------------------------------------------
     # Creación de factura
     # -------------------------------------------------------------------------
+    @api.model
+    def _impuestos_compra_por_tasa(self, company_id):
+        """{porcentaje: id del impuesto de compra} de la compañía; ante
+        varios con la misma tasa, el primero en el orden de account.tax.
+
+        Los lotes (cola de ingesta, reproceso masivo) los resuelven una vez
+        por compañía: ver _con_impuestos_del_lote. Fuera de un lote se
+        buscan una vez por factura.
+        """
+        del_lote = self.env.context.get('impuestos_compra_por_tasa')
+        if del_lote is not None and company_id in del_lote:
+            return del_lote[company_id]
+        impuestos = self.env['account.tax'].sudo().search([
+            ('type_tax_use', '=', 'purchase'),
+            ('company_id', '=', company_id),
+        ])
+        por_tasa = {}
+        for tax in impuestos:
+            por_tasa.setdefault(tax.amount, tax.id)
+        if del_lote is not None:
+            del_lote[company_id] = por_tasa
+        return por_tasa
+
+    def _con_impuestos_del_lote(self):
+        """Los registros con un diccionario en el contexto donde
+        _impuestos_compra_por_tasa guarda lo que busca: dentro del lote,
+        una búsqueda por compañía. Un impuesto creado o modificado durante
+        el lote se ve desde el siguiente."""
+        return self.with_context(impuestos_compra_por_tasa={})
+
     def _crear_factura_proveedor(self, datos, partner, pdf_data, pdf_name):
         """Crea account.move (in_invoice o in_refund) con las líneas parseadas."""
         self.ensure_one()
+        factura = self.env['account.move'].create(self._vals_factura_proveedor(datos, partner))
 
+        # Adjuntar PDF a la factura
+        if pdf_data:
+            self.env['ir.attachment'].create(self._vals_pdf_factura(factura, datos, pdf_data, pdf_name))
+
+        _logger.info(
+            "Factura %s creada desde correo: %s (proveedor: %s)",
+            factura.name, datos.get('numero_factura'), partner.name
+        )
+        return factura
+
+    def _vals_factura_proveedor(self, datos, partner):
+        """Valores del account.move para los datos parseados."""
+        self.ensure_one()
         move_type = datos.get('move_type', 'in_invoice')
+        impuestos = self._impuestos_compra_por_tasa(self.company_id.id)
 
         invoice_lines = []
         for item in datos.get('items', []):
@@ -441,15 +726,11 @@ class FacturaEmail(models.Model):
                 'quantity': item['cantidad'],
                 'price_unit': item['precio_unitario'],
             }
-            # Buscar impuesto por porcentaje
+            # Impuesto por porcentaje
             if item.get('porcentaje_iva') and item['porcentaje_iva'] > 0:
-                tax = self.env['account.tax'].search([
-                    ('type_tax_use', '=', 'purchase'),
-                    ('amount', '=', item['porcentaje_iva']),
-                    ('company_id', '=', self.company_id.id),
-                ], limit=1)
-                if tax:
-                    line_vals['tax_ids'] = [(6, 0, [tax.id])]
+                tax_id = impuestos.get(item['porcentaje_iva'])
+                if tax_id:
+                    line_vals['tax_ids'] = [(6, 0, [tax_id])]
 
             invoice_lines.append((0, 0, line_vals))
 
@@ -464,38 +745,229 @@ class FacturaEmail(models.Model):
             'invoice_line_ids': invoice_lines,
         }
 
-        factura = self.env['account.move'].create(factura_vals)
-
-        # Adjuntar PDF a la factura
-        if pdf_data:
-            self.env['ir.attachment'].create({
-                'name': pdf_name or f"{datos.get('numero_factura', 'factura')}.pdf",
-                'type': 'binary',
-                'datas': base64.b64encode(pdf_data),
-                'res_model': 'account.move',
-                'res_id': factura.id,
-            })
+        return factura_vals
 
-        _logger.info(
-            "Factura %s creada desde correo: %s (proveedor: %s)",
-            factura.name, datos.get('numero_factura'), partner.name
-        )
-        return factura
+    def _vals_pdf_factura(self, factura, datos, pdf_data, pdf_name):
+        return {
+            'name': pdf_name or f"{datos.get('numero_factura', 'factura')}.pdf",
+            'type': 'binary',
+            'raw': pdf_data,
+            'res_model': 'account.move',
+            'res_id': factura.id,
+        }
 
     # -------------------------------------------------------------------------
     # Reprocesar
     # -------------------------------------------------------------------------
     def action_reprocesar(self):
-        """Reprocesa un registro en error usando el XML guardado."""
+        """Reprocesa un registro en error usando el XML guardado. Si aún
+        no tiene XML (correo que no llegó a procesarse), lee los adjuntos."""
         self.ensure_one()
-        if not self.xml_content:
-            raise UserError('No hay contenido XML guardado para reprocesar.')
+        if not self.xml_adjunto_id:
+            if not self.message_attachment_count:
+                raise UserError('No hay contenido XML guardado para reprocesar.')
+            self.write({'state': 'pendiente', 'error_msg': False, 'factura_id': False})
+            self._procesar_adjuntos()
+            return
 
         pdf_data = base64.b64decode(self.pdf_content) if self.pdf_content else None
         pdf_name = self.pdf_filename
 
         self.write({'state': 'pendiente', 'error_msg': False, 'factura_id': False})
-        self._procesar_xml(self.xml_content, pdf_data, pdf_name)
+        with self._abrir_xml() as xml:
+            self._procesar_xml(xml, pdf_data, pdf_name)
+
+    def _reprocesar_en_lote(self):
+        """Reprocesa los registros como trabajo en segundo plano (ver
+        _reprocesar_masivo). Devuelve el resumen del lote."""
+        return self._reprocesar_masivo([('id', 'in', self.ids)])
+
+    @api.model
+    def _reprocesar_masivo(self, dominio):
+        """Reprocesa los registros en error o pendientes del dominio.
+
+        Pensado para repetir miles de registros tras corregir el parser:
+        - los XML guardados se parsean en un pool de procesos (el parseo con
+          lxml es CPU y cada documento es independiente), solo si el
+          servidor corre en modo prefork (ver _procesos_parseo);
+        - proveedores y duplicados se resuelven registro por registro, cada
+          uno en su savepoint;
+        - las facturas de cada lote se crean con un solo create.
+        En segundo plano se confirma cada lote. Devuelve un resumen por
+        resultado y clase de error.
+        """
+        if isinstance(dominio, str):
+            dominio = safe_eval(dominio)
+        registros = self.search(expression.AND([
+            dominio, [('state', 'in', ('error', 'pendiente'))],
+        ]), order='id')._con_impuestos_del_lote()
+        Trabajo = self.env['secadora.trabajo']
+        t0 = time.perf_counter()
+        resumen = Counter()
+        with self._pool_parseo(len(registros)) as pool:
+            for i in range(0, len(registros), LOTE_REPROCESO):
+                lote = registros[i:i + LOTE_REPROCESO]
+                resumen.update(lote._reprocesar_lote(pool))
+                if Trabajo._trabajo_actual():
+                    self.env.cr.commit()
+                Trabajo._reportar_avance(i + len(lote), len(registros))
+        return self._texto_resumen(
+            resumen, len(registros), time.perf_counter() - t0, self._procesos_parseo(len(registros)),
+        )
+
+    @api.model
+    def _procesos_parseo(self, cantidad):
+        """Procesos con que se parsean `cantidad` XML (1: en este proceso).
+
+        El pool solo se usa con el servidor en modo prefork (workers > 0):
+        ahí el cron corre en un worker de un solo hilo. En modo con hilos,
+        al hacer fork otro hilo puede tener tomado el lock del logging o del
+        pool de conexiones y el hijo se bloquearía para siempre.
+        """
+        procesos = min(PROCESOS_PARSEO, os.cpu_count() or 1)
+        if cantidad < MINIMO_POOL_PARSEO or procesos < 2 or not tools.config['workers']:
+            return 1
+        return procesos
+
+    @contextlib.contextmanager
+    def _pool_parseo(self, cantidad):
+        """Pool de procesos para parsear XML, o None si se parsea aquí.
+
+        Los procesos se crean con fork: heredan el código ya cargado y no
+        tocan la base de datos (parsear_xml_gz no usa el entorno)."""
+        procesos = self._procesos_parseo(cantidad)
+        if procesos < 2:
+            yield None
+            return
+        with ProcessPoolExecutor(
+            max_workers=procesos, mp_context=multiprocessing.get_context('fork'),
+        ) as pool:
+            yield pool
+
+    def _reprocesar_lote(self, pool):
+        """Reprocesa un lote. Devuelve un Counter de clases de resultado."""
+        con_xml = self.filtered('xml_adjunto_id')
+        # Sin XML guardado: extracción completa desde los adjuntos del correo
+        for rec in self - con_xml:
+            try:
+                with self.env.cr.savepoint():
+                    rec.action_reprocesar()
+            except Exception as e:
+                rec.write({'state': 'error', 'error_msg': str(e)})
+
+        xmls = [rec.xml_adjunto_id.sudo().raw for rec in con_xml]
+        resultados = pool.map(parsear_xml_gz, xmls, chunksize=8) if pool else map(parsear_xml_gz, xmls)
+        pendientes = []
+        # Primer registro del lote con cada CUFE. _preparar_factura solo ve
+        # los CUFE ya procesados, y los del lote quedan procesados al final
+        # (_crear_facturas_en_lote): los repetidos se descartan aquí.
+        cufes_lote = {}
+        repetidos = []
+        for rec, (datos, error) in zip(con_xml, resultados):
+            rec.write({'state': 'pendiente', 'error_msg': False, 'factura_id': False})
+            if error:
+                rec.write({'state': 'error', 'error_msg': f'Error parseando XML: {error}'})
+                continue
+            try:
+                with self.env.cr.savepoint():
+                    partner = rec._preparar_factura(datos)
+            except Exception as e:
+                rec.write({'state': 'error', 'error_msg': f'Error buscando/creando proveedor: {e}'})
+                continue
+            if not partner:
+                continue
+            cufe = datos.get('cufe')
+            if cufe in cufes_lote:
+                primero = cufes_lote[cufe]
+                rec.write({
+                    'state': 'duplicado',
+                    'error_msg': f"CUFE ya procesado en registro #{primero.id} ({primero.name})",
+                })
+                repetidos.append((rec, primero))
+                continue
+            if cufe:
+                cufes_lote[cufe] = rec
+            pendientes.append((rec, datos, partner))
+        self._crear_facturas_en_lote(pendientes)
+        # Si el primero no llegó a procesarse, el repetido no es duplicado de
+        # nada: queda en error para el próximo reproceso.
+        for rec, primero in repetidos:
+            if primero.state != 'procesado':
+                rec.write({
+                    'state': 'error',
+                    'error_msg': f'CUFE repetido en el lote; el registro #{primero.id} no se procesó.',
+                })
+        return Counter(rec._clase_resultado() for rec in self)
+
+    @api.model
+    def _crear_facturas_en_lote(self, pendientes):
+        """Crea las facturas de [(registro, datos, proveedor)] con un solo
+        create. Si el lote falla, se crean una por una para aislar las que
+        fallan.
+
+        Los registros se marcan procesados dentro del savepoint: el índice
+        único de CUFE se verifica al salir de él y no al confirmar el lote.
+        """
+        if not pendientes:
+            return
+        registros = self.browse([rec.id for rec, _datos, _partner in pendientes])
+        pdfs = {
+            adjunto.res_id: adjunto.raw
+            for adjunto in self.env['ir.attachment'].sudo().search([
+                ('res_model', '=', self._name),
+                ('res_id', 'in', registros.ids),
+                ('res_field', '=', 'pdf_content'),
+            ])
+        }
+        try:
+            with self.env.cr.savepoint():
+                facturas = self.env['account.move'].create([
+                    rec._vals_factura_proveedor(datos, partner)
+                    for rec, datos, partner in pendientes
+                ])
+                self.env['ir.attachment'].create([
+                    rec._vals_pdf_factura(factura, datos, pdfs[rec.id], rec.pdf_filename)
+                    for (rec, datos, _partner), factura in zip(pendientes, facturas)
+                    if pdfs.get(rec.id)
+                ])
+                for (rec, _datos, _partner), factura in zip(pendientes, facturas):
+                    rec._marcar_procesado(factura)
+        except Exception as e:
+            _logger.info('Creación en lote de %s facturas falló (%s); se crean una por una.', len(pendientes), e)
+            for rec, datos, partner in pendientes:
+                try:
+                    with self.env.cr.savepoint():
+                        factura = rec._crear_factura_proveedor(
+                            datos, partner, pdfs.get(rec.id), rec.pdf_filename,
+                        )
+                        rec._marcar_procesado(factura)
+                except pg_errors.UniqueViolation as e:
+                    if e.diag.constraint_name != INDICE_CUFE:
+                        rec.write({'state': 'error', 'error_msg': f'Error creando factura: {e}'})
+                        continue
+                    # Otro proceso dejó el mismo CUFE procesado mientras tanto
+                    rec.write({'state': 'duplicado', 'error_msg': 'CUFE ya procesado en otro registro.'})
+                except Exception as e:
+                    rec.write({'state': 'error', 'error_msg': f'Error creando factura: {e}'})
+
+    def _clase_resultado(self):
+        """Clase del resultado del registro para los resúmenes."""
+        self.ensure_one()
+        if self.state != 'error':
+            return dict(self._fields['state']._description_selection(self.env))[self.state]
+        for prefijo, clase in CLASES_ERROR:
+            if (self.error_msg or '').startswith(prefijo):
+                return f'Error: {clase}'
+        return 'Error: Otros'
+
+    @api.model
+    def _texto_resumen(self, resumen, total, segundos, procesos):
+        lineas = [
+            f'{total} registros reprocesados en {segundos:.1f} s '
+            f'(parseo en {procesos} proceso(s)).'
+        ]
+        lineas += [f'- {clase}: {cantidad}' for clase, cantidad in sorted(resumen.items())]
+        return '\n'.join(lineas)
 
     def action_ver_factura(self):
         """Abre la factura creada en una ventana."""
@@ -516,22 +988,20 @@ class FacturaEmail(models.Model):
         if not self.archivo_manual:
             raise UserError('Debe cargar un archivo XML o ZIP primero.')
 
-        raw_data = base64.b64decode(self.archivo_manual)
+        archivo = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_id', '=', self.id),
+            ('res_field', '=', 'archivo_manual'),
+        ], limit=1)
         fname = (self.archivo_manual_nombre or '').lower()
+        xml_gz = pdf_data = pdf_name = None
+        if fname.endswith(('.zip', '.xml')):
+            xml_gz, pdf_data, pdf_name = self._extraer_de_adjuntos(archivo, nombre=fname)
 
-        xml_content = None
-        pdf_data = None
-        pdf_name = None
-
-        if fname.endswith('.zip'):
-            xml_content, pdf_data, pdf_name = self._extraer_zip(raw_data, None, None, None)
-        elif fname.endswith('.xml'):
-            xml_content = raw_data.decode('utf-8', errors='replace')
-
-        if not xml_content:
+        if not xml_gz:
             raise UserError('No se encontró XML válido en el archivo cargado.')
 
-        self.xml_content = xml_content
+        self._guardar_xml(xml_gz)
         if pdf_data:
             self.pdf_content = base64.b64encode(pdf_data)
             self.pdf_filename = pdf_name
@@ -540,22 +1010,17 @@ class FacturaEmail(models.Model):
         self.archivo_manual = False
         self.archivo_manual_nombre = False
 
-        self._procesar_xml(xml_content, pdf_data, pdf_name)
+        with gzip.GzipFile(fileobj=io.BytesIO(xml_gz)) as xml:
+            self._procesar_xml(xml, pdf_data, pdf_name)
 
     # -------------------------------------------------------------------------
     # Cron
     # -------------------------------------------------------------------------
     @api.model
     def _cron_reprocesar_pendientes(self):
-        """Reprocesa registros que quedaron en estado pendiente (con XML)."""
-        pendientes = self.search([
-            ('state', '=', 'pendiente'),
-            ('xml_content', '!=', False),
-        ], limit=50)
-        for rec in pendientes:
-            try:
-                pdf_data = base64.b64decode(rec.pdf_content) if rec.pdf_content else None
-                rec._procesar_xml(rec.xml_content, pdf_data, rec.pdf_filename)
-            except Exception as e:
-                _logger.exception("Error reprocesando factura email %s", rec.id)
-                rec.write({'state': 'error', 'error_msg': str(e)})
+        """Barrido periódico de la cola de ingesta: devuelve a la cola los
+        correos atascados y despierta los crons de ingesta si hay
+        pendientes (p. ej. reintentos cuya espera ya pasó)."""
+        self._liberar_atascados()
+        if self.search_count(self._domain_cola(), limit=1):
+            self._disparar_cola()
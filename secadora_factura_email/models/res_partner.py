@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+import re
+
+from odoo import models, fields, api
+
+
+def normalizar_nit(valor):
+    """NIT comparable: sin dígito de verificación (lo que va tras el último
+    guion), sin prefijo de país, puntos ni espacios. '900.123.456-1' ->
+    '900123456'."""
+    if not valor:
+        return False
+    base = valor.rsplit('-', 1)[0] if '-' in valor else valor
+    return re.sub(r'\D', '', base) or False
+
+
+class ResPartner(models.Model):
+    _inherit = 'res.partner'
+
+    nit_normalizado = fields.Char(
+        string='NIT Normalizado',
+        compute='_compute_nit_normalizado',
+        store=True,
+        index=True,
+        help='NIT sin dígito de verificación ni separadores. Lo usa la '
+             'recepción de facturas por correo para encontrar al proveedor.',
+    )
+
+    @api.depends('vat')
+    def _compute_nit_normalizado(self):
+        for partner in self:
+            partner.nit_normalizado = normalizar_nit(partner.vat)
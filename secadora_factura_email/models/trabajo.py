@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, api
+
+
+class SecadoraTrabajo(models.Model):
+    _inherit = 'secadora.trabajo'
+
+    @api.model
+    def _metodos_encolables(self):
+        metodos = super()._metodos_encolables()
+        metodos.setdefault('secadora.factura.email', set()).update({'_reprocesar_en_lote', '_reprocesar_masivo'})
+        return metodos
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""Parseo de facturas electrónicas colombianas (UBL 2.1 / DIAN).
+
+Funciones puras: no usan el entorno de Odoo ni la base de datos, así que
+se pueden ejecutar en otros procesos (ver parsear_xml_gz, que usa el
+reproceso masivo de secadora.factura.email).
+"""
+
+import gzip
+import io
+import logging
+
+from lxml import etree
+
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+# Namespaces UBL 2.1 DIAN Colombia
+NS = {
+    'cbc': 'urn:oasis:names:specification:ubl:schema:xsd:CommonBasicComponents-2',
+    'cac': 'urn:oasis:names:specification:ubl:schema:xsd:CommonAggregateComponents-2',
+    'fe': 'urn:oasis:names:specification:ubl:schema:xsd:Invoice-2',
+    'cn': 'urn:oasis:names:specification:ubl:schema:xsd:CreditNote-2',
+    'dn': 'urn:oasis:names:specification:ubl:schema:xsd:DebitNote-2',
+    'ext': 'urn:oasis:names:specification:ubl:schema:xsd:CommonExtensionComponents-2',
+    'sts': 'dian:gov:co:facturaelectronica:Structures-2-1',
+    'ds': 'http://www.w3.org/2000/09/xmldsig#',
+}
+
+# Mapeo de namespace raíz a tipo de documento Odoo
+MOVE_TYPE_MAP = {
+    '{urn:oasis:names:specification:ubl:schema:xsd:Invoice-2}Invoice': 'in_invoice',
+    '{urn:oasis:names:specification:ubl:schema:xsd:CreditNote-2}CreditNote': 'in_refund',
+    '{urn:oasis:names:specification:ubl:schema:xsd:DebitNote-2}DebitNote': 'in_invoice',
+}
+
+# Tag de línea según tipo de documento
+LINE_TAG_MAP = {
+    '{urn:oasis:names:specification:ubl:schema:xsd:Invoice-2}Invoice': 'cac:InvoiceLine',
+    '{urn:oasis:names:specification:ubl:schema:xsd:CreditNote-2}CreditNote': 'cac:CreditNoteLine',
+    '{urn:oasis:names:specification:ubl:schema:xsd:DebitNote-2}DebitNote': 'cac:DebitNoteLine',
+}
+
+# Tag de cantidad según tipo
+QTY_TAG_MAP = {
+    '{urn:oasis:names:specification:ubl:schema:xsd:Invoice-2}Invoice': 'cbc:InvoicedQuantity',
+    '{urn:oasis:names:specification:ubl:schema:xsd:CreditNote-2}CreditNote': 'cbc:CreditedQuantity',
+    '{urn:oasis:names:specification:ubl:schema:xsd:DebitNote-2}DebitNote': 'cbc:DebitedQuantity',
+}
+
+# Subárboles que parsear_xml_dian no lee y que son el grueso de un XML DIAN:
+# firma digital, extensiones (certificados, QR) y, en un AttachedDocument, la
+# respuesta de validación de la DIAN. Se descartan mientras se parsea.
+NODOS_DESCARTABLES = (
+    f"{{{NS['ext']}}}UBLExtensions",
+    f"{{{NS['ds']}}}Signature",
+    f"{{{NS['cac']}}}ParentDocumentLineReference",
+)
+
+
+def extraer_documento_interno(root):
+    """Si el XML es un AttachedDocument DIAN, extrae el Invoice/CreditNote/DebitNote del CDATA."""
+    NS_AD = {'ad': 'urn:oasis:names:specification:ubl:schema:xsd:AttachedDocument-2'}
+    NS_AD.update(NS)
+
+    if 'AttachedDocument' not in root.tag:
+        return root
+
+    # El documento real está en cac:Attachment/cac:ExternalReference/cbc:Description (CDATA)
+    description = root.find('.//cac:Attachment//cac:ExternalReference//cbc:Description', NS_AD)
+    if description is not None and description.text:
+        inner_xml = description.text.strip()
+        try:
+            return iterparse_raiz(io.BytesIO(inner_xml.encode('utf-8')))
+        except etree.XMLSyntaxError:
+            _logger.warning("No se pudo parsear el XML interno del AttachedDocument")
+
+    raise UserError(
+        'El XML es un AttachedDocument pero no se encontró la factura embebida dentro del CDATA.'
+    )
+
+
+def iterparse_raiz(fuente):
+    """Parsea el XML de `fuente` (stream) de forma incremental y devuelve
+    la raíz, vaciando al vuelo los NODOS_DESCARTABLES: la firma y las
+    extensiones no llegan a quedar en memoria junto con el resto."""
+    contexto = etree.iterparse(
+        fuente, events=('end',), tag=NODOS_DESCARTABLES,
+        resolve_entities=False, no_network=True, remove_comments=True,
+    )
+    for _evento, nodo in contexto:
+        nodo.clear(keep_tail=True)
+    return contexto.root
+
+
+def parsear_xml_dian(fuente):
+    """Parsea un XML de factura electrónica colombiana UBL 2.1.
+
+    fuente puede ser texto, bytes o un stream (p. ej. el de
+    secadora.factura.email._abrir_xml())."""
+    if isinstance(fuente, str):
+        fuente = fuente.encode('utf-8')
+    if isinstance(fuente, bytes):
+        fuente = io.BytesIO(fuente)
+    root = iterparse_raiz(fuente)
+
+    # Si es AttachedDocument, extraer el Invoice/CreditNote/DebitNote del CDATA
+    root = extraer_documento_interno(root)
+
+    # Determinar tipo de documento
+    root_tag = root.tag
+    move_type = MOVE_TYPE_MAP.get(root_tag)
+    if not move_type:
+        raise UserError(f'Tipo de documento XML no reconocido: {root_tag}')
+
+    tipo_doc_map = {
+        'in_invoice': 'invoice',
+        'in_refund': 'credit_note',
+    }
+    # Nota débito es in_invoice pero tipo_documento distinto
+    if 'DebitNote' in root_tag:
+        tipo_doc = 'debit_note'
+    else:
+        tipo_doc = tipo_doc_map.get(move_type, 'invoice')
+
+    datos = {
+        'move_type': move_type,
+        'tipo_documento': tipo_doc,
+        'numero_factura': xml_text(root, './/cbc:ID'),
+        'cufe': xml_text(root, './/cbc:UUID'),
+        'fecha_emision': xml_text(root, './/cbc:IssueDate'),
+        'fecha_vencimiento': xml_text(root, './/cbc:DueDate') or xml_text(root, './/cac:PaymentMeans/cbc:PaymentDueDate'),
+        'moneda': xml_text(root, './/cbc:DocumentCurrencyCode'),
+        'notas': xml_text(root, './/cbc:Note'),
+    }
+
+    # Emisor (Proveedor)
+    supplier = root.find('.//cac:AccountingSupplierParty', NS)
+    if supplier is not None:
+        party = supplier.find('.//cac:Party', NS)
+        datos['emisor_nit'] = xml_text(supplier, './/cbc:CompanyID')
+        datos['emisor_razon_social'] = xml_text(
+            supplier, './/cbc:RegistrationName'
+        )
+        if party is not None:
+            datos['emisor_telefono'] = xml_text(party, './/cbc:Telephone')
+            datos['emisor_email'] = xml_text(party, './/cbc:ElectronicMail')
+            # Dirección
+            address = party.find('.//cac:PhysicalLocation//cac:Address', NS)
+            if address is None:
+                address = party.find('.//cac:PostalAddress', NS)
+            if address is not None:
+                datos['emisor_direccion'] = xml_text(address, 'cbc:AddressLine/cbc:Line')
+                datos['emisor_ciudad'] = xml_text(address, 'cbc:CityName')
+                datos['emisor_departamento'] = xml_text(address, 'cbc:CountrySubentity')
+
+    # Receptor (nosotros — para validación)
+    receptor = root.find('.//cac:AccountingCustomerParty', NS)
+    if receptor is not None:
+        datos['receptor_nit'] = xml_text(receptor, './/cbc:CompanyID')
+
+    # Total
+    monetary = root.find('.//cac:LegalMonetaryTotal', NS)
+    if monetary is not None:
+        payable = xml_text(monetary, 'cbc:PayableAmount')
+        datos['total'] = float(payable) if payable else 0.0
+    else:
+        datos['total'] = 0.0
+
+    # Líneas de factura
+    line_tag = LINE_TAG_MAP.get(root_tag, 'cac:InvoiceLine')
+    qty_tag = QTY_TAG_MAP.get(root_tag, 'cbc:InvoicedQuantity')
+    datos['items'] = []
+    for line in root.findall(f'.//{line_tag}', NS):
+        item = parsear_linea(line, qty_tag)
+        if item:
+            datos['items'].append(item)
+
+    return datos
+
+
+def parsear_linea(line_node, qty_tag):
+    """Parsea una línea de factura UBL."""
+    descripcion = xml_text(line_node, './/cac:Item//cbc:Description')
+    if not descripcion:
+        descripcion = xml_text(line_node, './/cac:Item//cbc:Name')
+    if not descripcion:
+        descripcion = 'Producto/Servicio'
+
+    cantidad_str = xml_text(line_node, f'.//{qty_tag}')
+    cantidad = float(cantidad_str) if cantidad_str else 1.0
+
+    precio_str = xml_text(line_node, './/cac:Price//cbc:PriceAmount')
+    precio_unitario = float(precio_str) if precio_str else 0.0
+
+    # Impuestos de la línea
+    porcentaje_iva = 0.0
+    tax_subtotal = line_node.find('.//cac:TaxTotal//cac:TaxSubtotal', NS)
+    if tax_subtotal is not None:
+        pct = xml_text(tax_subtotal, './/cac:TaxCategory//cbc:Percent')
+        if pct:
+            porcentaje_iva = float(pct)
+
+    return {
+        'descripcion': descripcion,
+        'cantidad': cantidad,
+        'precio_unitario': precio_unitario,
+        'porcentaje_iva': porcentaje_iva,
+    }
+
+
+def xml_text(node, xpath):
+    """Extrae texto de un nodo XML de forma segura."""
+    el = node.find(xpath, NS)
+    return el.text.strip() if el is not None and el.text else None
+
+
+def parsear_xml_gz(xml_gz):
+    """Parsea un XML comprimido con gzip. Pensada para un pool de procesos:
+    recibe y devuelve valores simples y nunca lanza.
+
+    Devuelve (datos, None), o (None, mensaje de error).
+    """
+    try:
+        with gzip.GzipFile(fileobj=io.BytesIO(xml_gz)) as xml:
+            return parsear_xml_dian(xml), None
+    except Exception as e:
+        return None, str(e) or type(e).__name__
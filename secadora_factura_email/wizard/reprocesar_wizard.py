@@ -2,12 +2,23 @@
 
 from odoo import models, fields, api
 from odoo.exceptions import UserError
+from odoo.osv import expression
+from odoo.tools.safe_eval import safe_eval
 
 
 class ReprocesarFacturaWizard(models.TransientModel):
     _name = 'secadora.reprocesar.factura.wizard'
     _description = 'Reprocesar Facturas Email con Error'
 
+    modo = fields.Selection([
+        ('seleccion', 'Registros seleccionados'),
+        ('dominio', 'Masivo por filtro'),
+    ], string='Modo', default='seleccion', required=True)
+    dominio = fields.Char(
+        string='Filtro',
+        default="[('state', '=', 'error')]",
+        help='Solo se reprocesan los registros del filtro que estén en error o pendientes.',
+    )
     factura_email_ids = fields.Many2many(
         'secadora.factura.email',
         string='Facturas a Reprocesar',
@@ -16,11 +27,26 @@ class ReprocesarFacturaWizard(models.TransientModel):
         string='Registros Seleccionados',
         compute='_compute_cantidad',
     )
+    en_segundo_plano = fields.Boolean(
+        string='Procesar en segundo plano',
+        help='Reprocesa como trabajo en segundo plano y avisa al terminar.',
+    )
 
-    @api.depends('factura_email_ids')
+    @api.depends('modo', 'dominio', 'factura_email_ids')
     def _compute_cantidad(self):
+        FacturaEmail = self.env['secadora.factura.email']
         for rec in self:
-            rec.cantidad = len(rec.factura_email_ids)
+            if rec.modo == 'dominio':
+                rec.cantidad = FacturaEmail.search_count(rec._dominio_masivo())
+            else:
+                rec.cantidad = len(rec.factura_email_ids)
+
+    def _dominio_masivo(self):
+        self.ensure_one()
+        return expression.AND([
+            safe_eval(self.dominio or '[]'),
+            [('state', 'in', ('error', 'pendiente'))],
+        ])
 
     @api.model
     def default_get(self, fields_list):
@@ -31,14 +57,26 @@ class ReprocesarFacturaWizard(models.TransientModel):
             # Solo los que están en error o pendiente
             reprocesables = registros.filtered(lambda r: r.state in ('error', 'pendiente'))
             res['factura_email_ids'] = [(6, 0, reprocesables.ids)]
+        elif 'modo' in fields_list:
+            res['modo'] = 'dominio'
         return res
 
     def action_reprocesar(self):
         """Reprocesa todos los registros seleccionados."""
         self.ensure_one()
+        if self.modo == 'dominio':
+            return self._reprocesar_masivo()
         if not self.factura_email_ids:
             raise UserError('No hay registros para reprocesar.')
 
+        if self.en_segundo_plano:
+            Trabajo = self.env['secadora.trabajo']
+            trabajo = Trabajo._encolar(
+                self.factura_email_ids, '_reprocesar_en_lote',
+                nombre=f'Reprocesar {len(self.factura_email_ids)} facturas email',
+            )
+            return Trabajo._accion_encolado(trabajo)
+
         for rec in self.factura_email_ids:
             rec.action_reprocesar()
 
@@ -48,3 +86,17 @@ class ReprocesarFacturaWizard(models.TransientModel):
             'view_mode': 'list,form',
             'target': 'current',
         }
+
+    def _reprocesar_masivo(self):
+        """Encola el reproceso masivo de los registros del filtro: siempre
+        en segundo plano (con el servidor en modo prefork, el parseo va en un
+        pool de procesos)."""
+        if not self.cantidad:
+            raise UserError('No hay registros en error o pendientes que cumplan el filtro.')
+        Trabajo = self.env['secadora.trabajo']
+        trabajo = Trabajo._encolar(
+            self.env['secadora.factura.email'], '_reprocesar_masivo',
+            self._dominio_masivo(),
+            nombre=f'Reproceso masivo de {self.cantidad} facturas email',
+        )
+        return Trabajo._accion_encolado(trabajo)
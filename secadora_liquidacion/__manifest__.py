@@ -15,7 +15,7 @@
         - Reporte PDF para soporte de facturación del agricultor
     """,
     'author': 'Secadora La Gran Colombia S.A.S',
-    'depends': ['bascula', 'secadora_calidad', 'secadora_transporte', 'mail'],
+    'depends': ['bascula', 'secadora_calidad', 'secadora_transporte', 'secadora_trabajos', 'mail'],
     'data': [
         'security/security.xml',
         'security/ir.model.access.csv',
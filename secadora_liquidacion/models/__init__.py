@@ -7,3 +7,4 @@ from . import pesaje
 from . import precio_compra
 from . import tipo_deduccion
 from . import partner
+from . import trabajo
@@ -136,11 +136,10 @@ class SecadoraLiquidacion(models.Model):
             rec.cantidad_pesajes = len(lineas)
 
     def action_confirmar(self):
-        for rec in self:
-            if not rec.linea_ids:
-                raise UserError('Debe agregar al menos una línea de pesaje antes de confirmar.')
-            rec.action_cargar_fletes()
-            rec.state = 'confirmado'
+        if any(not rec.linea_ids for rec in self):
+            raise UserError('Debe agregar al menos una línea de pesaje antes de confirmar.')
+        self.action_cargar_fletes()
+        self.state = 'confirmado'
 
     def action_borrador(self):
         for rec in self:
@@ -170,59 +169,53 @@ class SecadoraLiquidacion(models.Model):
                 self.tercero_id = pesaje.tercero_id
         # Excluir pesajes ya seleccionados del domain
         pesajes_usados = self.linea_ids.mapped('pesaje_id').ids
-        domain = [
-            ('state', '=', 'completado'),
-            ('direccion', '=', 'entrada'),
-            ('tipo_operacion_id.codigo', '=', 'COMPRA'),
-            ('liquidacion_id', '=', False),
-        ]
-        if self.tercero_id:
-            domain.append(('tercero_id', '=', self.tercero_id.id))
+        domain = self._domain_pesajes_liquidables(tercero=self.tercero_id)
         if pesajes_usados:
             domain.append(('id', 'not in', pesajes_usados))
         return {'domain': {'pesaje_id': domain}}
 
     def action_cargar_fletes(self):
-        """Busca fletes vinculados a los pesajes de esta liquidación y crea deducciones."""
+        """Busca fletes vinculados a los pesajes de estas liquidaciones y crea deducciones."""
         for rec in self:
-            pesaje_ids = rec.linea_ids.mapped('pesaje_id').ids
-            if not pesaje_ids:
+            if not rec.linea_ids:
                 raise UserError('No hay pesajes en la liquidación para buscar fletes.')
 
-            fletes = self.env['secadora.flete'].search([
-                ('pesaje_id', 'in', pesaje_ids),
-                ('pago_flete', '=', 'secadora'),
-                ('state', '!=', 'cancelado'),
-            ])
+        liquidacion_por_pesaje = {
+            linea.pesaje_id.id: linea.liquidacion_id.id for linea in self.linea_ids
+        }
+        fletes = self.env['secadora.flete'].search([
+            ('pesaje_id', 'in', list(liquidacion_por_pesaje)),
+            ('pago_flete', '=', 'secadora'),
+            ('state', '!=', 'cancelado'),
+        ])
 
-            # Eliminar deducciones tipo flete existentes
-            rec.deduccion_ids.filtered(lambda d: d.tipo == 'flete').unlink()
+        # Eliminar deducciones tipo flete existentes
+        self.deduccion_ids.filtered(lambda d: d.tipo == 'flete').unlink()
 
-            for flete in fletes:
-                self.env['secadora.liquidacion.deduccion'].create({
-                    'liquidacion_id': rec.id,
-                    'tipo': 'flete',
-                    'descripcion': 'Flete %s (%s → %s)' % (
-                        flete.name,
-                        flete.origen_id.name or '',
-                        flete.destino_id.name or '',
-                    ),
-                    'monto': flete.costo_total,
-                    'flete_id': flete.id,
-                })
+        self.env['secadora.liquidacion.deduccion'].create([{
+            'liquidacion_id': liquidacion_por_pesaje[flete.pesaje_id.id],
+            'tipo': 'flete',
+            'descripcion': 'Flete %s (%s → %s)' % (
+                flete.name,
+                flete.origen_id.name or '',
+                flete.destino_id.name or '',
+            ),
+            'monto': flete.costo_total,
+            'flete_id': flete.id,
+        } for flete in fletes])
 
     def action_aplicar_deducciones(self):
         """Aplica deducciones automáticas según el agricultor (tercero_id)."""
-        Deduccion = self.env['secadora.liquidacion.deduccion']
         for rec in self:
-            tipos = rec.tercero_id.tipo_deduccion_ids.filtered('active')
-            if not tipos:
+            if not rec.tercero_id.tipo_deduccion_ids.filtered('active'):
                 raise UserError('El agricultor %s no tiene deducciones configuradas.' % rec.tercero_id.name)
 
-            # Eliminar deducciones auto-generadas previas (excepto fletes)
-            rec.deduccion_ids.filtered(lambda d: d.tipo_deduccion_id).unlink()
+        # Eliminar deducciones auto-generadas previas (excepto fletes)
+        self.deduccion_ids.filtered(lambda d: d.tipo_deduccion_id).unlink()
 
-            for tipo in tipos:
+        vals_list = []
+        for rec in self:
+            for tipo in rec.tercero_id.tipo_deduccion_ids.filtered('active'):
                 if tipo.tipo_calculo == 'porcentaje':
                     monto = rec.total_bruto * tipo.valor / 100.0
                 else:
@@ -234,7 +227,7 @@ class SecadoraLiquidacion(models.Model):
                 else:
                     tipo_sel = 'otro'
 
-                Deduccion.create({
+                vals_list.append({
                     'liquidacion_id': rec.id,
                     'tipo': tipo_sel,
                     'descripcion': '%s (%s)' % (tipo.name, tipo.codigo),
@@ -242,6 +235,106 @@ class SecadoraLiquidacion(models.Model):
                     'tipo_deduccion_id': tipo.id,
                     'sequence': tipo.sequence,
                 })
+        self.env['secadora.liquidacion.deduccion'].create(vals_list)
+
+    @api.model
+    def _domain_pesajes_liquidables(self, fecha_desde=False, fecha_hasta=False, tercero=False):
+        """Pesajes de compra completados que aún no están en una liquidación."""
+        domain = [
+            ('state', '=', 'completado'),
+            ('direccion', '=', 'entrada'),
+            ('tipo_operacion_id.codigo', '=', 'COMPRA'),
+            ('liquidacion_id', '=', False),
+        ]
+        if tercero:
+            domain.append(('tercero_id', '=', tercero.id))
+        if fecha_desde:
+            domain.append(('fecha', '>=', fecha_desde))
+        if fecha_hasta:
+            domain.append(('fecha', '<=', fecha_hasta))
+        return domain
+
+    @api.model
+    def _liquidar_en_lote(self, asignaciones):
+        """Agrega pesajes a liquidaciones en lote.
+
+        asignaciones: lista de (liquidacion, pesajes). Los análisis confirmados
+        de todos los pesajes se leen en una consulta, los precios de catálogo
+        se resuelven de una vez por empresa y las líneas se crean con un solo
+        create. Luego se cargan los fletes y, a las liquidaciones cuyo
+        agricultor las tiene configuradas, las deducciones automáticas.
+        Los pesajes que ya están en su liquidación se omiten.
+        """
+        Linea = self.env['secadora.liquidacion.linea']
+        PrecioCompra = self.env['secadora.precio.compra']
+
+        asignaciones = [
+            (liquidacion, pesajes - liquidacion.linea_ids.pesaje_id)
+            for liquidacion, pesajes in asignaciones
+        ]
+        todos = self.env['secadora.pesaje'].union(*(pesajes for _liq, pesajes in asignaciones))
+        analisis = Linea._analisis_confirmados(todos)
+
+        # Precios de catálogo, solo para los agricultores sin precio propio
+        pares_por_empresa = {}
+        for liquidacion, pesajes in asignaciones:
+            if liquidacion.tercero_id.precio_compra_kg > 0:
+                continue
+            pares_por_empresa.setdefault(liquidacion.company_id.id, set()).update(
+                (pesaje.variedad_id.id, pesaje.fecha) for pesaje in pesajes
+            )
+        catalogo = {
+            company_id: PrecioCompra._obtener_precios(pares, company_id)
+            for company_id, pares in pares_por_empresa.items()
+        }
+
+        vals_list = []
+        for liquidacion, pesajes in asignaciones:
+            # Prioridad de precio: agricultor > catálogo > pesaje
+            precio_tercero = liquidacion.tercero_id.precio_compra_kg
+            precios = catalogo.get(liquidacion.company_id.id, {})
+            for pesaje in pesajes:
+                if precio_tercero > 0:
+                    precio = precio_tercero
+                else:
+                    precio = precios[(pesaje.variedad_id.id, pesaje.fecha)] or pesaje.precio
+                vals_list.append({
+                    'liquidacion_id': liquidacion.id,
+                    'pesaje_id': pesaje.id,
+                    'peso_comercial': Linea._peso_comercial_de(pesaje, analisis.get(pesaje.id)),
+                    'precio': precio,
+                })
+        Linea.create(vals_list)
+
+        liquidaciones = self.union(*(liquidacion for liquidacion, _pesajes in asignaciones))
+        liquidaciones.filtered('linea_ids').action_cargar_fletes()
+        liquidaciones.filtered(
+            lambda l: l.tercero_id.tipo_deduccion_ids.filtered('active')
+        ).action_aplicar_deducciones()
+        return liquidaciones
+
+    @api.model
+    def _liquidar_periodo(self, fecha_desde, fecha_hasta):
+        """Crea una liquidación por agricultor con sus pesajes liquidables
+        del período y las llena con _liquidar_en_lote."""
+        pesajes = self.env['secadora.pesaje'].search(
+            self._domain_pesajes_liquidables(fecha_desde, fecha_hasta) + [
+                ('tercero_id', '!=', False),
+                ('company_id', '=', self.env.company.id),
+            ]
+        )
+        por_tercero = pesajes.grouped('tercero_id')
+        if not por_tercero:
+            return self
+        liquidaciones = self.create([{
+            'tercero_id': tercero.id,
+            'fecha_desde': fecha_desde,
+            'fecha_hasta': fecha_hasta,
+        } for tercero in por_tercero])
+        return self._liquidar_en_lote([
+            (liquidacion, por_tercero[liquidacion.tercero_id])
+            for liquidacion in liquidaciones
+        ])
 
     def action_abrir_wizard_pesajes(self):
         self.ensure_one()
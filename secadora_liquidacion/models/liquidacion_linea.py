@@ -91,16 +91,26 @@ class SecadoraLiquidacionLinea(models.Model):
 
     @api.depends('pesaje_id')
     def _compute_analisis_id(self):
-        AnalisisLab = self.env['secadora.analisis.lab']
+        analisis = self._analisis_confirmados(self.pesaje_id)
         for rec in self:
-            if rec.pesaje_id:
-                analisis = AnalisisLab.search([
-                    ('pesaje_id', '=', rec.pesaje_id.id),
-                    ('state', '=', 'confirmado'),
-                ], limit=1, order='id desc')
-                rec.analisis_id = analisis
-            else:
-                rec.analisis_id = False
+            rec.analisis_id = analisis.get(rec.pesaje_id.id, False)
+
+    @api.model
+    def _analisis_confirmados(self, pesajes):
+        """Último análisis confirmado de cada pesaje, en una sola consulta.
+        Retorna {pesaje_id: secadora.analisis.lab}; los pesajes sin análisis
+        confirmado no aparecen."""
+        if not pesajes:
+            return {}
+        grupos = self.env['secadora.analisis.lab']._read_group(
+            [('pesaje_id', 'in', pesajes.ids), ('state', '=', 'confirmado')],
+            ['pesaje_id'],
+            ['id:max'],
+        )
+        # Iterar el recordset (y no hacer browse por id) comparte el prefetch:
+        # leer peso_comercial de todos cuesta una sola consulta.
+        analisis = self.env['secadora.analisis.lab'].browse([analisis_id for _pesaje, analisis_id in grupos])
+        return {pesaje.id: rec for (pesaje, _analisis_id), rec in zip(grupos, analisis)}
 
     @api.depends('peso_comercial', 'precio')
     def _compute_subtotal(self):
@@ -128,13 +138,15 @@ class SecadoraLiquidacionLinea(models.Model):
         self.ensure_one()
         if not self.pesaje_id:
             return 0.0
-        analisis = self.env['secadora.analisis.lab'].search([
-            ('pesaje_id', '=', self.pesaje_id.id),
-            ('state', '=', 'confirmado'),
-        ], limit=1, order='id desc')
+        analisis = self._analisis_confirmados(self.pesaje_id).get(self.pesaje_id.id)
+        return self._peso_comercial_de(self.pesaje_id, analisis)
+
+    @api.model
+    def _peso_comercial_de(self, pesaje, analisis):
+        """Peso comercial del análisis confirmado si lo tiene, si no el neto."""
         if analisis and analisis.peso_comercial > 0:
             return analisis.peso_comercial
-        return self.pesaje_id.peso_neto
+        return pesaje.peso_neto
 
     def _precio_sugerido(self):
         """Precio que sugiere el catálogo/tercero/pesaje. Prioridad:
@@ -155,10 +167,10 @@ class SecadoraLiquidacionLinea(models.Model):
     @api.model_create_multi
     def create(self, vals_list):
         records = super().create(vals_list)
-        # Actualizar liquidacion_id en los pesajes
-        for rec in records:
-            if rec.pesaje_id and rec.liquidacion_id:
-                rec.pesaje_id.sudo().write({'liquidacion_id': rec.liquidacion_id.id})
+        # Actualizar liquidacion_id en los pesajes: una escritura por
+        # liquidación, no una por línea
+        for liquidacion, lineas in records.grouped('liquidacion_id').items():
+            lineas.pesaje_id.sudo().write({'liquidacion_id': liquidacion.id})
         return records
 
     def unlink(self):
@@ -1,12 +1,23 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api
+import bisect
+
+from odoo import models, fields, api, tools
 from odoo.exceptions import ValidationError
 
 
 class SecadoraPrecioCompra(models.Model):
+    """Catálogo de precios de compra por variedad y vigencia.
+
+    Las liquidaciones consultan el precio de cada pesaje (y el onchange de la
+    línea lo hace en cada cambio). Para no buscarlo cada vez, las vigencias
+    activas de cada (variedad, empresa) se guardan en la ormcache como una
+    línea de tiempo ordenada y cada fecha se resuelve con búsqueda binaria.
+    Crear, editar o eliminar cualquier precio limpia la caché.
+    """
     _name = 'secadora.precio.compra'
     _description = 'Precio de Compra de Arroz'
+    _inherit = ['secadora.cache.mixin']
     _order = 'fecha_desde desc, variedad_id'
 
     _sql_constraints = [
@@ -82,26 +93,59 @@ class SecadoraPrecioCompra(models.Model):
         Prioridad: empresa específica > global (company_id=False).
         Retorna 0.0 si no hay precio configurado.
         """
-        domain = [
+        return self._obtener_precios([(variedad_id, fecha)], company_id)[(variedad_id, fecha)]
+
+    @api.model
+    def _obtener_precios(self, pares, company_id=False):
+        """Precio vigente para muchos pares (variedad_id, fecha) a la vez.
+
+        Misma prioridad que _obtener_precio. Con la caché caliente no hace
+        ninguna consulta. Retorna {(variedad_id, fecha): precio}, con 0.0 si
+        no hay precio configurado.
+        """
+        precios = {}
+        for variedad_id, fecha in set(pares):
+            precio = None
+            if variedad_id and fecha:
+                if company_id:
+                    precio = self._precio_en_linea(self._linea_de_tiempo(variedad_id, company_id), fecha)
+                if precio is None:
+                    precio = self._precio_en_linea(self._linea_de_tiempo(variedad_id, False), fecha)
+            precios[(variedad_id, fecha)] = precio or 0.0
+        return precios
+
+    @api.model
+    @tools.ormcache('variedad_id', 'company_id')
+    def _linea_de_tiempo(self, variedad_id, company_id):
+        """Vigencias activas de (variedad, empresa) ordenadas por fecha_desde.
+
+        Retorna (fechas_desde, tramos) con tramos = ((fecha_hasta, precio), ...);
+        valores planos porque la ormcache vive más que el cursor.
+        company_id=False es la línea de los precios globales.
+        """
+        precios = self.sudo().search([
             ('variedad_id', '=', variedad_id),
-            ('fecha_desde', '<=', fecha),
-            '|',
-            ('fecha_hasta', '=', False),
-            ('fecha_hasta', '>=', fecha),
-        ]
-        # Primero buscar con empresa específica
-        if company_id:
-            precio = self.search(
-                domain + [('company_id', '=', company_id)],
-                limit=1,
-                order='fecha_desde desc',
-            )
-            if precio:
-                return precio.precio
-        # Fallback: buscar precio global
-        precio = self.search(
-            domain + [('company_id', '=', False)],
-            limit=1,
-            order='fecha_desde desc',
+            ('company_id', '=', company_id),
+            ('active', '=', True),
+        ], order='fecha_desde, id')
+        return (
+            tuple(precios.mapped('fecha_desde')),
+            tuple((rec.fecha_hasta, rec.precio) for rec in precios),
         )
-        return precio.precio if precio else 0.0
+
+    @api.model
+    def _precio_en_linea(self, linea, fecha):
+        """Precio del tramo de la línea de tiempo que cubre fecha, o None.
+
+        _check_solapamiento impide que las vigencias activas de una misma
+        (variedad, empresa) se solapen: el único tramo candidato es el último
+        que empieza en o antes de fecha.
+        """
+        desdes, tramos = linea
+        i = bisect.bisect_right(desdes, fecha) - 1
+        if i < 0:
+            return None
+        fecha_hasta, precio = tramos[i]
+        if fecha_hasta and fecha_hasta < fecha:
+            return None
+        return precio
@@ -8,6 +8,10 @@ class CrearLiquidacionWizard(models.TransientModel):
     _name = 'secadora.crear.liquidacion.wizard'
     _description = 'Agregar Pesajes a Liquidación'
 
+    modo = fields.Selection([
+        ('agricultor', 'Un agricultor'),
+        ('periodo', 'Todos los agricultores del período'),
+    ], string='Liquidar', default='agricultor', required=True)
     liquidacion_id = fields.Many2one(
         'secadora.liquidacion',
         string='Liquidación',
@@ -16,7 +20,6 @@ class CrearLiquidacionWizard(models.TransientModel):
     tercero_id = fields.Many2one(
         'res.partner',
         string='Agricultor',
-        required=True,
     )
     fecha_desde = fields.Date(
         string='Fecha Desde',
@@ -28,31 +31,31 @@ class CrearLiquidacionWizard(models.TransientModel):
         'secadora.pesaje',
         string='Pesajes',
     )
+    en_segundo_plano = fields.Boolean(
+        string='Procesar en segundo plano',
+        help='Liquida el período como trabajo en segundo plano y avisa al terminar.',
+    )
 
-    @api.onchange('tercero_id', 'fecha_desde', 'fecha_hasta')
+    @api.onchange('modo', 'tercero_id', 'fecha_desde', 'fecha_hasta')
     def _onchange_buscar_pesajes(self):
         """Busca pesajes elegibles según filtros."""
-        if not self.tercero_id:
+        if self.modo != 'agricultor' or not self.tercero_id:
             self.pesaje_ids = False
             return
 
-        domain = [
-            ('state', '=', 'completado'),
-            ('direccion', '=', 'entrada'),
-            ('tipo_operacion_id.codigo', '=', 'COMPRA'),
-            ('liquidacion_id', '=', False),
-            ('tercero_id', '=', self.tercero_id.id),
-        ]
-        if self.fecha_desde:
-            domain.append(('fecha', '>=', self.fecha_desde))
-        if self.fecha_hasta:
-            domain.append(('fecha', '<=', self.fecha_hasta))
-
-        pesajes = self.env['secadora.pesaje'].search(domain)
+        pesajes = self.env['secadora.pesaje'].search(
+            self.env['secadora.liquidacion']._domain_pesajes_liquidables(
+                self.fecha_desde, self.fecha_hasta, self.tercero_id,
+            )
+        )
         self.pesaje_ids = pesajes
 
     def action_crear(self):
         self.ensure_one()
+        if self.modo == 'periodo':
+            return self._crear_periodo()
+        if not self.tercero_id:
+            raise UserError('Debe seleccionar el agricultor.')
         if not self.pesaje_ids:
             raise UserError('Debe seleccionar al menos un pesaje.')
 
@@ -68,9 +71,6 @@ class CrearLiquidacionWizard(models.TransientModel):
             )
 
         Liquidacion = self.env['secadora.liquidacion']
-        Linea = self.env['secadora.liquidacion.linea']
-        AnalisisLab = self.env['secadora.analisis.lab']
-
         liquidacion = self.liquidacion_id
         if not liquidacion:
             liquidacion = Liquidacion.create({
@@ -79,48 +79,8 @@ class CrearLiquidacionWizard(models.TransientModel):
                 'fecha_hasta': self.fecha_hasta,
             })
 
-        # Pesajes ya en la liquidación
-        pesajes_existentes = liquidacion.linea_ids.mapped('pesaje_id').ids
-
-        for pesaje in self.pesaje_ids:
-            if pesaje.id in pesajes_existentes:
-                continue
-
-            # Buscar análisis confirmado
-            analisis = AnalisisLab.search([
-                ('pesaje_id', '=', pesaje.id),
-                ('state', '=', 'confirmado'),
-            ], limit=1, order='id desc')
-
-            peso_comercial = analisis.peso_comercial if analisis and analisis.peso_comercial > 0 else pesaje.peso_neto
-            # Prioridad de precio: agricultor > catálogo > pesaje
-            tercero = liquidacion.tercero_id
-            if tercero and tercero.precio_compra_kg > 0:
-                precio = tercero.precio_compra_kg
-            else:
-                PrecioCompra = self.env['secadora.precio.compra']
-                precio_catalogo = PrecioCompra._obtener_precio(
-                    pesaje.variedad_id.id,
-                    pesaje.fecha,
-                    liquidacion.company_id.id,
-                )
-                precio = precio_catalogo if precio_catalogo else pesaje.precio
-
-            Linea.create({
-                'liquidacion_id': liquidacion.id,
-                'pesaje_id': pesaje.id,
-                'peso_comercial': peso_comercial,
-                'precio': precio,
-            })
-
-        # Auto-cargar fletes
-        liquidacion.action_cargar_fletes()
-
-        # Auto-aplicar deducciones del agricultor
-        try:
-            liquidacion.action_aplicar_deducciones()
-        except UserError:
-            pass  # No hay deducciones configuradas, continuar
+        # Líneas, fletes y deducciones del agricultor en lote
+        Liquidacion._liquidar_en_lote([(liquidacion, self.pesaje_ids)])
 
         return {
             'type': 'ir.actions.act_window',
@@ -129,3 +89,30 @@ class CrearLiquidacionWizard(models.TransientModel):
             'view_mode': 'form',
             'target': 'current',
         }
+
+    def _crear_periodo(self):
+        """Liquida a todos los agricultores con pesajes pendientes en el período."""
+        if not self.fecha_desde or not self.fecha_hasta:
+            raise UserError('Debe indicar el período (fecha desde y hasta).')
+        if self.en_segundo_plano:
+            Trabajo = self.env['secadora.trabajo']
+            trabajo = Trabajo._encolar(
+                self.env['secadora.liquidacion'], '_liquidar_periodo',
+                fields.Date.to_string(self.fecha_desde),
+                fields.Date.to_string(self.fecha_hasta),
+                nombre=f'Liquidaciones del {self.fecha_desde} al {self.fecha_hasta}',
+            )
+            return Trabajo._accion_encolado(trabajo)
+        liquidaciones = self.env['secadora.liquidacion']._liquidar_periodo(
+            self.fecha_desde, self.fecha_hasta,
+        )
+        if not liquidaciones:
+            raise UserError('No hay pesajes de compra pendientes de liquidar en el período.')
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Liquidaciones del Período',
+            'res_model': 'secadora.liquidacion',
+            'view_mode': 'list,form',
+            'domain': [('id', 'in', liquidaciones.ids)],
+            'target': 'current',
+        }
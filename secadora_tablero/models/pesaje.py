@@ -2,6 +2,14 @@
 
 from odoo import models, fields, api
 
+# Campos del pesaje que se ven en el tablero: en la tarjeta de tránsito o,
+# como related, en las tarjetas de sus posiciones.
+CAMPOS_TABLERO = {
+    'name', 'state', 'direccion', 'tercero_id', 'producto_id', 'variedad_id',
+    'peso_bruto', 'placa_texto', 'conductor_id', 'tipo_operacion_id',
+    'orden_servicio_id', 'es_semilla', 'humedad', 'impurezas',
+}
+
 
 class SecadoraPesaje(models.Model):
     _inherit = 'secadora.pesaje'
@@ -15,6 +23,12 @@ class SecadoraPesaje(models.Model):
         string='Posiciones',
         compute='_compute_posicion_count',
     )
+    tablero_version = fields.Integer(
+        string='Versión en Tablero',
+        readonly=True,
+        copy=False,
+        index=True,
+    )
 
     @api.depends('posicion_arroz_ids')
     def _compute_posicion_count(self):
@@ -95,6 +109,12 @@ class SecadoraPesaje(models.Model):
 
     def write(self, vals):
         res = super().write(vals)
+        if CAMPOS_TABLERO & set(vals):
+            # Los related de la posición se recalculan sin pasar por su
+            # write(): marcarlas aquí para que el tablero las vuelva a pedir.
+            Posicion = self.env['secadora.posicion.arroz']
+            Posicion._tablero_marcar(self)
+            Posicion._tablero_marcar(self.posicion_arroz_ids)
         if 'humedad' in vals or 'impurezas' in vals:
             for rec in self:
                 update = {}
@@ -1,7 +1,58 @@
 # -*- coding: utf-8 -*-
 
+import functools
+
 from odoo import models, fields, api
 from odoo.exceptions import UserError
+from odoo.tools import SQL
+
+# Columnas que el tablero recibe de cada tipo de registro (ver
+# secadora.serializador.columnas): (clave, ruta[, conversión]).
+CAMPOS_SITIO = [
+    ('id', 'id'),
+    ('name', 'name'),
+    ('fila', 'fila'),
+    ('columna', 'columna'),
+    ('capacidad_kg', 'capacidad_kg'),
+    ('es_punto_salida', 'es_punto_salida'),
+    ('ocultar_calidad', 'ocultar_calidad'),
+]
+CAMPOS_POSICION = [
+    ('id', 'id'),
+    ('name', 'name'),
+    ('sitio_id', 'sitio_id'),
+    ('pesaje_id', 'pesaje_id'),
+    ('peso_kg', 'peso_kg'),
+    ('tercero', 'tercero_id.name'),
+    ('producto', 'producto_id.product_tmpl_id.name'),
+    ('variedad', 'variedad_id.name'),
+    ('pesaje_name', 'pesaje_name'),
+    ('placa_texto', 'placa_texto'),
+    ('conductor', 'conductor_id.name'),
+    ('tipo_operacion', 'tipo_operacion_id.name'),
+    ('modalidad_salida_raw', 'modalidad_salida'),
+    ('es_division', 'es_division'),
+    ('es_division_hija', 'posicion_origen_id', bool),
+    ('es_combinacion', 'es_comercial'),
+    ('es_preasignado', 'es_preasignado'),
+    ('es_semilla', 'es_semilla'),
+    ('permite_combinar', 'permite_combinar'),
+    ('humedad', 'humedad'),
+    ('impurezas', 'impurezas'),
+]
+CAMPOS_TRANSITO = [
+    ('id', 'id'),
+    ('tercero', 'tercero_id.name'),
+    ('producto', 'producto_id.product_tmpl_id.name'),
+    ('variedad', 'variedad_id.name'),
+    ('peso_bruto', 'peso_bruto'),
+    ('placa_texto', 'placa_texto'),
+    ('conductor', 'conductor_id.name'),
+    ('tipo_operacion', 'tipo_operacion_id.name'),
+    ('pesaje_name', 'name'),
+    ('humedad', 'humedad'),
+    ('impurezas', 'impurezas'),
+]
 
 
 class PosicionArroz(models.Model):
@@ -14,6 +65,13 @@ class PosicionArroz(models.Model):
          'El peso de la posición no puede ser negativo.'),
     ]
 
+    # Versión del tablero: todo lo que el tablero muestra (tarjetas,
+    # ubicaciones y pesajes en tránsito) se marca al cambiar con un valor de
+    # esta secuencia, uno por transacción. El cliente pide solo lo marcado
+    # después de la versión que ya tiene y el bus le avisa cuándo pedir.
+    SECUENCIA_VERSION = 'secadora_tablero_version_seq'
+    CANAL_BUS = 'secadora_tablero'
+
     company_id = fields.Many2one(
         'res.company',
         string='Empresa',
@@ -146,6 +204,13 @@ class PosicionArroz(models.Model):
 
     notas = fields.Text(string='Notas')
 
+    tablero_version = fields.Integer(
+        string='Versión en Tablero',
+        readonly=True,
+        copy=False,
+        index=True,
+    )
+
     # Historial
     movimiento_ids = fields.One2many(
         'secadora.movimiento.arroz',
@@ -229,12 +294,20 @@ class PosicionArroz(models.Model):
             else:
                 rec.permite_combinar = True
 
+    def init(self):
+        super().init()
+        self.env.cr.execute(SQL(
+            "CREATE SEQUENCE IF NOT EXISTS %s", SQL.identifier(self.SECUENCIA_VERSION),
+        ))
+
     @api.model_create_multi
     def create(self, vals_list):
         for vals in vals_list:
             if vals.get('name', 'Nuevo') == 'Nuevo':
                 vals['name'] = self.env['ir.sequence'].next_by_code('secadora.posicion.arroz') or 'Nuevo'
-        return super().create(vals_list)
+        records = super().create(vals_list)
+        self._tablero_marcar(records)
+        return records
 
     def write(self, vals):
         # Detectar cambio de sitio_id (drag-and-drop en kanban)
@@ -252,7 +325,60 @@ class PosicionArroz(models.Model):
                         'notas': f'Movido de {old_sitio.name or "Sin ubicación"} a {self.env["secadora.sitio.muestra"].browse(new_sitio_id).name}',
                     })
             vals['fecha_movimiento'] = fields.Datetime.now()
-        return super().write(vals)
+        res = super().write(vals)
+        self._tablero_marcar(self)
+        return res
+
+    # ------------------------------------------------------------------
+    # Versión del tablero
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _tablero_version_transaccion(self):
+        """Versión del tablero de la transacción en curso.
+
+        Se toma de la secuencia la primera vez que la transacción marca algo;
+        al confirmar se publica una sola vez en el bus. Como la secuencia no
+        es transaccional, una transacción lenta puede confirmar una versión
+        menor que otra ya leída: por eso el aviso lleva la versión y el
+        cliente vuelve a pedir desde ella.
+        """
+        datos = self.env.cr.precommit.data
+        version = datos.get('secadora_tablero.version')
+        if version is None:
+            self.env.cr.execute(SQL("SELECT nextval(%s)", self.SECUENCIA_VERSION))
+            version = datos['secadora_tablero.version'] = self.env.cr.fetchone()[0]
+            self.env.cr.precommit.add(functools.partial(self._tablero_notificar, version))
+        return version
+
+    @api.model
+    def _tablero_notificar(self, version):
+        self.env['bus.bus']._sendone(self.CANAL_BUS, 'tablero/cambio', {'version': version})
+
+    @api.model
+    def _tablero_marcar(self, records):
+        """Marca registros del tablero (posiciones, sitios o pesajes) como cambiados.
+
+        Se escribe por SQL para no volver a pasar por write() ni tocar
+        write_date; los registros ya están creados en la base de datos.
+        """
+        if not records:
+            return
+        version = self._tablero_version_transaccion()
+        self.env.cr.execute(SQL(
+            "UPDATE %s SET tablero_version = %s WHERE id IN %s",
+            SQL.identifier(records._table), version, tuple(records.ids),
+        ))
+        records.invalidate_recordset(['tablero_version'])
+
+    @api.model
+    def _tablero_version_actual(self):
+        """Última versión entregada por la secuencia (0 si aún no se usó)."""
+        self.env.cr.execute(SQL(
+            "SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM %s",
+            SQL.identifier(self.SECUENCIA_VERSION),
+        ))
+        return self.env.cr.fetchone()[0]
 
     @api.model
     def _read_group_sitio_ids(self, sitios, domain):
@@ -297,93 +423,87 @@ class PosicionArroz(models.Model):
         }
 
     @api.model
-    def get_tablero_grid_data(self):
-        """Retorna datos para la vista de grilla 2D del tablero."""
-        sitios = self.env['secadora.sitio.muestra'].search(
-            [('es_contenedor', '=', True)],
-            order='fila, columna, sequence, id',
-        )
-        posiciones = self.search([('state', '=', 'activo')])
-
-        sitio_data = []
-        for s in sitios:
-            sitio_data.append({
-                'id': s.id,
-                'name': s.name,
-                'fila': s.fila,
-                'columna': s.columna,
-                'capacidad_kg': s.capacidad_kg,
-                'es_punto_salida': s.es_punto_salida,
-                'ocultar_calidad': s.ocultar_calidad,
-            })
-
-        modalidad_labels = dict(self.env['secadora.orden.servicio']._fields['modalidad_salida'].selection)
-
-        posicion_data = []
-        for p in posiciones:
-            posicion_data.append({
-                'id': p.id,
-                'name': p.name,
-                'sitio_id': p.sitio_id.id if p.sitio_id else False,
-                'pesaje_id': p.pesaje_id.id if p.pesaje_id else False,
-                'peso_kg': p.peso_kg,
-                'tercero': p.tercero_id.name if p.tercero_id else '',
-                'producto': p.producto_id.name if p.producto_id else '',
-                'variedad': p.variedad_id.name if p.variedad_id else '',
-                'pesaje_name': p.pesaje_name or '',
-                'placa_texto': p.placa_texto or '',
-                'conductor': p.conductor_id.name if p.conductor_id else '',
-                'tipo_operacion': p.tipo_operacion_id.name if p.tipo_operacion_id else '',
-                'modalidad_salida': modalidad_labels.get(p.modalidad_salida, '') if p.modalidad_salida else '',
-                'modalidad_salida_raw': p.modalidad_salida or '',
-                'es_division': p.es_division,
-                'es_division_hija': bool(p.posicion_origen_id),
-                'es_combinacion': p.es_comercial,
-                'es_preasignado': p.es_preasignado,
-                'es_semilla': p.es_semilla,
-                'permite_combinar': p.permite_combinar,
-                'humedad': p.humedad,
-                'impurezas': p.impurezas,
-            })
-
-        filas_set = set(s.fila for s in sitios) or {1}
-        columnas_set = set(s.columna for s in sitios) or {1}
-        # Siempre agregar una fila y columna extra para poder expandir
-        filas = sorted(filas_set) + [max(filas_set) + 1]
-        columnas = sorted(columnas_set) + [max(columnas_set) + 1]
-
+    def get_tablero_grid_data(self, desde_version=None):
+        """Retorna datos para la vista de grilla 2D del tablero.
+
+        Sin desde_version se devuelve el tablero completo. Con la versión que
+        el cliente ya tiene, sitios/posiciones/en_transito traen solo lo
+        marcado después de ella; los *_ids traen siempre todo lo vigente, en
+        orden, para que el cliente descarte lo que salió del tablero.
+        sitios/posiciones/en_transito van en columnas, ver
+        secadora.serializador.columnas.
+        """
+        # Leer la versión antes que los datos: lo que se confirme después
+        # queda con una versión mayor o llega avisado por el bus.
+        version = self._tablero_version_actual()
+        Sitio = self.env['secadora.sitio.muestra']
+        Pesaje = self.env['secadora.pesaje']
+
+        dominio_sitios = [('es_contenedor', '=', True)]
+        dominio_posiciones = [('state', '=', 'activo')]
         # Pesajes en tránsito (primera pesada completada, vehículo en camino)
         # Excluir los que ya tienen posición pre-asignada desde el tablero
-        pesajes_preasignados_ids = posiciones.filtered('es_preasignado').mapped('pesaje_id').ids
-        pesajes_transito = self.env['secadora.pesaje'].search([
+        pesajes_preasignados_ids = self.search(
+            dominio_posiciones + [('es_preasignado', '=', True)]
+        ).pesaje_id.ids
+        dominio_transito = [
             ('state', '=', 'en_transito'),
             ('direccion', '=', 'entrada'),
             ('id', 'not in', pesajes_preasignados_ids),
-        ], order='id asc')
-        en_transito_data = []
-        for pes in pesajes_transito:
-            en_transito_data.append({
-                'id': pes.id,
-                'tercero': pes.tercero_id.name if pes.tercero_id else '',
-                'producto': pes.producto_id.name if pes.producto_id else '',
-                'variedad': pes.variedad_id.name if pes.variedad_id else '',
-                'peso_bruto': pes.peso_bruto,
-                'placa_texto': pes.placa_texto or '',
-                'conductor': pes.conductor_id.name if pes.conductor_id else '',
-                'tipo_operacion': pes.tipo_operacion_id.name if pes.tipo_operacion_id else '',
-                'pesaje_name': pes.name or '',
-                'humedad': pes.humedad,
-                'impurezas': pes.impurezas,
-            })
+        ]
+
+        sitios = Sitio.search(dominio_sitios, order='fila, columna, sequence, id')
+        posiciones = self.search(dominio_posiciones)
+        pesajes_transito = Pesaje.search(dominio_transito, order='id asc')
+
+        completo = desde_version is None
+        if completo:
+            sitios_datos, posiciones_datos, transito_datos = sitios, posiciones, pesajes_transito
+        else:
+            cambios = [('tablero_version', '>', desde_version)]
+            sitios_datos = Sitio.search(dominio_sitios + cambios)
+            posiciones_datos = self.search(dominio_posiciones + cambios)
+            transito_datos = Pesaje.search(dominio_transito + cambios)
+
+        grilla = self.env['secadora.serializador.columnas']._serializar(
+            sitios, [('fila', 'fila'), ('columna', 'columna')],
+        )
+        filas_set = set(grilla['fila']) or {1}
+        columnas_set = set(grilla['columna']) or {1}
+        # Siempre agregar una fila y columna extra para poder expandir
+        filas = sorted(filas_set) + [max(filas_set) + 1]
+        columnas = sorted(columnas_set) + [max(columnas_set) + 1]
 
         return {
-            'sitios': sitio_data,
-            'posiciones': posicion_data,
+            'version': version,
+            'completo': completo,
+            'sitios': self._tablero_sitios_data(sitios_datos),
+            'posiciones': self._tablero_posiciones_data(posiciones_datos),
+            'en_transito': self._tablero_transito_data(transito_datos),
+            'sitio_ids': sitios.ids,
+            'posicion_ids': posiciones.ids,
+            'en_transito_ids': pesajes_transito.ids,
             'filas': filas,
             'columnas': columnas,
-            'en_transito': en_transito_data,
         }
 
+    @api.model
+    def _tablero_sitios_data(self, sitios):
+        return self.env['secadora.serializador.columnas']._serializar(sitios, CAMPOS_SITIO)
+
+    @api.model
+    def _tablero_posiciones_data(self, posiciones):
+        columnas = self.env['secadora.serializador.columnas']._serializar(posiciones, CAMPOS_POSICION)
+        modalidad_labels = dict(self.env['secadora.orden.servicio']._fields['modalidad_salida'].selection)
+        columnas['modalidad_salida'] = [
+            modalidad_labels.get(raw, '') for raw in columnas['modalidad_salida_raw']
+        ]
+        return columnas
+
+    @api.model
+    def _tablero_transito_data(self, pesajes):
+        return self.env['secadora.serializador.columnas']._serializar(pesajes, CAMPOS_TRANSITO)
+
     @api.model
     def preasignar_transito(self, pesaje_id, sitio_id):
         """Pre-asignar ubicación a un pesaje en tránsito desde el tablero."""
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields
+from odoo import models, fields, api
 
 
 class SitioMuestra(models.Model):
@@ -42,3 +42,20 @@ class SitioMuestra(models.Model):
         help='Si está marcado, las tarjetas en esta ubicación no muestran humedad ni impurezas. '
              'Útil para sitios post-secamiento donde esos datos ya no aplican.',
     )
+    tablero_version = fields.Integer(
+        string='Versión en Tablero',
+        readonly=True,
+        copy=False,
+        index=True,
+    )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['secadora.posicion.arroz']._tablero_marcar(records)
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env['secadora.posicion.arroz']._tablero_marcar(self)
+        return res
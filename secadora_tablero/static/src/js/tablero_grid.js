@@ -1,11 +1,17 @@
 /** @odoo-module **/
 
-import { Component, useState, onWillStart, onWillUnmount } from "@odoo/owl";
+import { Component, useState, onMounted, onWillStart, onWillUnmount } from "@odoo/owl";
 import { ConfirmationDialog } from "@web/core/confirmation_dialog/confirmation_dialog";
 import { registry } from "@web/core/registry";
 import { useService } from "@web/core/utils/hooks";
+import { filasDeColumnas } from "@bascula/js/columnas";
 import { MoverDialog } from "./mover_dialog";
 
+// Canal y tipo de notificación que publica secadora.posicion.arroz al
+// confirmar cualquier cambio del tablero (payload: {version}).
+const CANAL_TABLERO = "secadora_tablero";
+const NOTIFICACION_TABLERO = "tablero/cambio";
+
 class TableroGrid extends Component {
     static template = "secadora_tablero.TableroGrid";
     static props = ["*"];
@@ -14,6 +20,7 @@ class TableroGrid extends Component {
         this.orm = useService("orm");
         this.action = useService("action");
         this.dialog = useService("dialog");
+        this.busService = useService("bus_service");
         this.state = useState({
             sitios: [],
             posiciones: [],
@@ -28,16 +35,46 @@ class TableroGrid extends Component {
         // el componente ya se destruyó (p. ej. loadData disparado desde el
         // onClose de un wizard cuando el tablero ya no está montado).
         this._destruido = false;
-        onWillUnmount(() => {
-            this._destruido = true;
-        });
+
+        // Sincronización incremental: version es la última versión del
+        // tablero recibida (null = pedir todo). Un aviso del bus con una
+        // versión menor obliga a volver a pedir desde ella (una transacción
+        // lenta pudo confirmarse después de la última lectura).
+        this.version = null;
+        this._desdeAviso = null;
+        this._pendiente = false;
+        this._sincronizando = null;
+        this.onCambioTablero = (payload) => {
+            const desde = payload.version - 1;
+            this._desdeAviso = this._desdeAviso === null ? desde : Math.min(this._desdeAviso, desde);
+            this.loadData();
+        };
+        // Tras una desconexión se pudieron perder avisos: recargar todo.
+        this.onReconectado = () => this.loadData({ completo: true });
 
         onWillStart(async () => {
             await this.loadData();
         });
+
+        onMounted(() => {
+            this.busService.addChannel(CANAL_TABLERO);
+            this.busService.subscribe(NOTIFICACION_TABLERO, this.onCambioTablero);
+            this.busService.addEventListener("reconnect", this.onReconectado);
+        });
+
+        onWillUnmount(() => {
+            this._destruido = true;
+            this.busService.unsubscribe(NOTIFICACION_TABLERO, this.onCambioTablero);
+            this.busService.removeEventListener("reconnect", this.onReconectado);
+        });
     }
 
-    async loadData() {
+    /**
+     * Trae los cambios del tablero (o todo, con completo o en la primera
+     * carga). Las llamadas que llegan mientras hay una en curso se agrupan
+     * en una sola consulta más.
+     */
+    async loadData({ completo = false } = {}) {
         // Si el componente ya se destruyó, NO llamar al ORM: el orm de OWL
         // está ligado al ciclo de vida del componente y rechaza con
         // "Component is destroyed" al resolver la promesa. Esto pasa cuando
@@ -46,31 +83,104 @@ class TableroGrid extends Component {
         if (this._destruido) {
             return;
         }
-        this.state.loading = true;
-        let data;
-        try {
-            data = await this.orm.call(
-                "secadora.posicion.arroz",
-                "get_tablero_grid_data",
-                [],
-            );
-        } catch (e) {
-            // El propio orm.call rechaza si el componente murió durante la
-            // llamada. No es un error real: se ignora silenciosamente.
+        if (completo) {
+            this.version = null;
+        }
+        this._pendiente = true;
+        if (!this._sincronizando) {
+            this._sincronizando = this._sincronizar().finally(() => {
+                this._sincronizando = null;
+            });
+        }
+        await this._sincronizando;
+    }
+
+    async _sincronizar() {
+        while (this._pendiente && !this._destruido) {
+            this._pendiente = false;
+            let desde = this.version;
+            if (desde !== null && this._desdeAviso !== null) {
+                desde = Math.min(desde, this._desdeAviso);
+            }
+            this._desdeAviso = null;
+            if (desde === null) {
+                this.state.loading = true;
+            }
+            let data;
+            try {
+                data = await this.orm.call(
+                    "secadora.posicion.arroz",
+                    "get_tablero_grid_data",
+                    [],
+                    { desde_version: desde },
+                );
+            } catch (e) {
+                // El propio orm.call rechaza si el componente murió durante la
+                // llamada. No es un error real: se ignora silenciosamente.
+                if (this._destruido) {
+                    return;
+                }
+                throw e;
+            }
             if (this._destruido) {
                 return;
             }
-            throw e;
+            if (!this._aplicarDatos(data)) {
+                // Falta algo que nunca llegó: pedir el tablero completo.
+                this.version = null;
+                this._pendiente = true;
+                continue;
+            }
+            this.version = data.version;
+            this.state.loading = false;
         }
-        if (this._destruido) {
-            return;
+    }
+
+    _aplicarDatos(data) {
+        // El servidor envía los registros en columnas (ver
+        // secadora.serializador.columnas); la plantilla trabaja con objetos.
+        const nuevosSitios = filasDeColumnas(data.sitios);
+        const nuevasPosiciones = filasDeColumnas(data.posiciones);
+        const nuevosEnTransito = filasDeColumnas(data.en_transito);
+        if (data.completo) {
+            this.state.sitios = nuevosSitios;
+            this.state.posiciones = nuevasPosiciones;
+            this.state.en_transito = nuevosEnTransito;
+        } else {
+            const sitios = this._fusionar(this.state.sitios, nuevosSitios, data.sitio_ids);
+            const posiciones = this._fusionar(this.state.posiciones, nuevasPosiciones, data.posicion_ids);
+            const enTransito = this._fusionar(this.state.en_transito, nuevosEnTransito, data.en_transito_ids);
+            if (!sitios || !posiciones || !enTransito) {
+                return false;
+            }
+            this.state.sitios = sitios;
+            this.state.posiciones = posiciones;
+            this.state.en_transito = enTransito;
         }
-        this.state.sitios = data.sitios;
-        this.state.posiciones = data.posiciones;
         this.state.filas = data.filas;
         this.state.columnas = data.columnas;
-        this.state.en_transito = data.en_transito || [];
-        this.state.loading = false;
+        return true;
+    }
+
+    /**
+     * Aplica los registros cambiados sobre los actuales y deja solo los ids
+     * vigentes, en el orden del servidor. Devuelve null si un id vigente no
+     * está ni en los actuales ni en los cambiados.
+     */
+    _fusionar(actuales, cambiados, idsVigentes) {
+        const porId = new Map(actuales.map((r) => [r.id, r]));
+        for (const registro of cambiados) {
+            porId.set(registro.id, registro);
+        }
+        const resultado = [];
+        for (const id of idsVigentes) {
+            const registro = porId.get(id);
+            if (!registro) {
+                return null;
+            }
+            resultado.push(registro);
+        }
+        return resultado;
     }
 
     getSitioAt(fila, columna) {
@@ -510,7 +620,7 @@ class TableroGrid extends Component {
     }
 
     async onClickRefresh() {
-        await this.loadData();
+        await this.loadData({ completo: true });
     }
 }
 
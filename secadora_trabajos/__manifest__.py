@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+{
+    'name': 'Trabajos en Segundo Plano - Secadora La Gran Colombia',
+    'version': '18.0.1.0.0',
+    'category': 'Technical',
+    'summary': 'Cola de trabajos pesados con avance, resultados y aviso al terminar',
+    'description': """
+        Trabajos en Segundo Plano
+        ==========================
+
+        Funcionalidades:
+        - Cola de trabajos para operaciones pesadas de la suite (reportes,
+          liquidaciones, reprocesos) fuera del worker HTTP
+        - Ejecución desde crons: cada cron activo es un espacio en paralelo
+        - Avance y tiempo estimado por trabajo
+        - Resultados como adjuntos o registros creados
+        - Notificación al usuario al terminar o fallar
+    """,
+    'author': 'Secadora La Gran Colombia S.A.S',
+    'depends': ['base', 'mail', 'bus'],
+    'data': [
+        'security/security.xml',
+        'security/ir.model.access.csv',
+        'data/trabajo_cron.xml',
+        'views/trabajo_views.xml',
+    ],
+    'installable': True,
+    'auto_install': False,
+    'license': 'LGPL-3',
+}
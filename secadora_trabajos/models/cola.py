@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+import zlib
+
+from odoo import models, api
+from odoo.tools import SQL
+
+
+class ColaMixin(models.AbstractModel):
+    """Cola de registros que procesan varios crons en paralelo.
+
+    Mecánica común de los trabajos en segundo plano (secadora.trabajo) y de
+    la ingesta de facturas por correo:
+    - cada cron que llama a _cola_metodo_cron es un espacio: procesa un
+      registro a la vez, así que N crons son N registros en paralelo;
+      _disparar_cola los despierta;
+    - _tomar_de_cola marca el siguiente registro en proceso con FOR UPDATE
+      SKIP LOCKED (dos espacios nunca toman el mismo), toma un advisory lock
+      de sesión sobre él y confirma. El lock dura mientras el espacio lo
+      procesa (_soltar_de_cola) y PostgreSQL lo suelta solo si el proceso
+      muere;
+    - _huerfanos son los registros en proceso cuyo lock nadie tiene: el
+      espacio que los tomó murió (límite de CPU o memoria, reinicio). Qué
+      hacer con ellos lo decide cada modelo.
+    El modelo debe tener un campo state y el campo _cola_campo_inicio.
+    """
+    _name = 'secadora.cola.mixin'
+    _description = 'Cola Procesada por Crons en Paralelo'
+
+    # Método que llaman los crons de los espacios (model.<método>())
+    _cola_metodo_cron = None
+    _cola_estado_espera = 'en_cola'
+    _cola_estado_proceso = 'en_proceso'
+    # Datetime que se marca al tomar el registro
+    _cola_campo_inicio = 'fecha_inicio'
+
+    @api.model
+    def _clave_bloqueo(self):
+        """Primera clave de los advisory locks del modelo (la segunda es el id)."""
+        return zlib.crc32(self._table.encode()) & 0x7FFFFFFF
+
+    @api.model
+    def _crons_cola(self):
+        return self.env['ir.cron'].sudo().search([
+            ('model_id.model', '=', self._name),
+            ('code', '=', f'model.{self._cola_metodo_cron}()'),
+        ])
+
+    @api.model
+    def _disparar_cola(self, at=None):
+        """Despierta todos los espacios al confirmarse la transacción."""
+        for cron in self._crons_cola():
+            cron._trigger(at=at)
+
+    @api.model
+    def _procesar_cola(self, metodo, limite=None, **toma):
+        """Toma registros de la cola y llama a registro.metodo() con cada
+        uno, hasta vaciarla o llegar a limite. metodo confirma su propio
+        resultado. toma se pasa a _tomar_de_cola. Devuelve cuántos procesó.
+        """
+        hechos = 0
+        while limite is None or hechos < limite:
+            rec = self._tomar_de_cola(**toma)
+            if not rec:
+                break
+            try:
+                getattr(rec, metodo)()
+            finally:
+                rec._soltar_de_cola()
+            hechos += 1
+        return hechos
+
+    @api.model
+    def _tomar_de_cola(self, condicion=None, orden=None, asignar=None):
+        """Marca en proceso el siguiente registro en espera, lo bloquea y
+        confirma. Devuelve el registro, o un recordset vacío si no hay.
+
+        condicion (SQL): filtro adicional de los registros en espera.
+        orden (SQL): orden de la cola, por defecto el id.
+        asignar (SQL): asignaciones adicionales al tomarlo.
+        """
+        cr = self.env.cr
+        cr.execute(SQL(
+            """
+            UPDATE %(tabla)s
+               SET state = %(proceso)s, %(inicio)s = (now() AT TIME ZONE 'UTC')%(asignar)s
+             WHERE id = (
+                    SELECT id FROM %(tabla)s
+                     WHERE state = %(espera)s AND %(condicion)s
+                     ORDER BY %(orden)s
+                       FOR UPDATE SKIP LOCKED
+                     LIMIT 1)
+         RETURNING id
+            """,
+            tabla=SQL.identifier(self._table),
+            proceso=self._cola_estado_proceso,
+            inicio=SQL.identifier(self._cola_campo_inicio),
+            asignar=SQL(', %s', asignar) if asignar else SQL(),
+            espera=self._cola_estado_espera,
+            condicion=condicion or SQL('TRUE'),
+            orden=orden or SQL('id'),
+        ))
+        fila = cr.fetchone()
+        if fila:
+            # Antes de confirmar: nadie lo ve en proceso sin su lock
+            cr.execute("SELECT pg_advisory_lock(%s, %s)", (self._clave_bloqueo(), fila[0]))
+        # Confirmar la toma: los otros espacios ya no lo ven en espera
+        cr.commit()
+        if not fila:
+            return self.browse()
+        rec = self.browse(fila[0])
+        rec.invalidate_recordset()
+        return rec
+
+    def _soltar_de_cola(self):
+        self.ensure_one()
+        self.env.cr.execute("SELECT pg_advisory_unlock(%s, %s)", (self._clave_bloqueo(), self.id))
+
+    def _sin_espacio(self):
+        """Los registros que ningún espacio está procesando (nadie tiene su
+        lock). Los locks se toman a nivel de transacción, así dos barridos
+        simultáneos no reclaman el mismo registro."""
+        if not self:
+            return self
+        self.env.cr.execute(
+            "SELECT id FROM unnest(%s::int[]) AS id WHERE pg_try_advisory_xact_lock(%s, id)",
+            (self.ids, self._clave_bloqueo()),
+        )
+        return self.browse([fila[0] for fila in self.env.cr.fetchall()])
+
+    @api.model
+    def _huerfanos(self):
+        """Registros en proceso cuyo espacio murió."""
+        return self.search([('state', '=', self._cola_estado_proceso)])._sin_espacio()
@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+# Último avance escrito por trabajo (en este proceso), para no escribir en
+# la base de datos en cada iteración del trabajo.
+_ULTIMO_AVANCE = {}
+# Segundos mínimos entre dos escrituras de avance del mismo trabajo
+INTERVALO_AVANCE = 1.0
+
+
+class SecadoraTrabajo(models.Model):
+    """Trabajo pesado que corre fuera del worker HTTP.
+
+    Un trabajo es la llamada diferida registros.metodo(*args, **kwargs) con
+    el usuario y la empresa de quien lo encoló. Lo ejecutan los crons que
+    llaman a _cron_ejecutar(): cada cron activo es un espacio y toma un
+    trabajo a la vez, así que N crons son N trabajos en paralelo (ver
+    secadora.cola.mixin). Se encola con _encolar(); dentro del trabajo,
+    _reportar_avance() publica el avance y _adjuntar() guarda archivos de
+    resultado. Al terminar o fallar se avisa al usuario por el bus.
+    """
+    _name = 'secadora.trabajo'
+    _description = 'Trabajo en Segundo Plano'
+    _inherit = ['secadora.cola.mixin']
+    _order = 'id desc'
+
+    _cola_metodo_cron = '_cron_ejecutar'
+
+    name = fields.Char(
+        string='Trabajo',
+        required=True,
+        readonly=True,
+    )
+    state = fields.Selection([
+        ('en_cola', 'En Cola'),
+        ('en_proceso', 'En Proceso'),
+        ('terminado', 'Terminado'),
+        ('error', 'Error'),
+        ('cancelado', 'Cancelado'),
+    ], string='Estado', default='en_cola', required=True, readonly=True, index=True)
+    usuario_id = fields.Many2one(
+        'res.users',
+        string='Usuario',
+        required=True,
+        readonly=True,
+        index=True,
+        default=lambda self: self.env.user,
+    )
+    company_id = fields.Many2one(
+        'res.company',
+        string='Empresa',
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.company,
+    )
+    prioridad = fields.Integer(
+        string='Prioridad',
+        default=10,
+        readonly=True,
+        help='Menor número, se ejecuta antes',
+    )
+
+    # Llamada diferida
+    modelo = fields.Char(string='Modelo', required=True, readonly=True)
+    metodo = fields.Char(string='Método', required=True, readonly=True)
+    registro_ids = fields.Json(string='Registros', readonly=True)
+    argumentos = fields.Json(string='Argumentos', readonly=True)
+
+    # Avance
+    progreso = fields.Float(string='Avance (%)', readonly=True, digits=(5, 1))
+    avance_mensaje = fields.Char(string='Detalle del Avance', readonly=True)
+    fecha_inicio = fields.Datetime(string='Inicio', readonly=True)
+    fecha_fin = fields.Datetime(string='Fin', readonly=True)
+    eta = fields.Datetime(
+        string='Fin Estimado',
+        compute='_compute_tiempos',
+    )
+    duracion = fields.Float(
+        string='Duración (h)',
+        compute='_compute_tiempos',
+    )
+
+    # Resultado
+    resultado = fields.Text(string='Resultado', readonly=True)
+    resultado_modelo = fields.Char(string='Modelo del Resultado', readonly=True)
+    resultado_ids = fields.Json(string='Registros del Resultado', readonly=True)
+    adjunto_ids = fields.Many2many(
+        'ir.attachment',
+        string='Archivos',
+        compute='_compute_adjunto_ids',
+    )
+    error = fields.Text(string='Error', readonly=True)
+
+    @api.depends('state', 'progreso', 'fecha_inicio', 'fecha_fin')
+    def _compute_tiempos(self):
+        ahora = fields.Datetime.now()
+        for rec in self:
+            rec.eta = False
+            rec.duracion = 0.0
+            if not rec.fecha_inicio:
+                continue
+            transcurrido = (rec.fecha_fin or ahora) - rec.fecha_inicio
+            rec.duracion = transcurrido.total_seconds() / 3600.0
+            if rec.state == 'en_proceso' and 0 < rec.progreso < 100:
+                restante = transcurrido.total_seconds() * (100 - rec.progreso) / rec.progreso
+                rec.eta = ahora + timedelta(seconds=restante)
+
+    def _compute_adjunto_ids(self):
+        adjuntos = self.env['ir.attachment'].search([
+            ('res_model', '=', self._name),
+            ('res_id', 'in', self.ids),
+        ])
+        for rec in self:
+            rec.adjunto_ids = adjuntos.filtered(lambda a: a.res_id == rec.id)
+
+    # ==================== ENCOLAR ====================
+
+    @api.model
+    def _metodos_encolables(self):
+        """Métodos que se pueden ejecutar como trabajo, por modelo.
+
+        Lista explícita: el trabajo guarda modelo y método como texto y el
+        runner los llama con el usuario que lo encoló, así que solo se
+        ejecuta lo que aquí aparece. Cada módulo que encola trabajos agrega
+        sus métodos heredando este método: {modelo: {metodo, ...}}.
+        """
+        return {}
+
+    @api.model
+    def _verificar_encolable(self, modelo, metodo):
+        if metodo not in self._metodos_encolables().get(modelo, ()):
+            raise UserError(f'{modelo}.{metodo} no está permitido como trabajo en segundo plano.')
+
+    @api.model
+    def _encolar(self, registros, metodo, *args, nombre=None, prioridad=10, **kwargs):
+        """Encola registros.metodo(*args, **kwargs) y dispara los crons.
+
+        args y kwargs se guardan como JSON: deben ser valores simples (ids,
+        textos, números; las fechas como texto). El método corre con el
+        usuario y la empresa actuales y puede devolver:
+        - ir.attachment (p. ej. de _adjuntar): quedan como archivos del trabajo
+        - otro recordset: se ofrece abrirlo desde el trabajo
+        - un texto: se guarda como resultado
+        """
+        if not hasattr(registros, metodo):
+            raise UserError(f'{registros._name} no tiene el método {metodo}.')
+        self._verificar_encolable(registros._name, metodo)
+        trabajo = self.sudo().create({
+            'name': nombre or f'{registros._description}: {metodo}',
+            'usuario_id': self.env.uid,
+            'company_id': self.env.company.id,
+            'prioridad': prioridad,
+            'modelo': registros._name,
+            'metodo': metodo,
+            'registro_ids': registros.ids,
+            'argumentos': {'args': list(args), 'kwargs': kwargs},
+        })
+        self._disparar_cola()
+        return trabajo.sudo(False)
+
+    @api.model
+    def _accion_encolado(self, trabajo):
+        """Acción de cliente que avisa que el trabajo quedó en cola."""
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Trabajo en segundo plano',
+                'message': f'"{trabajo.name}" quedó en cola. Se le avisará al terminar; '
+                           'el avance se ve en Trabajos.',
+                'type': 'info',
+                'next': {'type': 'ir.actions.act_window_close'},
+            },
+        }
+
+    # ==================== DENTRO DEL TRABAJO ====================
+
+    @api.model
+    def _trabajo_actual(self):
+        """Id del trabajo que se está ejecutando, o None fuera de un trabajo."""
+        return self.env.context.get('secadora_trabajo_id')
+
+    @api.model
+    def _reportar_avance(self, hechos, total, mensaje=None):
+        """Publica el avance del trabajo en curso (no hace nada fuera de uno).
+
+        Se escribe con un cursor aparte, que confirma enseguida: la
+        transacción del trabajo no se confirma hasta el final y el usuario
+        debe ver el avance mientras tanto. Como mucho una escritura por
+        segundo por trabajo.
+        """
+        trabajo_id = self._trabajo_actual()
+        if not trabajo_id or not total:
+            return
+        ahora = time.monotonic()
+        if hechos < total and ahora - _ULTIMO_AVANCE.get(trabajo_id, 0.0) < INTERVALO_AVANCE:
+            return
+        _ULTIMO_AVANCE[trabajo_id] = ahora
+        progreso = min(100.0, 100.0 * hechos / total)
+        with self.env.registry.cursor() as cr:
+            cr.execute(
+                "UPDATE secadora_trabajo SET progreso = %s, avance_mensaje = %s WHERE id = %s",
+                (progreso, mensaje or f'{hechos} de {total}', trabajo_id),
+            )
+
+    @api.model
+    def _adjuntar(self, nombre, contenido, mimetype=None):
+        """Guarda un archivo de resultado del trabajo en curso.
+
+        Fuera de un trabajo el adjunto queda sin vincular; el llamador
+        decide qué hacer con él.
+        """
+        return self.env['ir.attachment'].sudo().create({
+            'name': nombre,
+            'raw': contenido,
+            'mimetype': mimetype,
+            'res_model': self._name if self._trabajo_actual() else False,
+            'res_id': self._trabajo_actual() or False,
+        })
+
+    # ==================== EJECUCIÓN ====================
+
+    @api.model
+    def _cron_ejecutar(self):
+        """Ejecuta el siguiente trabajo en cola, si hay.
+
+        Antes marca con error los trabajos cuyo espacio murió. Si quedan
+        trabajos, _notify_progress hace que el cron vuelva a correr enseguida.
+        """
+        self._liberar_atascados()
+        hechos = self._procesar_cola(
+            '_correr', limite=1,
+            orden=SQL('prioridad, id'),
+            asignar=SQL('progreso = 0, avance_mensaje = NULL, fecha_fin = NULL, error = NULL'),
+        )
+        if not hechos:
+            return
+        pendientes = self.search_count([('state', '=', 'en_cola')])
+        self.env['ir.cron']._notify_progress(done=hechos, remaining=pendientes)
+
+    def _correr(self):
+        """Ejecuta el trabajo tomado y confirma su desenlace."""
+        self.ensure_one()
+        cr = self.env.cr
+        _logger.info('Trabajo %s (%s) iniciado', self.id, self.name)
+        try:
+            resultado = self._ejecutar()
+            vals = self._vals_resultado(resultado)
+            # La transacción del trabajo se confirma antes de tocar su fila:
+            # _reportar_avance la actualizó desde otros cursores.
+            cr.commit()
+        except Exception:
+            cr.rollback()
+            _logger.exception('Trabajo %s (%s) falló', self.id, self.name)
+            self.write({
+                'state': 'error',
+                'error': traceback.format_exc(),
+                'fecha_fin': fields.Datetime.now(),
+            })
+        else:
+            self.write(dict(
+                vals,
+                state='terminado',
+                progreso=100.0,
+                fecha_fin=fields.Datetime.now(),
+            ))
+            _logger.info('Trabajo %s (%s) terminado', self.id, self.name)
+        _ULTIMO_AVANCE.pop(self.id, None)
+        self._avisar()
+        cr.commit()
+
+    @api.model
+    def _liberar_atascados(self):
+        """Marca con error los trabajos en proceso cuyo espacio murió
+        (límite de CPU o memoria, reinicio): ningún proceso tiene su lock.
+        Un trabajo largo pero vivo no se toca.
+
+        No se vuelven a encolar solos: un trabajo que tumbó al worker lo
+        tumbaría de nuevo. El usuario recibe el aviso y puede reintentarlo.
+        """
+        atascados = self._huerfanos()
+        if atascados:
+            _logger.warning('Trabajos %s atascados en proceso: marcados con error', atascados.ids)
+            atascados.write({
+                'state': 'error',
+                'fecha_fin': fields.Datetime.now(),
+                'error': 'El proceso que ejecutaba el trabajo se interrumpió (límite de '
+                         'tiempo o memoria, reinicio del servidor). Puede reintentarlo.',
+            })
+            for trabajo in atascados:
+                _ULTIMO_AVANCE.pop(trabajo.id, None)
+            atascados._avisar()
+        return atascados
+
+    def _ejecutar(self):
+        """Llama al método del trabajo como el usuario y la empresa que lo encolaron."""
+        self.ensure_one()
+        # Se verifica de nuevo: la fila pudo cambiar desde que se encoló
+        self._verificar_encolable(self.modelo, self.metodo)
+        registros = self.env[self.modelo].with_user(self.usuario_id).with_company(
+            self.company_id
+        ).with_context(secadora_trabajo_id=self.id).browse(self.registro_ids or [])
+        argumentos = self.argumentos or {}
+        return getattr(registros, self.metodo)(
+            *argumentos.get('args', []), **argumentos.get('kwargs', {})
+        )
+
+    def _vals_resultado(self, resultado):
+        """Valores del trabajo según lo que devolvió el método."""
+        self.ensure_one()
+        if isinstance(resultado, models.BaseModel):
+            if resultado._name == 'ir.attachment':
+                resultado.sudo().write({'res_model': self._name, 'res_id': self.id})
+                return {'resultado': f'{len(resultado)} archivo(s) generado(s).'}
+            return {
+                'resultado': f'{len(resultado)} registro(s) de {resultado._description}.',
+                'resultado_modelo': resultado._name,
+                'resultado_ids': resultado.ids,
+            }
+        if isinstance(resultado, str):
+            return {'resultado': resultado}
+        return {}
+
+    def _avisar(self):
+        """Notificación al usuario con el desenlace del trabajo."""
+        for rec in self:
+            if rec.state == 'terminado':
+                mensaje = f'"{rec.name}" terminó. {rec.resultado or ""}'.strip()
+                tipo = 'success'
+            else:
+                mensaje = f'"{rec.name}" falló. Vea el detalle en Trabajos.'
+                tipo = 'danger'
+            self.env['bus.bus']._sendone(rec.usuario_id.partner_id, 'simple_notification', {
+                'title': 'Trabajo en segundo plano',
+                'message': mensaje,
+                'type': tipo,
+                'sticky': True,
+            })
+
+    # ==================== ACCIONES ====================
+
+    def action_cancelar(self):
+        en_cola = self.filtered(lambda t: t.state == 'en_cola')
+        if en_cola != self:
+            raise UserError('Solo se pueden cancelar trabajos en cola.')
+        self.sudo().write({'state': 'cancelado'})
+
+    def action_reintentar(self):
+        if self.filtered(lambda t: t.state != 'error'):
+            raise UserError('Solo se pueden reintentar trabajos con error.')
+        if self.sudo()._sin_espacio() != self.sudo():
+            raise UserError('El trabajo todavía se está ejecutando; espere a que termine.')
+        self.sudo().write({'state': 'en_cola', 'progreso': 0.0, 'avance_mensaje': False})
+        self._disparar_cola()
+
+    def action_ver_resultado(self):
+        self.ensure_one()
+        if not self.resultado_modelo or not self.resultado_ids:
+            raise UserError('Este trabajo no generó registros.')
+        return {
+            'type': 'ir.actions.act_window',
+            'name': self.name,
+            'res_model': self.resultado_modelo,
+            'view_mode': 'list,form',
+            'domain': [('id', 'in', self.resultado_ids)],
+            'target': 'current',
+        }
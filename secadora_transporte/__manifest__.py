@@ -15,7 +15,7 @@
         - Soporte cross-company (flete visible desde empresa origen y destino)
     """,
     'author': 'Secadora La Gran Colombia S.A.S',
-    'depends': ['bascula', 'mail', 'account', 'custom_webviewlink'],
+    'depends': ['bascula', 'mail', 'account', 'custom_webviewlink', 'secadora_trabajos'],
     'data': [
         'security/security.xml',
         'security/ir.model.access.csv',
@@ -9,3 +9,4 @@ from . import tarifa_flete
 from . import transportadora
 from . import partner
 from . import res_config_settings
+from . import trabajo
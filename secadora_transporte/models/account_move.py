@@ -33,7 +33,12 @@ class AccountMove(models.Model):
         de vista deben ser literales) — mantenerlos sincronizados.
         """
         self.ensure_one()
-        return self.state == 'posted' and self.payment_state in ('not_paid', 'partial')
+        return self._es_por_pagar_valores(self.state, self.payment_state)
+
+    @api.model
+    def _es_por_pagar_valores(self, state, payment_state):
+        """es_por_pagar sobre valores ya leídos (el tablero lee por SQL)."""
+        return state == 'posted' and payment_state in ('not_paid', 'partial')
 
     def fletes_activos(self):
         """Fletes no cancelados de la factura (para el reporte de giro).
@@ -59,3 +64,13 @@ class AccountMove(models.Model):
             'view_mode': 'list,form',
             'domain': [('factura_transportadora_id', '=', self.id)],
         }
+
+    def _trabajo_pdf_viajes_por_pagar(self):
+        """Genera el PDF 'Viajes Facturados por Pagar' de estas facturas como
+        adjunto (para correrlo como trabajo en segundo plano)."""
+        pdf, _tipo = self.env['ir.actions.report']._render_qweb_pdf(
+            'secadora_transporte.action_report_viajes_por_pagar', res_ids=self.ids,
+        )
+        return self.env['secadora.trabajo']._adjuntar(
+            'Viajes por Pagar.pdf', pdf, 'application/pdf',
+        )
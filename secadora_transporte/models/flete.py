@@ -1,10 +1,32 @@
 # -*- coding: utf-8 -*-
 
-from collections import Counter, defaultdict
+from collections import defaultdict
 
 from odoo import models, fields, api
 from odoo.exceptions import UserError
 
+# Columnas del detalle de facturas del tablero (ver secadora.serializador.columnas)
+CAMPOS_FACTURA_TABLERO = [
+    ('id', 'id'),
+    ('name', 'name'),
+    ('ref', 'ref'),
+    ('fecha', 'invoice_date'),
+    ('estado', 'state'),
+    ('estado_pago_raw', 'payment_state'),
+    ('total', 'amount_total'),
+    ('saldo', 'amount_residual'),
+]
+CAMPOS_TRANSPORTADORA_TABLERO = [
+    ('id', 'id'),
+    ('name', 'name'),
+    ('nit', 'nit'),
+]
+# Claves del detalle de facturas de cada transportadora
+CLAVES_DETALLE_FACTURA = (
+    'name', 'ref', 'fecha', 'estado',
+    'estado_pago', 'estado_pago_raw', 'total', 'saldo',
+)
+
 
 class SecadoraFlete(models.Model):
     _name = 'secadora.flete'
@@ -545,52 +567,24 @@ class SecadoraFlete(models.Model):
 
         A nivel placa las cifras se expresan en valor de flete (costo_total);
         el saldo por pagar es contable y solo existe a nivel transportadora
-        y totales.
+        y totales. El detalle de facturas de cada transportadora se pide
+        aparte, al expandirla (get_tablero_transporte_facturas).
+
+        Los agregados se calculan en la base de datos con _read_group sobre
+        (transportadora, placa, estado y estado de pago de la factura): los
+        related almacenados factura_estado/factura_estado_pago dejan todo en
+        la tabla de fletes, sin cargar un registro por viaje.
 
         Alcance: compañías activas de la sesión — las mismas que verá el
         usuario al abrir listas desde el tablero, para que los conteos del
         tablero y el drill-down coincidan.
         """
         filtros = filtros or {}
-        fletes = self.search(self._domain_tablero(filtros))
-
-        # sudo acotado: solo se leen facturas ya referenciadas por fletes a
-        # los que el usuario tiene acceso, para que usuarios de transporte
-        # sin permisos contables vean estado y saldo.
-        facturas = fletes.mapped('factura_transportadora_id').sudo()
-        etiquetas_pago = dict(
-            self.env['account.move']._fields['payment_state']
-            ._description_selection(self.env)
-        )
-        info_facturas = {}
-        for f in facturas:
-            if f.state == 'posted':
-                etiqueta = etiquetas_pago.get(f.payment_state, f.payment_state or '')
-            elif f.state == 'cancel':
-                etiqueta = 'Cancelada'
-            else:
-                etiqueta = 'Borrador'
-            info_facturas[f.id] = {
-                'name': f.name,
-                'ref': f.ref or '',
-                'fecha': str(f.invoice_date) if f.invoice_date else '',
-                'estado': f.state,
-                'estado_pago_raw': f.payment_state or 'not_paid',
-                'estado_pago': etiqueta,
-                'total': f.amount_total,
-                'saldo': f.amount_residual if f.state == 'posted' else 0.0,
-                'por_pagar': f.es_por_pagar(),
-                'pagada': f.state == 'posted'
-                and f.payment_state in ('paid', 'in_payment'),
-            }
-
-        def _info(flete):
-            return info_facturas.get(flete.factura_transportadora_id.id)
+        domain = self._domain_tablero(filtros)
 
-        def _stats(grupo):
-            """Agregados de una lista de fletes, en valor de flete."""
-            stats = {
-                'viajes': len(grupo),
+        def _stats():
+            return {
+                'viajes': 0,
                 'valor_fletes': 0.0,
                 'viajes_facturados': 0,
                 'valor_facturado': 0.0,
@@ -600,100 +594,106 @@ class SecadoraFlete(models.Model):
                 'valor_sin_facturar': 0.0,
                 'viajes_factura_borrador': 0,
             }
-            for x in grupo:
-                info = _info(x)
-                stats['valor_fletes'] += x.costo_total
-                if info and info['estado'] == 'posted':
-                    stats['viajes_facturados'] += 1
-                    stats['valor_facturado'] += x.costo_total
-                    if info['pagada']:
-                        stats['viajes_pagados'] += 1
-                        stats['valor_pagado'] += x.costo_total
-                elif info and info['estado'] == 'draft':
-                    stats['viajes_factura_borrador'] += 1
-                else:
-                    # Sin factura, o con factura cancelada (que en la práctica
-                    # significa que hay que volver a facturar el viaje).
-                    stats['viajes_sin_facturar'] += 1
-                    stats['valor_sin_facturar'] += x.costo_total
-            return stats
 
-        def _bloque(grupo):
-            """Bloque completo de una transportadora (o del grupo sin
-            transportadora): stats + desglose por placa + facturas."""
-            stats = _stats(grupo)
-
-            por_placa = defaultdict(list)
-            for x in grupo:
-                por_placa[x.placa_texto or ''].append(x)
+        def _acumular(stats, estado, estado_pago, viajes, valor):
+            """Suma un grupo de fletes a los agregados, en valor de flete."""
+            stats['viajes'] += viajes
+            stats['valor_fletes'] += valor
+            if estado == 'posted':
+                stats['viajes_facturados'] += viajes
+                stats['valor_facturado'] += valor
+                if estado_pago in ('paid', 'in_payment'):
+                    stats['viajes_pagados'] += viajes
+                    stats['valor_pagado'] += valor
+            elif estado == 'draft':
+                stats['viajes_factura_borrador'] += viajes
+            else:
+                # Sin factura, o con factura cancelada (que en la práctica
+                # significa que hay que volver a facturar el viaje).
+                stats['viajes_sin_facturar'] += viajes
+                stats['valor_sin_facturar'] += valor
+
+        # Los fletes sin transportadora entran como un grupo más con id 0.
+        totales = _stats()
+        por_transportadora = defaultdict(_stats)
+        por_placa = defaultdict(lambda: defaultdict(_stats))
+        grupos = self._read_group(
+            domain,
+            ['transportadora_id', 'placa_texto', 'factura_estado', 'factura_estado_pago'],
+            ['__count', 'costo_total:sum'],
+        )
+        for transportadora, placa, estado, estado_pago, viajes, valor in grupos:
+            tid = transportadora.id or 0
+            for stats in (totales, por_transportadora[tid], por_placa[tid][placa or '']):
+                _acumular(stats, estado, estado_pago, viajes, valor or 0.0)
+
+        # Saldo por pagar: facturas distintas por pagar de cada
+        # transportadora. Mismo predicado que account.move.es_por_pagar.
+        pares = self._read_group(
+            domain + [
+                ('factura_estado', '=', 'posted'),
+                ('factura_estado_pago', 'in', ('not_paid', 'partial')),
+            ],
+            ['transportadora_id', 'factura_transportadora_id'],
+        )
+        # sudo acotado: solo se leen facturas ya referenciadas por fletes a
+        # los que el usuario tiene acceso, para que usuarios de transporte
+        # sin permisos contables vean el saldo.
+        Serializador = self.env['secadora.serializador.columnas']
+        saldos = Serializador._serializar(
+            self.env['account.move'].sudo().browse({factura.id for _t, factura in pares}),
+            [('id', 'id'), ('saldo', 'amount_residual')],
+        )
+        saldo_factura = dict(zip(saldos['id'], saldos['saldo']))
+        facturas_transportadora = defaultdict(set)
+        for transportadora, factura in pares:
+            facturas_transportadora[transportadora.id or 0].add(factura.id)
+
+        def _por_pagar(stats, factura_ids):
+            stats['saldo_por_pagar'] = sum((saldo_factura[fid] for fid in factura_ids), 0.0)
+            stats['facturas_por_pagar'] = len(factura_ids)
+
+        def _bloque(tid):
+            """Bloque de una transportadora (o del grupo sin transportadora):
+            stats + desglose por placa + saldo por pagar."""
+            stats = por_transportadora[tid]
             stats['placas'] = [
-                {'placa': placa or '(sin placa)', **_stats(sub)}
-                for placa, sub in sorted(por_placa.items())
+                {'placa': placa or '(sin placa)', **sub}
+                for placa, sub in sorted(por_placa[tid].items())
             ]
-
-            conteo_fletes = Counter(
-                x.factura_transportadora_id.id for x in grupo
-                if x.factura_transportadora_id
-            )
-            detalle_facturas = []
-            saldo_por_pagar = 0.0
-            facturas_por_pagar = 0
-            for factura_id, num_fletes in conteo_fletes.items():
-                info = info_facturas[factura_id]
-                if info['por_pagar']:
-                    saldo_por_pagar += info['saldo']
-                    facturas_por_pagar += 1
-                detalle_facturas.append({
-                    'id': factura_id,
-                    'num_fletes': num_fletes,
-                    **{k: info[k] for k in (
-                        'name', 'ref', 'fecha', 'estado',
-                        'estado_pago', 'estado_pago_raw', 'total', 'saldo',
-                    )},
-                })
-            detalle_facturas.sort(key=lambda d: d['fecha'], reverse=True)
-            stats['facturas'] = detalle_facturas
-            stats['saldo_por_pagar'] = saldo_por_pagar
-            stats['facturas_por_pagar'] = facturas_por_pagar
+            _por_pagar(stats, facturas_transportadora[tid])
             return stats
 
-        # Agrupar por transportadora en una sola pasada. Los fletes sin
-        # transportadora entran como un grupo más con id 0.
-        por_transportadora = defaultdict(list)
-        for x in fletes:
-            por_transportadora[x.transportadora_id.id or 0].append(x)
-
         # sudo acotado también aquí: las ACL de secadora.transportadora
         # viven en bascula (grupo basculero) y un usuario de solo transporte
         # no puede leer el catálogo, pero sí debe ver nombre y NIT de las
         # transportadoras de sus propios fletes.
+        datos_transportadoras = Serializador._serializar(
+            self.env['secadora.transportadora'].sudo().browse(
+                [tid for tid in por_transportadora if tid]
+            ),
+            CAMPOS_TRANSPORTADORA_TABLERO,
+        )
         catalogo = {
-            t.id: t for t in fletes.mapped('transportadora_id').sudo()
+            tid: {'id': tid, 'name': name, 'nit': nit}
+            for tid, name, nit in zip(*datos_transportadoras.values())
         }
         transportadoras = []
-        orden = sorted(
-            (tid for tid in por_transportadora if tid),
-            key=lambda tid: catalogo[tid].name or '',
-        )
+        orden = sorted(catalogo, key=lambda tid: catalogo[tid]['name'])
         for tid in orden:
             transportadoras.append({
-                'id': tid,
-                'name': catalogo[tid].name,
-                'nit': catalogo[tid].nit or '',
-                **_bloque(por_transportadora[tid]),
+                **catalogo[tid],
+                **_bloque(tid),
             })
         if 0 in por_transportadora:
             transportadoras.append({
                 'id': 0,
                 'name': 'Sin transportadora asignada',
                 'nit': '',
-                **_bloque(por_transportadora[0]),
+                **_bloque(0),
             })
 
-        totales = _bloque(list(fletes))
-        # El detalle por placa/factura no se muestra a nivel global.
-        totales.pop('placas')
-        totales.pop('facturas')
+        _por_pagar(totales, {factura.id for _t, factura in pares})
 
         return {
             'transportadoras': transportadoras,
@@ -713,3 +713,51 @@ class SecadoraFlete(models.Model):
                 ],
             },
         }
+
+    @api.model
+    def get_tablero_transporte_facturas(self, filtros=None, transportadora_id=0):
+        """Detalle de facturas de una transportadora del tablero (0 = sin
+        transportadora), en columnas, de la más reciente a la más antigua.
+
+        Se pide al expandir la tarjeta: el resumen del tablero no lo trae.
+        """
+        domain = self._domain_tablero(filtros or {}) + [
+            ('transportadora_id', '=', transportadora_id or False),
+            ('factura_transportadora_id', '!=', False),
+        ]
+        num_fletes = {
+            factura.id: viajes
+            for factura, viajes in self._read_group(
+                domain, ['factura_transportadora_id'], ['__count'],
+            )
+        }
+        # sudo acotado: facturas referenciadas por fletes que el usuario ve.
+        AccountMove = self.env['account.move'].sudo()
+        etiquetas_pago = dict(
+            AccountMove._fields['payment_state']._description_selection(self.env)
+        )
+        datos = self.env['secadora.serializador.columnas']._serializar(
+            AccountMove.browse(num_fletes), CAMPOS_FACTURA_TABLERO,
+        )
+        facturas = []
+        for fila in zip(*datos.values()):
+            f = dict(zip(datos, fila))
+            estado_pago = f['estado_pago_raw']
+            if f['estado'] == 'posted':
+                etiqueta = etiquetas_pago.get(estado_pago, estado_pago)
+            elif f['estado'] == 'cancel':
+                etiqueta = 'Cancelada'
+            else:
+                etiqueta = 'Borrador'
+            facturas.append({
+                **f,
+                'num_fletes': num_fletes[f['id']],
+                'estado_pago_raw': estado_pago or 'not_paid',
+                'estado_pago': etiqueta,
+                'saldo': f['saldo'] if f['estado'] == 'posted' else 0.0,
+            })
+        facturas.sort(key=lambda f: f['fecha'], reverse=True)
+        return {
+            clave: [f[clave] for f in facturas]
+            for clave in ('id', 'num_fletes', *CLAVES_DETALLE_FACTURA)
+        }
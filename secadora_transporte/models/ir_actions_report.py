@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
 
 import base64
+import contextlib
 import logging
+import os
+import tempfile
+import time
 
 from odoo import models
-from odoo.tools.pdf import merge_pdf
+from odoo.tools.pdf import PdfFileReader, PdfFileWriter
 
 _logger = logging.getLogger(__name__)
 
@@ -23,6 +27,9 @@ class IrActionsReport(models.Model):
         reporte QWeb factura POR factura y se concatena:
             [reporte factura A, PDF A, reporte factura B, PDF B, ...]
         seguido de una hoja final con el total general y las firmas.
+        Los PDFs de Drive se descargan en paralelo mientras se renderiza, y
+        todas las partes pasan por disco (carpeta temporal) en vez de
+        acumularse en memoria.
         Si el modo intercalado falla, cae al render normal (todo junto).
         """
         report = self._get_report(report_ref)
@@ -52,79 +59,157 @@ class IrActionsReport(models.Model):
         viajes_solo_cierre) se pasan por `data`, no por contexto: las claves de
         `data` se inyectan directamente en el namespace del template QWeb, que
         es la vía fiable en Odoo 18 (el contexto no siempre llega íntegro al
-        render del sub-reporte)."""
-        facturas = self.env['account.move'].browse(ids)
-        partes = []  # lista de PDFs en bytes, en orden
-
-        # Validación temprana: cada PDF que entre al merge debe empezar por
-        # %PDF. Un adjunto corrupto no debe tumbar el intercalado entero — se
-        # omite (la factura ya muestra su enlace de Drive como respaldo).
-        def _pdf_valido(b):
-            return isinstance(b, (bytes, bytearray)) and b[:4] == b'%PDF'
+        render del sub-reporte).
 
-        for factura in facturas:
-            # Render QWeb del grupo de fletes de esta sola factura (sin
-            # total/firmas globales).
-            data_grupo = dict(data or {}, viajes_solo_grupos=True)
-            pdf_grupo, _ = super()._render_qweb_pdf(
-                report_ref, res_ids=[factura.id], data=data_grupo
+        Los renders QWeb siguen siendo secuenciales (usan el entorno y el
+        cursor, que no se comparten entre hilos); lo que corre en paralelo son
+        las descargas de Drive, que no tocan la base de datos. El reporte de
+        cada grupo se escribe a disco apenas sale de wkhtmltopdf y el merge
+        lee las partes desde sus archivos."""
+        facturas = self.env['account.move'].browse(ids)
+        Trabajo = self.env['secadora.trabajo']
+        t0 = time.perf_counter()
+
+        with tempfile.TemporaryDirectory(prefix='viajes_por_pagar_') as carpeta:
+            # PDF físico de cada factura: ruta local, o Future de Drive.
+            locales, enlaces = self._clasificar_pdfs_facturas(facturas, carpeta)
+            executor, futuros = None, {}
+            downloader = self.env.get('custom_webviewlink.drive_downloader')
+            if enlaces and downloader is not None:
+                executor, futuros = downloader.descargar_pdfs_a_carpeta(
+                    list(set(enlaces.values())), carpeta
+                )
+            try:
+                partes = []  # rutas de los PDFs, en orden
+                for i, factura in enumerate(facturas, 1):
+                    # Render QWeb del grupo de fletes de esta sola factura
+                    # (sin total/firmas globales).
+                    data_grupo = dict(data or {}, viajes_solo_grupos=True)
+                    pdf_grupo, _ = super()._render_qweb_pdf(
+                        report_ref, res_ids=[factura.id], data=data_grupo
+                    )
+                    partes.append(self._escribir_parte(carpeta, f'grupo_{i}.pdf', pdf_grupo))
+                    # PDF físico de la factura, justo detrás (si hay).
+                    if factura.id in locales:
+                        partes.append(locales[factura.id])
+                    elif factura.id in enlaces:
+                        partes.append(futuros.get(enlaces[factura.id]))
+                    # Avance, si el reporte corre como trabajo en segundo plano
+                    Trabajo._reportar_avance(i, len(facturas), f'Factura {i} de {len(facturas)}')
+                t_render = time.perf_counter() - t0
+
+                # Hoja final: solo total general + firmas (sin los grupos).
+                data_cierre = dict(data or {}, viajes_solo_cierre=True)
+                pdf_cierre, _ = super()._render_qweb_pdf(
+                    report_ref, res_ids=ids, data=data_cierre
+                )
+                partes.append(self._escribir_parte(carpeta, 'cierre.pdf', pdf_cierre))
+
+                # Las descargas que falten se esperan aquí, no durante el render.
+                partes = [p.result() if hasattr(p, 'result') else p for p in partes]
+                t_drive = time.perf_counter() - t0
+            finally:
+                if executor is not None:
+                    executor.shutdown(wait=True, cancel_futures=True)
+
+            resultado = self._unir_pdfs(partes, facturas, carpeta)
+            _logger.info(
+                'Viajes por pagar: %s facturas (%s PDFs locales, %s de Drive) — '
+                'render %.1f s, Drive listo a los %.1f s, total %.1f s.',
+                len(facturas), len(locales), len(enlaces),
+                t_render, t_drive, time.perf_counter() - t0,
             )
-            partes.append(pdf_grupo)
-            # PDF físico de la factura, justo detrás. Solo se anexan los
-            # válidos; uno corrupto se omite (con warning) sin tumbar el resto.
-            for pdf in self._recolectar_pdfs_facturas(factura):
-                if _pdf_valido(pdf):
-                    partes.append(pdf)
-                else:
+            return resultado, 'pdf'
+
+    def _escribir_parte(self, carpeta, nombre, contenido):
+        ruta = os.path.join(carpeta, nombre)
+        with open(ruta, 'wb') as fh:
+            fh.write(contenido)
+        return ruta
+
+    def _unir_pdfs(self, rutas, facturas, carpeta):
+        """Concatena los PDFs de `rutas` (las None se saltan) escribiendo el
+        resultado en un archivo de `carpeta`. Devuelve los bytes del PDF.
+
+        Validación temprana: cada PDF que entre al merge debe empezar por
+        %PDF. Un adjunto corrupto no debe tumbar el intercalado entero — se
+        omite (la factura ya muestra su enlace de Drive como respaldo)."""
+        writer = PdfFileWriter()
+        with contextlib.ExitStack() as pila:
+            for ruta in rutas:
+                if not ruta:
+                    continue
+                fh = pila.enter_context(open(ruta, 'rb'))
+                if fh.read(4) != b'%PDF':
                     _logger.warning(
-                        'Viajes por pagar: el PDF de la factura %s no es válido, '
-                        'se omite del intercalado (queda su enlace en el reporte).',
-                        factura.name
+                        'Viajes por pagar: %s no es un PDF válido, se omite del '
+                        'intercalado (queda su enlace en el reporte).',
+                        os.path.basename(ruta)
                     )
-
-        # Hoja final: solo total general + firmas (sin los grupos).
-        data_cierre = dict(data or {}, viajes_solo_cierre=True)
-        pdf_cierre, _ = super()._render_qweb_pdf(
-            report_ref, res_ids=ids, data=data_cierre
-        )
-        partes.append(pdf_cierre)
-
-        return merge_pdf(partes), 'pdf'
-
-    def _recolectar_pdfs_facturas(self, facturas):
-        """Devuelve la lista de contenidos PDF (bytes) de las facturas, en el
-        mismo orden en que aparecen en el reporte.
-
-        Por cada factura se toma UN solo PDF, en este orden de preferencia:
+                    continue
+                fh.seek(0)
+                try:
+                    reader = PdfFileReader(fh, strict=False)
+                    paginas = [reader.getPage(n) for n in range(reader.getNumPages())]
+                except Exception as e:
+                    _logger.warning(
+                        'Viajes por pagar: no se pudo leer %s (%s), se omite '
+                        'del intercalado.', os.path.basename(ruta), e
+                    )
+                    continue
+                for pagina in paginas:
+                    writer.addPage(pagina)
+            salida = os.path.join(carpeta, 'viajes_por_pagar.pdf')
+            with open(salida, 'wb') as fh:
+                writer.write(fh)
+        with open(salida, 'rb') as fh:
+            return fh.read()
+
+    def _clasificar_pdfs_facturas(self, facturas, carpeta):
+        """Ubica el PDF físico de cada factura, en el mismo orden de
+        preferencia de siempre:
         1. El adjunto PDF local (principal, o el más reciente).
         2. Si no hay adjunto pero la factura tiene enlace a Drive
            (x_webviewlink), se descarga el PDF de Drive vía cuenta de servicio.
         Si nada de lo anterior da un PDF, la factura se omite (el reporte
         muestra igualmente el enlace de Drive como respaldo).
+
+        Devuelve ({factura_id: ruta del PDF local}, {factura_id: enlace de
+        Drive}). Los adjuntos de todas las facturas se buscan en una sola
+        consulta; los que están en el filestore se leen desde su archivo, sin
+        copiarlos a memoria.
         """
         Attachment = self.env['ir.attachment'].sudo()
-        downloader = self.env.get('custom_webviewlink.drive_downloader')
-        # Construir el cliente de Drive UNA vez y reutilizarlo para todas las
-        # facturas (evita leer la clave JSON y crear el cliente por factura).
-        drive_service = downloader._get_drive_service() if downloader is not None else None
-        pdfs = []
+        adjuntos = Attachment.search([
+            ('res_model', '=', 'account.move'),
+            ('res_id', 'in', facturas.ids),
+            '|', ('mimetype', 'in', ('application/pdf', 'application/x-pdf')),
+                 ('name', '=ilike', '%.pdf'),
+        ], order='id desc')
+        por_factura = adjuntos.grouped('res_id')
+        locales, enlaces = {}, {}
         for factura in facturas:
-            adjuntos = Attachment.search([
-                ('res_model', '=', 'account.move'),
-                ('res_id', '=', factura.id),
-                '|', ('mimetype', 'in', ('application/pdf', 'application/x-pdf')),
-                     ('name', '=ilike', '%.pdf'),
-            ], order='id desc')
-            if adjuntos:
-                principal = factura.message_main_attachment_id
-                elegido = principal if principal in adjuntos else adjuntos[:1]
-                if elegido.datas:
-                    pdfs.append(base64.b64decode(elegido.datas))
-                    continue
+            candidatos = por_factura.get(factura.id, Attachment)
+            principal = factura.message_main_attachment_id
+            elegido = principal if principal in candidatos else candidatos[:1]
+            ruta = self._ruta_adjunto(elegido, carpeta) if elegido else None
+            if ruta:
+                locales[factura.id] = ruta
+                continue
             # Sin adjunto local: intentar Drive.
             enlace = getattr(factura, 'x_webviewlink', False)
-            if enlace and downloader is not None:
-                data = downloader.descargar_pdf(enlace, service=drive_service)
-                if data:
-                    pdfs.append(data)
-        return pdfs
+            if enlace:
+                enlaces[factura.id] = enlace
+        return locales, enlaces
+
+    def _ruta_adjunto(self, adjunto, carpeta):
+        """Ruta de archivo con el contenido del adjunto, o None si está vacío."""
+        if adjunto.store_fname:
+            ruta = adjunto._full_path(adjunto.store_fname)
+            if os.path.isfile(ruta):
+                return ruta
+        if not adjunto.datas:
+            return None
+        return self._escribir_parte(
+            carpeta, f'adjunto_{adjunto.id}.pdf', base64.b64decode(adjunto.datas)
+        )
@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, api
+
+
+class SecadoraTrabajo(models.Model):
+    _inherit = 'secadora.trabajo'
+
+    @api.model
+    def _metodos_encolables(self):
+        metodos = super()._metodos_encolables()
+        metodos.setdefault('account.move', set()).update({'_trabajo_pdf_viajes_por_pagar'})
+        return metodos
@@ -3,6 +3,7 @@
 import { Component, useState, onWillStart } from "@odoo/owl";
 import { registry } from "@web/core/registry";
 import { useService } from "@web/core/utils/hooks";
+import { filasDeColumnas } from "@bascula/js/columnas";
 
 function filtrosVacios() {
     return {
@@ -26,6 +27,8 @@ class TableroTransporte extends Component {
             loading: true,
             filtros: filtrosVacios(),
             expandidas: {},
+            // Detalle de facturas por transportadora, cargado al expandir
+            facturas: {},
         });
 
         onWillStart(async () => {
@@ -51,7 +54,25 @@ class TableroTransporte extends Component {
             "get_tablero_transporte_data",
             [this._filtrosRpc()],
         );
+        // Con otros filtros el detalle ya cargado deja de valer: se vuelve
+        // a pedir para las transportadoras que sigan expandidas.
+        this.state.facturas = {};
         this.state.loading = false;
+        for (const tr of this.state.data.transportadoras) {
+            if (this.state.expandidas[tr.id]) {
+                this.loadFacturas(tr.id);
+            }
+        }
+    }
+
+    async loadFacturas(transportadoraId) {
+        const columnas = await this.orm.call(
+            "secadora.flete",
+            "get_tablero_transporte_facturas",
+            [this._filtrosRpc(), transportadoraId],
+        );
+        // El detalle llega en columnas (secadora.serializador.columnas)
+        this.state.facturas[transportadoraId] = filasDeColumnas(columnas);
     }
 
     async onClickLimpiarFiltros() {
@@ -61,6 +82,9 @@ class TableroTransporte extends Component {
 
     toggleExpandida(transportadoraId) {
         this.state.expandidas[transportadoraId] = !this.state.expandidas[transportadoraId];
+        if (this.state.expandidas[transportadoraId] && !this.state.facturas[transportadoraId]) {
+            this.loadFacturas(transportadoraId);
+        }
     }
 
     formatMoneda(value) {
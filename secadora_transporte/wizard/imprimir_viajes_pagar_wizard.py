@@ -44,6 +44,12 @@ class ImprimirViajesPagarWizard(models.TransientModel):
         'res.currency',
         default=lambda self: self.env.company.currency_id,
     )
+    en_segundo_plano = fields.Boolean(
+        string='Generar en segundo plano',
+        help='Con muchas facturas (un render y una descarga de Drive por '
+             'factura) el PDF puede tardar minutos: se genera como trabajo y '
+             'se avisa al terminar.',
+    )
 
     def _buscar_facturas_candidatas(self):
         """Facturas de transportadora publicadas con saldo pendiente que
@@ -109,6 +115,14 @@ class ImprimirViajesPagarWizard(models.TransientModel):
                 'separado.' % ', '.join(monedas.mapped('name'))
             )
 
+        if self.en_segundo_plano:
+            Trabajo = self.env['secadora.trabajo']
+            trabajo = Trabajo._encolar(
+                self.factura_ids, '_trabajo_pdf_viajes_por_pagar',
+                nombre=f'Viajes por pagar ({len(self.factura_ids)} facturas)',
+            )
+            return Trabajo._accion_encolado(trabajo)
+
         return self.env.ref(
             'secadora_transporte.action_report_viajes_por_pagar'
         ).report_action(self.factura_ids)